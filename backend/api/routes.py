@@ -1,12 +1,24 @@
 """
 API Routes for Jarvis Backend
 """
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Any, List, Optional, Set
+import asyncio
+import logging
 import os
 import uuid
 
+from core import colors
+from core.admission import is_trusted_proxy
+from core.persistence import ContextVersionConflict
+from core.sharding import ASSIGNED_CONTEXT_HEADER
+from core.startup import startup_timer
+from core.json_encoding import JarvisJSONResponse, encode
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -14,6 +26,19 @@ class TextRequest(BaseModel):
     """Request model for text-only commands"""
     text: str
     context_id: Optional[str] = None
+    # Scene version the client already has; enables delta responses
+    since_version: Optional[int] = None
+
+
+class BatchRequest(BaseModel):
+    """Request model for an ordered list of text commands on one scene"""
+    commands: List[str]
+    context_id: Optional[str] = None
+    since_version: Optional[int] = None
+
+
+# Most commands accepted in one batch request
+MAX_BATCH_COMMANDS = int(os.getenv("JARVIS_BATCH_MAX_COMMANDS", "100"))
 
 
 class SceneRequest(BaseModel):
@@ -21,12 +46,24 @@ class SceneRequest(BaseModel):
     context_id: str
 
 
+def _assigned_context_id(
+    request: Request,
+    header: Optional[str] = Header(None, alias=ASSIGNED_CONTEXT_HEADER)
+) -> Optional[str]:
+    """Id for a new context chosen by the shard router; ignored from anyone else"""
+    if header and request.client and is_trusted_proxy(request.client.host):
+        return header
+    return None
+
+
 @router.post("/process")
 async def process_request(
     text: Optional[str] = Form(None),
     context_id: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
-    video_url: Optional[str] = Form(None)
+    video_url: Optional[str] = Form(None),
+    since_version: Optional[int] = Form(None),
+    assigned_context_id: Optional[str] = Depends(_assigned_context_id)
 ):
     """
     Main endpoint for processing multimodal requests
@@ -36,66 +73,46 @@ async def process_request(
     - context_id: Existing scene context ID
     - image: Uploaded image file
     - video_url: YouTube or video URL
+    - since_version: Scene version the client already has; the response
+      then carries a "delta" of JSON-Patch style operations instead of
+      the full "scene" when possible
     """
     from main import orchestrator
 
-    print(f"\n{'='*80}")
-    print(f"[/api/process] REQUEST RECEIVED")
-    print(f"  Text: {text[:100] if text else 'None'}...")
-    print(f"  Context ID: {context_id}")
-    print(f"  Has Image: {image is not None}")
-    if image:
-        print(f"  Image Filename: {image.filename}")
-    print(f"  Has Video: {video_url is not None}")
-    print(f"{'='*80}\n")
+    logger.debug(
+        "[/api/process] REQUEST RECEIVED: text=%r context_id=%s image=%s video=%s",
+        text[:100] if text else None, context_id, image.filename if image else None, video_url is not None
+    )
 
     if not orchestrator:
         raise HTTPException(status_code=503, detail="Orchestrator not initialized")
 
     # Handle image upload
-    image_path = None
-    if image:
-        try:
-            # Save uploaded file
-            file_ext = os.path.splitext(image.filename)[1]
-            filename = f"{uuid.uuid4()}{file_ext}"
-            image_path = os.path.join("uploads", filename)
-
-            print(f"[/api/process] Saving image to: {image_path}")
-            with open(image_path, "wb") as f:
-                content = await image.read()
-                f.write(content)
-                print(f"[/api/process] Image saved successfully ({len(content)} bytes)")
-        except Exception as save_error:
-            print(f"❌ [/api/process] Failed to save image: {save_error}")
-            import traceback
-            traceback.print_exc()
-            image_path = None
+    image_path = await _save_upload(image) if image else None
 
     # Process the request
     try:
-        print(f"[/api/process] Calling orchestrator.process_request...")
+        logger.debug("[/api/process] Calling orchestrator.process_request...")
         result = await orchestrator.process_request(
             text=text,
             image_path=image_path,
             video_url=video_url,
-            context_id=context_id
+            context_id=context_id,
+            new_context_id=assigned_context_id,
+            since_version=since_version
         )
 
         # Check if the orchestrator returned an error status
         if result.get("status") == "error":
-            print(f"⚠️ [/api/process] Orchestrator returned error status: {result.get('message')}")
-            return result
+            logger.warning("⚠️ [/api/process] Orchestrator returned error status: %s", result.get('message'))
+            return JarvisJSONResponse(result)
 
-        print(f"✅ [/api/process] Request processed successfully")
-        return result
+        logger.debug("✅ [/api/process] Request processed successfully")
+        return JarvisJSONResponse(result)
     except Exception as e:
-        import traceback
         from datetime import datetime
         error_msg = str(e)
-        error_trace = traceback.format_exc()
-        print(f"\n❌ [/api/process] ERROR in process_request: {error_msg}")
-        print(f"Traceback: {error_trace}\n")
+        logger.error("❌ [/api/process] ERROR in process_request: %s", error_msg, exc_info=True)
 
         # Return error as a valid JSON response
         return {
@@ -119,6 +136,108 @@ async def process_request(
         }
 
 
+async def _save_upload(image: UploadFile) -> Optional[str]:
+    """Save an uploaded image; returns its path, or None if saving failed"""
+    try:
+        file_ext = os.path.splitext(image.filename)[1]
+        filename = f"{uuid.uuid4()}{file_ext}"
+        image_path = os.path.join("uploads", filename)
+
+        logger.debug("[/api/process] Saving image to: %s", image_path)
+        with open(image_path, "wb") as f:
+            content = await image.read()
+            f.write(content)
+            logger.debug("[/api/process] Image saved successfully (%s bytes)", len(content))
+        return image_path
+    except Exception as save_error:
+        logger.error("❌ [/api/process] Failed to save image: %s", save_error, exc_info=True)
+        return None
+
+
+# Strong references to running streamed requests, which must not be
+# garbage collected when their client goes away
+_stream_tasks: Set[asyncio.Task] = set()
+
+
+def _format_event(name: str, data: Dict[str, Any], sse: bool) -> bytes:
+    """One progress event as an SSE message or an NDJSON line"""
+    if sse:
+        return b"event: " + name.encode("utf-8") + b"\ndata: " + encode(data) + b"\n\n"
+    return encode({"event": name, "data": data}) + b"\n"
+
+
+@router.post("/process/stream")
+async def process_request_stream(
+    text: Optional[str] = Form(None),
+    context_id: Optional[str] = Form(None),
+    image: Optional[UploadFile] = File(None),
+    video_url: Optional[str] = Form(None),
+    since_version: Optional[int] = Form(None),
+    accept: Optional[str] = Header(None),
+    assigned_context_id: Optional[str] = Depends(_assigned_context_id)
+):
+    """
+    Streaming variant of /process
+
+    Takes the same fields and emits progress events as soon as each is
+    ready: "context", "analysis" (parsed intent), "plan" (action plan),
+    one "action" per executed action (with the generated object), and
+    finally "result" with the same body /process would return.
+
+    Responds with Server-Sent Events when the Accept header asks for
+    text/event-stream, otherwise with NDJSON ({"event", "data"} per line).
+    """
+    from main import orchestrator
+
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Orchestrator not initialized")
+
+    sse = "text/event-stream" in (accept or "")
+    image_path = await _save_upload(image) if image else None
+    events: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue()
+
+    async def on_event(name: str, data: Dict[str, Any]):
+        events.put_nowait(_format_event(name, data, sse))
+
+    async def run():
+        try:
+            result = await orchestrator.process_request(
+                text=text,
+                image_path=image_path,
+                video_url=video_url,
+                context_id=context_id,
+                new_context_id=assigned_context_id,
+                since_version=since_version,
+                on_event=on_event
+            )
+            await on_event("result", result)
+        except Exception as e:
+            logger.error("❌ [/api/process/stream] ERROR in process_request: %s", e, exc_info=True)
+            await on_event("error", {"status": "error", "message": f"Processing error: {str(e)}"})
+        finally:
+            events.put_nowait(None)
+
+    # The request runs to completion even if the client disconnects,
+    # exactly like a non-streaming request
+    task = asyncio.create_task(run())
+    _stream_tasks.add(task)
+    task.add_done_callback(_stream_tasks.discard)
+
+    async def stream():
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+        await task
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/test")
 async def test_endpoint():
     """Simple test endpoint to verify API is working"""
@@ -152,26 +271,34 @@ async def diagnostics():
         "uploads_dir_writable": os.access("uploads", os.W_OK) if os.path.exists("uploads") else False
     }
 
+    if orchestrator:
+        diagnostics_info["contexts"] = orchestrator.active_contexts.stats()
+        diagnostics_info["context_locks"] = orchestrator.context_locks.stats()
+        diagnostics_info["plan_cache"] = orchestrator.plan_cache.stats()
+    diagnostics_info["startup"] = startup_timer.report()
+
     # Check if OpenAI client is initialized
     if orchestrator and orchestrator.nlp_processor:
         diagnostics_info["openai_client_initialized"] = orchestrator.nlp_processor.client is not None
+        if orchestrator.nlp_processor.cache is not None:
+            diagnostics_info["llm_cache"] = orchestrator.nlp_processor.cache.stats()
+        if orchestrator.nlp_processor.batcher is not None:
+            diagnostics_info["llm_batcher"] = orchestrator.nlp_processor.batcher.stats()
 
-    print(f"\n[DIAGNOSTICS] System state:")
-    for key, value in diagnostics_info.items():
-        print(f"  {key}: {value}")
-    print()
+    logger.debug("[DIAGNOSTICS] System state: %s", diagnostics_info)
 
     return diagnostics_info
 
 
 @router.post("/text")
-async def process_text(request: TextRequest):
+async def process_text(
+    request: TextRequest,
+    assigned_context_id: Optional[str] = Depends(_assigned_context_id)
+):
     """
     Process text-only commands
     """
-    import traceback
     from datetime import datetime
-    import sys
 
     error_response_template = {
         "context_id": str(uuid.uuid4()),
@@ -196,38 +323,32 @@ async def process_text(request: TextRequest):
     try:
         from main import orchestrator
 
-        print(f"\n{'='*80}")
-        print(f"[TEXT ENDPOINT] Received request")
-        print(f"Text: {request.text[:100] if request.text else 'None'}...")
-        print(f"Context ID: {request.context_id}")
-        print(f"Orchestrator available: {orchestrator is not None}")
-        print(f"{'='*80}\n")
+        logger.debug(
+            "[TEXT ENDPOINT] Received request: text=%r context_id=%s",
+            request.text[:100] if request.text else None, request.context_id
+        )
 
         if not orchestrator:
-            print("❌ Orchestrator is None!")
+            logger.error("❌ Orchestrator is None!")
             error_response = error_response_template.copy()
             error_response["status"] = "error"
             error_response["message"] = "Orchestrator not initialized on server"
             error_response["result"]["error"] = "Orchestrator not initialized"
             return error_response
 
-        print(f"✓ Orchestrator modules:")
-        print(f"  - NLP: {orchestrator.nlp_processor is not None}")
-        print(f"  - CV: {orchestrator.cv_processor is not None}")
-        print(f"  - Text-to-3D: {orchestrator.text_to_3d is not None}")
-        print(f"  - Scene Builder: {orchestrator.scene_builder is not None}")
 
         # Call orchestrator with proper async handling
-        print(f"[TEXT ENDPOINT] Calling orchestrator.process_request...")
+        logger.debug("[TEXT ENDPOINT] Calling orchestrator.process_request...")
         try:
             result = await orchestrator.process_request(
                 text=request.text,
-                context_id=request.context_id
+                context_id=request.context_id,
+                new_context_id=assigned_context_id,
+                since_version=request.since_version
             )
-            print(f"[TEXT ENDPOINT] Orchestrator returned successfully")
+            logger.debug("[TEXT ENDPOINT] Orchestrator returned successfully")
         except Exception as proc_error:
-            print(f"❌ Orchestrator.process_request failed: {str(proc_error)}")
-            print(traceback.format_exc())
+            logger.error("❌ Orchestrator.process_request failed: %s", proc_error, exc_info=True)
             error_response = error_response_template.copy()
             error_response["status"] = "error"
             error_response["message"] = f"Processing error: {str(proc_error)}"
@@ -236,24 +357,15 @@ async def process_text(request: TextRequest):
 
         # Check response status
         if result.get("status") == "error":
-            print(f"⚠️ Orchestrator returned error status: {result.get('message', 'Unknown error')}")
-            return result
+            logger.warning("⚠️ Orchestrator returned error status: %s", result.get('message', 'Unknown error'))
+            return JarvisJSONResponse(result)
 
-        print(f"✅ Successfully processed request. Context ID: {result.get('context_id', 'unknown')}")
-        print(f"Objects created: {len(result.get('scene', {}).get('objects', []))}")
-        return result
+        logger.debug("✅ Successfully processed request. Context ID: %s", result.get('context_id', 'unknown'))
+        return JarvisJSONResponse(result)
 
     except Exception as e:
         error_msg = str(e)
-        error_trace = traceback.format_exc()
-
-        print(f"\n{'='*80}")
-        print(f"❌ CRITICAL ERROR in process_text endpoint")
-        print(f"Error type: {type(e).__name__}")
-        print(f"Error message: {error_msg}")
-        print(f"Full traceback:")
-        print(error_trace)
-        print(f"{'='*80}\n")
+        logger.error("❌ CRITICAL ERROR in process_text endpoint: %s: %s", type(e).__name__, error_msg, exc_info=True)
 
         # Make sure we return a valid response
         error_response = error_response_template.copy()
@@ -263,21 +375,83 @@ async def process_text(request: TextRequest):
         return error_response
 
 
+@router.post("/batch")
+async def process_batch(
+    request: BatchRequest,
+    assigned_context_id: Optional[str] = Depends(_assigned_context_id)
+):
+    """
+    Apply an ordered list of text commands to one scene
+
+    NLP for all commands runs concurrently; the plans are applied in
+    order, so later commands see the effect of earlier ones. Returns one
+    result per command and the final scene (or a delta with
+    since_version), serialized once.
+    """
+    from main import orchestrator
+
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Orchestrator not initialized")
+
+    commands = [command for command in request.commands if command and command.strip()]
+    if not commands:
+        raise HTTPException(status_code=400, detail="No commands given")
+    if len(commands) > MAX_BATCH_COMMANDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many commands: {len(commands)} (at most {MAX_BATCH_COMMANDS})"
+        )
+
+    logger.debug("[BATCH ENDPOINT] %s commands for context_id=%s", len(commands), request.context_id)
+    try:
+        result = await orchestrator.process_batch(
+            commands,
+            context_id=request.context_id,
+            new_context_id=assigned_context_id,
+            since_version=request.since_version
+        )
+    except Exception as e:
+        logger.error("❌ Orchestrator.process_batch failed: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
+    return JarvisJSONResponse(result)
+
+
+@router.head("/scene/{context_id}")
+async def scene_exists(context_id: str):
+    """
+    Check whether a scene exists, without returning it
+
+    Used by the shard router before it routes a request to a context.
+    """
+    from main import orchestrator
+
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Orchestrator not initialized")
+
+    exists = await orchestrator.active_contexts.get_async(context_id) is not None
+    return Response(status_code=200 if exists else 404)
+
+
 @router.get("/scene/{context_id}")
-async def get_scene(context_id: str):
+async def get_scene(context_id: str, since_version: Optional[int] = None):
     """
     Get current scene state
+
+    With since_version, returns only the changes since that version when
+    possible (see /process).
     """
     from main import orchestrator
     
     if not orchestrator:
         raise HTTPException(status_code=503, detail="Orchestrator not initialized")
     
-    if context_id not in orchestrator.active_contexts:
+    context = await orchestrator.active_contexts.get_async(context_id)
+    if context is None:
         raise HTTPException(status_code=404, detail="Scene not found")
-    
-    context = orchestrator.active_contexts[context_id]
-    return orchestrator._serialize_context(context)
+
+    if since_version is not None:
+        return JarvisJSONResponse(orchestrator.scene_payload(context, since_version))
+    return JarvisJSONResponse(orchestrator._serialize_context(context))
 
 
 @router.delete("/scene/{context_id}")
@@ -290,13 +464,48 @@ async def delete_scene(context_id: str):
     if not orchestrator:
         raise HTTPException(status_code=503, detail="Orchestrator not initialized")
     
-    if context_id in orchestrator.active_contexts:
-        del orchestrator.active_contexts[context_id]
+    if await orchestrator.active_contexts.delete_async(context_id):
         return {"status": "deleted", "context_id": context_id}
     
     raise HTTPException(status_code=404, detail="Scene not found")
 
 
+@router.get("/scene/{context_id}/history")
+async def get_scene_history(context_id: str, limit: int = 100):
+    """
+    Get the history of a scene
+
+    Returns the most recent entries, including older entries spilled to
+    the persistent store, and a summary of compacted entries.
+    """
+    from main import orchestrator
+
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Orchestrator not initialized")
+
+    history = await orchestrator.get_history(context_id, limit=max(1, min(limit, 1000)))
+    if history is None:
+        raise HTTPException(status_code=404, detail="Scene not found")
+    return history
+
+
+@router.post("/scene/{context_id}/release")
+async def release_scene(context_id: str):
+    """
+    Flush a scene and drop it from this worker's memory
+
+    Called by the shard router when the scene moves to another worker.
+    The persisted copy is kept.
+    """
+    from main import orchestrator
+
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Orchestrator not initialized")
+
+    released = await orchestrator.active_contexts.release_async(context_id)
+    return {"status": "released" if released else "not_loaded", "context_id": context_id}
+
+
 @router.get("/scenes")
 async def list_scenes():
     """
@@ -319,28 +528,81 @@ async def list_scenes():
     return {"scenes": scenes, "count": len(scenes)}
 
 
-@router.delete("/scene/{context_id}/object/{object_index}")
-async def delete_scene_object(context_id: str, object_index: int):
+@router.get("/scene/{context_id}/objects")
+async def find_scene_objects(
+    context_id: str,
+    type: Optional[str] = None,
+    color: Optional[str] = None,
+    material: Optional[str] = None
+):
     """
-    Delete a specific object from a scene
+    List the objects of a scene, optionally filtered by type, color
+    (name or hex code) and material name, e.g. "wood"
     """
     from main import orchestrator
 
     if not orchestrator:
         raise HTTPException(status_code=503, detail="Orchestrator not initialized")
 
-    if context_id not in orchestrator.active_contexts:
+    context = await orchestrator.active_contexts.get_async(context_id)
+    if context is None:
         raise HTTPException(status_code=404, detail="Scene not found")
 
-    context = orchestrator.active_contexts[context_id]
+    if color is not None:
+        hex_code = colors.name_to_hex(color, default=None)
+        if hex_code is None:
+            raise HTTPException(status_code=400, detail=f"Unknown color: {color}")
+        color = hex_code
 
-    if object_index < 0 or object_index >= len(context.objects):
-        raise HTTPException(status_code=404, detail="Object not found")
+    criteria = {
+        key: value
+        for key, value in (("type", type), ("color", color), ("material", material))
+        if value is not None
+    }
+    objects = context.objects.find(**criteria)
+    return {"objects": objects, "count": len(objects)}
 
-    deleted_object = context.objects.pop(object_index)
 
-    return {
-        "status": "success",
-        "deleted_object": deleted_object,
-        "remaining_objects": len(context.objects)
-    }
+@router.delete("/scene/{context_id}/object/{object_ref}")
+async def delete_scene_object(context_id: str, object_ref: str):
+    """
+    Delete a specific object from a scene
+
+    Objects are addressed by their id. A numeric reference that is not an
+    object id is treated as a list index, as in earlier API versions.
+    """
+    from main import orchestrator
+
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Orchestrator not initialized")
+
+    # Serialize with other requests working on the same scene
+    async with orchestrator.context_locks.acquire(context_id):
+        context = await orchestrator.active_contexts.get_async(context_id)
+        if context is None:
+            raise HTTPException(status_code=404, detail="Scene not found")
+
+        if object_ref in context.objects:
+            deleted_object = context.objects.remove(object_ref)
+        else:
+            try:
+                object_index = int(object_ref)
+            except ValueError:
+                raise HTTPException(status_code=404, detail="Object not found")
+            if object_index < 0 or object_index >= len(context.objects):
+                raise HTTPException(status_code=404, detail="Object not found")
+            deleted_object = context.objects.pop(object_index)
+
+        context.record_version()
+        try:
+            await orchestrator.active_contexts.commit_async(context_id)
+        except ContextVersionConflict:
+            await orchestrator.active_contexts.reload_async(context_id)
+            raise HTTPException(status_code=409, detail="Scene was modified concurrently, please retry")
+
+        return {
+            "status": "success",
+            "deleted_object": deleted_object,
+            "scene_version": context.version,
+            "remaining_objects": len(context.objects)
+        }
@@ -32,21 +32,24 @@ async def start_simulation(context_id: str):
     """Start the simulation for a scene"""
     from main import orchestrator
 
-    if not orchestrator or context_id not in orchestrator.active_contexts:
+    if not orchestrator:
         raise HTTPException(status_code=404, detail="Scene not found")
 
-    context = orchestrator.active_contexts[context_id]
-
-    # Initialize simulator if not exists
-    if not hasattr(context, 'simulator'):
-        from simulation.simulator import Simulator
-        context.simulator = Simulator()
-        context.simulator.initialize({
-            "objects": context.objects,
-            "agents": []
-        })
-    
-    context.simulator.start()
+    async with orchestrator.context_locks.acquire(context_id):
+        context = await orchestrator.active_contexts.get_async(context_id)
+        if context is None:
+            raise HTTPException(status_code=404, detail="Scene not found")
+
+        # Initialize simulator if not exists
+        if not hasattr(context, 'simulator'):
+            from simulation.simulator import Simulator
+            context.simulator = Simulator()
+            context.simulator.initialize({
+                "objects": context.objects.to_list(),
+                "agents": []
+            })
+        
+        context.simulator.start()
     
     return {
         "status": "started",
@@ -60,11 +63,10 @@ async def stop_simulation(context_id: str):
     """Stop the simulation"""
     from main import orchestrator
     
-    if not orchestrator or context_id not in orchestrator.active_contexts:
+    context = await orchestrator.active_contexts.get_async(context_id) if orchestrator else None
+    if context is None:
         raise HTTPException(status_code=404, detail="Scene not found")
     
-    context = orchestrator.active_contexts[context_id]
-    
     if hasattr(context, 'simulator'):
         context.simulator.stop()
         return {
@@ -80,11 +82,10 @@ async def step_simulation(context_id: str):
     """Advance simulation by one step"""
     from main import orchestrator
     
-    if not orchestrator or context_id not in orchestrator.active_contexts:
+    context = await orchestrator.active_contexts.get_async(context_id) if orchestrator else None
+    if context is None:
         raise HTTPException(status_code=404, detail="Scene not found")
     
-    context = orchestrator.active_contexts[context_id]
-    
     if not hasattr(context, 'simulator'):
         raise HTTPException(status_code=400, detail="Simulation not initialized")
     
@@ -101,27 +102,64 @@ async def get_simulation_state(context_id: str):
     """Get current simulation state"""
     from main import orchestrator
     
-    if not orchestrator or context_id not in orchestrator.active_contexts:
+    context = await orchestrator.active_contexts.get_async(context_id) if orchestrator else None
+    if context is None:
         raise HTTPException(status_code=404, detail="Scene not found")
     
-    context = orchestrator.active_contexts[context_id]
-    
     if not hasattr(context, 'simulator'):
         return {"error": "Simulation not initialized"}
     
     return context.simulator.get_state()
 
 
+@router.get("/{context_id}/metrics")
+async def get_simulation_metrics(context_id: str):
+    """Get tick timing, entity count and overrun metrics for a scene"""
+    from main import orchestrator
+    
+    context = await orchestrator.active_contexts.get_async(context_id) if orchestrator else None
+    if context is None:
+        raise HTTPException(status_code=404, detail="Scene not found")
+    
+    if not hasattr(context, 'simulator'):
+        raise HTTPException(status_code=400, detail="Simulation not initialized")
+    
+    return {
+        "context_id": context_id,
+        "is_running": context.simulator.is_running,
+        "metrics": context.simulator.get_metrics()
+    }
+
+
+@router.get("/metrics")
+async def get_aggregate_simulation_metrics():
+    """Get tick metrics aggregated across all scenes with a simulator"""
+    from main import orchestrator
+    from simulation.metrics import SimulationMetrics
+    
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Orchestrator not initialized")
+    
+    simulators = [
+        context.simulator
+        for context in list(orchestrator.active_contexts.values())
+        if hasattr(context, 'simulator')
+    ]
+    
+    report = SimulationMetrics.aggregate(sim.metrics for sim in simulators)
+    report["running"] = sum(1 for sim in simulators if sim.is_running)
+    return report
+
+
 @router.post("/{context_id}/force")
 async def apply_force(context_id: str, force_data: ForceApplication):
     """Apply a force to an object"""
     from main import orchestrator
     
-    if not orchestrator or context_id not in orchestrator.active_contexts:
+    context = await orchestrator.active_contexts.get_async(context_id) if orchestrator else None
+    if context is None:
         raise HTTPException(status_code=404, detail="Scene not found")
     
-    context = orchestrator.active_contexts[context_id]
-    
     if not hasattr(context, 'simulator'):
         raise HTTPException(status_code=400, detail="Simulation not initialized")
     
@@ -138,11 +176,10 @@ async def command_agent(context_id: str, cmd: AgentCommand):
     """Send a command to an agent"""
     from main import orchestrator
     
-    if not orchestrator or context_id not in orchestrator.active_contexts:
+    context = await orchestrator.active_contexts.get_async(context_id) if orchestrator else None
+    if context is None:
         raise HTTPException(status_code=404, detail="Scene not found")
     
-    context = orchestrator.active_contexts[context_id]
-    
     if not hasattr(context, 'simulator'):
         raise HTTPException(status_code=400, detail="Simulation not initialized")
     
@@ -156,11 +193,10 @@ async def reset_simulation(context_id: str):
     """Reset the simulation"""
     from main import orchestrator
     
-    if not orchestrator or context_id not in orchestrator.active_contexts:
+    context = await orchestrator.active_contexts.get_async(context_id) if orchestrator else None
+    if context is None:
         raise HTTPException(status_code=404, detail="Scene not found")
     
-    context = orchestrator.active_contexts[context_id]
-    
     if hasattr(context, 'simulator'):
         context.simulator.reset()
         return {"status": "reset", "context_id": context_id}
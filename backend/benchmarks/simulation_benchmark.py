@@ -0,0 +1,312 @@
+"""
+Simulation Scaling Benchmark
+
+Builds synthetic scenes with fixed seeds and measures how PhysicsEngine,
+BehaviorEngine and Simulator scale with the number of entities.
+Runs headless with no network access.
+
+Usage (from the backend directory):
+    python -m benchmarks.simulation_benchmark
+    python -m benchmarks.simulation_benchmark --sizes 10,100,1000 --steps 20
+    python -m benchmarks.simulation_benchmark --physics-engine mypkg.engine:FastPhysicsEngine
+"""
+from typing import Dict, Any, List, Optional
+import argparse
+import gc
+import importlib
+import json
+import math
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from simulation.simulator import Simulator
+
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+AGENT_TYPES = ["generic", "wanderer", "follower", "avoider"]
+
+
+def load_engine_class(path: str):
+    """Load an engine class from a 'module:ClassName' path"""
+    module_name, _, class_name = path.partition(":")
+    if not class_name:
+        raise ValueError(f"Engine path must look like 'module:ClassName', got: {path}")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def build_scene(body_count: int, agent_count: int, seed: int) -> Dict[str, Any]:
+    """Create synthetic scene data with deterministic positions"""
+    rng = np.random.default_rng(seed)
+    # Keep density constant so contact counts scale linearly with size
+    extent = max(10.0, math.sqrt(body_count) * 4.0)
+
+    body_positions = rng.uniform(-extent, extent, size=(body_count, 3))
+    body_positions[:, 1] = rng.uniform(0.0, 10.0, size=body_count)
+    objects = [
+        {
+            "id": f"body-{i}",
+            "position": body_positions[i].tolist(),
+            "mass": float(rng.uniform(0.5, 5.0)),
+            "is_static": bool(i % 10 == 0)
+        }
+        for i in range(body_count)
+    ]
+
+    agent_positions = rng.uniform(-extent, extent, size=(agent_count, 3))
+    agent_positions[:, 1] = 0.0
+    agents = [
+        {
+            "id": f"agent-{i}",
+            "position": agent_positions[i].tolist(),
+            "type": AGENT_TYPES[i % len(AGENT_TYPES)]
+        }
+        for i in range(agent_count)
+    ]
+
+    return {"objects": objects, "agents": agents}
+
+
+def create_simulator(physics_engine_cls=None, behavior_engine_cls=None) -> Simulator:
+    """Create a simulator, optionally swapping in alternative engines"""
+    simulator = Simulator()
+    if physics_engine_cls is not None:
+        simulator.physics_engine = physics_engine_cls()
+    if behavior_engine_cls is not None:
+        simulator.behavior_engine = behavior_engine_cls()
+    return simulator
+
+
+def _timed(fn, repeats: int) -> List[float]:
+    """Run fn repeatedly and return the duration of each run"""
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _summary(durations: List[float]) -> Dict[str, float]:
+    """Summarize a list of durations in seconds"""
+    if not durations:
+        return {"runs": 0, "mean": 0.0, "min": 0.0, "max": 0.0}
+    return {
+        "runs": len(durations),
+        "mean": sum(durations) / len(durations),
+        "min": min(durations),
+        "max": max(durations)
+    }
+
+
+def run_case(
+    body_count: int,
+    agent_count: int,
+    steps: int,
+    warmup: int,
+    seed: int,
+    max_collision_bodies: int,
+    physics_engine_cls=None,
+    behavior_engine_cls=None
+) -> Dict[str, Any]:
+    """Benchmark a single scene size"""
+    random.seed(seed)
+    np.random.seed(seed)
+    scene = build_scene(body_count, agent_count, seed)
+
+    # Memory per entity, measured while populating the engines
+    gc.collect()
+    tracemalloc.start()
+    simulator = create_simulator(physics_engine_cls, behavior_engine_cls)
+    simulator.initialize(scene)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    entity_count = body_count + agent_count
+
+    physics = simulator.physics_engine
+    behavior = simulator.behavior_engine
+    dt = 1.0 / 60.0
+
+    for _ in range(warmup):
+        physics.step(dt)
+        behavior.step(dt)
+
+    physics_times = _timed(lambda: physics.step(dt), steps)
+    behavior_times = _timed(lambda: behavior.step(dt), steps)
+
+    # Pairwise collision detection is quadratic, so very large scenes are skipped
+    collision_times: List[float] = []
+    contacts: Optional[int] = None
+    if body_count <= max_collision_bodies:
+        collision_times = _timed(physics.detect_collisions, max(1, steps // 5))
+        contacts = len(physics.detect_collisions())
+
+    serialize_times = []
+    payload_bytes = 0
+    for _ in range(max(1, steps // 5)):
+        start = time.perf_counter()
+        payload = json.dumps(simulator.get_state())
+        serialize_times.append(time.perf_counter() - start)
+        payload_bytes = len(payload)
+
+    result = {
+        "bodies": body_count,
+        "agents": agent_count,
+        "physics_step": _summary(physics_times),
+        "behavior_step": _summary(behavior_times),
+        "collision_detection": _summary(collision_times),
+        "contacts": contacts,
+        "serialization": _summary(serialize_times),
+        "serialized_bytes": payload_bytes,
+        "memory_bytes": allocated,
+        "memory_per_entity": allocated / entity_count if entity_count else 0.0
+    }
+
+    # Full simulator ticks, only when collision detection is affordable
+    if body_count <= max_collision_bodies:
+        simulator.start()
+        tick_times = _timed(lambda: simulator.step(dt), steps)
+        result["simulator_step"] = _summary(tick_times)
+        result["tick_budget_utilization"] = result["simulator_step"]["mean"] / dt
+
+    return result
+
+
+def scaling_exponents(results: List[Dict[str, Any]], metric: str) -> List[Dict[str, Any]]:
+    """
+    Estimate local scaling exponents between consecutive sizes
+
+    An exponent near 1.0 means linear scaling, near 2.0 quadratic.
+    """
+    curve = []
+    points = [
+        (r["bodies"], r[metric]["mean"])
+        for r in results
+        if r.get(metric, {}).get("runs")
+    ]
+    for (n1, t1), (n2, t2) in zip(points, points[1:]):
+        if n1 > 0 and n2 > n1 and t1 > 0 and t2 > 0:
+            exponent = math.log(t2 / t1) / math.log(n2 / n1)
+        else:
+            exponent = None
+        curve.append({"from": n1, "to": n2, "exponent": exponent})
+    return curve
+
+
+def run_suite(
+    sizes: List[int],
+    steps: int = 10,
+    warmup: int = 2,
+    seed: int = 1234,
+    agent_ratio: float = 0.1,
+    max_collision_bodies: int = 1000,
+    physics_engine_cls=None,
+    behavior_engine_cls=None,
+    verbose: bool = True
+) -> Dict[str, Any]:
+    """Run the benchmark for every size and compute scaling curves"""
+    results = []
+    for size in sizes:
+        agent_count = int(size * agent_ratio)
+        if verbose:
+            print(f"[BENCH] bodies={size} agents={agent_count} ...", file=sys.stderr)
+        results.append(run_case(
+            size,
+            agent_count,
+            steps=steps,
+            warmup=warmup,
+            seed=seed,
+            max_collision_bodies=max_collision_bodies,
+            physics_engine_cls=physics_engine_cls,
+            behavior_engine_cls=behavior_engine_cls
+        ))
+
+    metrics = ["physics_step", "behavior_step", "collision_detection", "serialization", "simulator_step"]
+    return {
+        "config": {
+            "sizes": sizes,
+            "steps": steps,
+            "warmup": warmup,
+            "seed": seed,
+            "agent_ratio": agent_ratio,
+            "max_collision_bodies": max_collision_bodies,
+            "python": sys.version.split()[0],
+            "numpy": np.__version__
+        },
+        "results": results,
+        "scaling": {metric: scaling_exponents(results, metric) for metric in metrics}
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Render benchmark results as a plain-text table"""
+    header = (
+        f"{'bodies':>8} {'agents':>7} {'physics ms':>11} {'behavior ms':>12} "
+        f"{'collide ms':>11} {'serialize ms':>13} {'B/entity':>9} {'budget %':>9}"
+    )
+    lines = [header, "-" * len(header)]
+
+    def ms(entry: Dict[str, Any]) -> str:
+        return f"{entry['mean'] * 1000:.3f}" if entry.get("runs") else "skipped"
+
+    for r in report["results"]:
+        budget = r.get("tick_budget_utilization")
+        lines.append(
+            f"{r['bodies']:>8} {r['agents']:>7} {ms(r['physics_step']):>11} "
+            f"{ms(r['behavior_step']):>12} {ms(r['collision_detection']):>11} "
+            f"{ms(r['serialization']):>13} {r['memory_per_entity']:>9.0f} "
+            f"{(f'{budget * 100:.1f}' if budget is not None else '-'):>9}"
+        )
+
+    lines.append("")
+    lines.append("Scaling exponents (1.0 = linear, 2.0 = quadratic):")
+    for metric, curve in report["scaling"].items():
+        exponents = ", ".join(
+            f"{c['from']}->{c['to']}: {c['exponent']:.2f}" if c["exponent"] is not None
+            else f"{c['from']}->{c['to']}: n/a"
+            for c in curve
+        )
+        lines.append(f"  {metric}: {exponents or 'n/a'}")
+
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark Jarvis simulation scaling")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated body counts")
+    parser.add_argument("--steps", type=int, default=10, help="Timed steps per size")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed warmup steps")
+    parser.add_argument("--seed", type=int, default=1234, help="Random seed")
+    parser.add_argument("--agent-ratio", type=float, default=0.1,
+                        help="Agents per body")
+    parser.add_argument("--max-collision-bodies", type=int, default=1000,
+                        help="Skip quadratic collision detection above this size")
+    parser.add_argument("--physics-engine", help="Alternative engine as module:ClassName")
+    parser.add_argument("--behavior-engine", help="Alternative engine as module:ClassName")
+    parser.add_argument("--json", dest="json_output", help="Write the full report to this file")
+    args = parser.parse_args(argv)
+
+    report = run_suite(
+        sizes=[int(s) for s in args.sizes.split(",") if s.strip()],
+        steps=args.steps,
+        warmup=args.warmup,
+        seed=args.seed,
+        agent_ratio=args.agent_ratio,
+        max_collision_bodies=args.max_collision_bodies,
+        physics_engine_cls=load_engine_class(args.physics_engine) if args.physics_engine else None,
+        behavior_engine_cls=load_engine_class(args.behavior_engine) if args.behavior_engine else None
+    )
+
+    print(format_report(report))
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
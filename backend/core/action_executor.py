@@ -0,0 +1,116 @@
+"""
+Action Plan Executor
+
+Runs an action plan as a dependency graph. Each action declares which
+parts of the scene context it reads and writes; actions that do not
+depend on each other run concurrently, while their mutations to the
+context are always applied in plan order.
+"""
+from typing import Dict, Any, List, Optional, Callable, Awaitable, FrozenSet, Tuple
+from dataclasses import dataclass
+import asyncio
+
+
+# (reads, writes) sets of SceneContext state keys
+Footprint = Tuple[FrozenSet[str], FrozenSet[str]]
+
+
+@dataclass
+class ActionOutcome:
+    """
+    Result of running one action
+
+    `apply` carries the action's mutation of the scene context. It is
+    deferred so the executor can apply mutations in plan order no matter
+    in which order the actions finished.
+    """
+    result: Dict[str, Any]
+    apply: Optional[Callable[[], None]] = None
+
+
+class ActionPlanExecutor:
+    """
+    Executes action plans with dependency-aware concurrency
+
+    An action waits for every earlier action that writes state it reads
+    (read-after-write). Everything else may run concurrently, bounded by
+    max_concurrency. Write-after-write and write-after-read ordering is
+    preserved because mutations are committed strictly in plan order.
+    """
+
+    def __init__(self, max_concurrency: int = 4):
+        self.max_concurrency = max(1, max_concurrency)
+
+    @staticmethod
+    def build_dependencies(footprints: List[Footprint]) -> List[List[int]]:
+        """Return, for each action, the indices of earlier actions it must wait for"""
+        dependencies = []
+        for i, (reads, _) in enumerate(footprints):
+            dependencies.append([
+                j for j in range(i)
+                if footprints[j][1] & reads
+            ])
+        return dependencies
+
+    async def execute(
+        self,
+        plan: List[Dict[str, Any]],
+        run_action: Callable[[Dict[str, Any]], Awaitable[ActionOutcome]],
+        footprint: Callable[[Dict[str, Any]], Footprint],
+        on_result: Optional[Callable[[int, Dict[str, Any], Dict[str, Any]], Awaitable[None]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Execute a plan
+
+        Args:
+            plan: Ordered list of actions
+            run_action: Coroutine computing an action's outcome without mutating the context
+            footprint: Returns the (reads, writes) state keys of an action
+            on_result: Optional coroutine called as each action is committed
+
+        Returns:
+            Action results in plan order
+        """
+        dependencies = self.build_dependencies([footprint(action) for action in plan])
+        committed = [asyncio.Event() for _ in plan]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def prepare(index: int) -> ActionOutcome:
+            for dependency in dependencies[index]:
+                await committed[dependency].wait()
+            async with semaphore:
+                try:
+                    return await run_action(plan[index])
+                except Exception as e:
+                    return ActionOutcome({
+                        "status": "error",
+                        "action": plan[index].get("action", "unknown"),
+                        "error": str(e)
+                    })
+
+        tasks = [asyncio.create_task(prepare(i)) for i in range(len(plan))]
+        results = []
+
+        try:
+            # Single committer: apply mutations strictly in plan order
+            for index, task in enumerate(tasks):
+                outcome = await task
+                if outcome.apply is not None:
+                    try:
+                        outcome.apply()
+                    except Exception as e:
+                        outcome.result = {
+                            "status": "error",
+                            "action": plan[index].get("action", "unknown"),
+                            "error": str(e)
+                        }
+                committed[index].set()
+                results.append(outcome.result)
+                if on_result is not None:
+                    await on_result(index, plan[index], outcome.result)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        return results
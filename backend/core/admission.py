@@ -0,0 +1,328 @@
+"""
+Admission Control
+
+Limits how many requests each expensive endpoint runs at once, and how
+many of those slots a single client may take. Requests over the
+concurrency limit wait in a bounded FIFO queue; once the queue is full,
+or a request has waited too long, it is turned away immediately with a
+503 (or a 429 when one client exceeds its share) and a Retry-After
+header instead of slowing every other request down.
+"""
+from typing import Dict, Any, List, Optional, Iterable, Union
+from collections import deque
+from dataclasses import dataclass
+import asyncio
+import ipaddress
+import json
+import logging
+import math
+import os
+import time
+
+from core.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+
+# Endpoints placed under admission control
+ADMISSION_ENDPOINTS = tuple(
+    path.strip()
+    for path in os.getenv("JARVIS_ADMISSION_ENDPOINTS", "/api/process,/api/process/stream,/api/text,/api/batch").split(",")
+    if path.strip()
+)
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_networks(value: str) -> List[IPNetwork]:
+    """Networks from a comma-separated list of addresses and CIDR ranges"""
+    networks = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning("⚠️ [ADMISSION] Ignoring invalid trusted proxy %r", item)
+    return networks
+
+
+# Proxies (such as the shard router) whose X-Forwarded-For is believed
+TRUSTED_PROXIES = parse_networks(os.getenv("JARVIS_TRUSTED_PROXIES", ""))
+
+ADMITTED = registry.counter(
+    "jarvis_admission_admitted_total", "Requests admitted by admission control", ("endpoint",)
+)
+REJECTED = registry.counter(
+    "jarvis_admission_rejected_total", "Requests turned away by admission control", ("endpoint", "reason")
+)
+IN_FLIGHT = registry.gauge(
+    "jarvis_admission_in_flight", "Admitted requests currently running", ("endpoint",)
+)
+QUEUE_DEPTH = registry.gauge(
+    "jarvis_admission_queue_depth", "Requests waiting for an admission slot", ("endpoint",)
+)
+QUEUE_WAIT = registry.histogram(
+    "jarvis_admission_queue_wait_seconds", "Time admitted requests spent queued", ("endpoint",)
+)
+
+
+@dataclass
+class AdmissionLimits:
+    """Concurrency and queueing limits for one endpoint"""
+    max_concurrent: int = 8
+    max_queue: int = 32
+    # Seconds a request may wait in the queue before it is rejected
+    queue_timeout: float = 10.0
+    # Running plus queued requests allowed per client (0 disables)
+    max_per_client: int = 4
+
+    @classmethod
+    def from_env(cls) -> "AdmissionLimits":
+        return cls(
+            max_concurrent=int(os.getenv("JARVIS_ADMISSION_CONCURRENCY", "8")),
+            max_queue=int(os.getenv("JARVIS_ADMISSION_QUEUE", "32")),
+            queue_timeout=float(os.getenv("JARVIS_ADMISSION_QUEUE_TIMEOUT", "10")),
+            max_per_client=int(os.getenv("JARVIS_ADMISSION_PER_CLIENT", "4"))
+        )
+
+
+class AdmissionRejected(Exception):
+    """A request was not admitted"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class EndpointLimiter:
+    """
+    Concurrency slots and a bounded FIFO wait queue for one endpoint
+
+    A released slot is handed directly to the oldest waiter, so queued
+    requests are admitted in arrival order and new arrivals cannot jump
+    the queue.
+    """
+
+    def __init__(self, endpoint: str, limits: AdmissionLimits):
+        self.endpoint = endpoint
+        self.limits = limits
+        self.in_flight = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self._clients: Dict[str, int] = {}
+        # Moving average of how long an admitted request holds its slot
+        self._service_time = 1.0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {}
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up for a new request"""
+        backlog = (self.in_flight + len(self._waiters)) / max(self.limits.max_concurrent, 1)
+        return max(1, math.ceil(backlog * self._service_time))
+
+    async def acquire(self, client: str) -> float:
+        """Take a slot for a client, waiting if needed; returns the queue wait"""
+        limits = self.limits
+        if limits.max_per_client and self._clients.get(client, 0) >= limits.max_per_client:
+            self._reject("client_limit")
+            raise AdmissionRejected(429, "Too many concurrent requests from this client", self.retry_after())
+
+        if self.in_flight < limits.max_concurrent and not self._waiters:
+            self._admit(client)
+            return 0.0
+
+        if len(self._waiters) >= limits.max_queue:
+            self._reject("queue_full")
+            raise AdmissionRejected(503, "Server is at capacity", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._clients[client] = self._clients.get(client, 0) + 1
+        self._update_gauges()
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=limits.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended; pass it on
+                self._release_slot()
+            else:
+                waiter.cancel()
+                self._remove_waiter(waiter)
+            self._drop_client(client)
+            self._update_gauges()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject("queue_timeout")
+            raise AdmissionRejected(503, "Timed out waiting for capacity", self.retry_after())
+
+        waited = time.perf_counter() - queued_at
+        self.admitted += 1
+        ADMITTED.inc(self.endpoint)
+        QUEUE_WAIT.observe(self.endpoint, value=waited)
+        return waited
+
+    def release(self, client: str, held: float):
+        """Give back a client's slot after holding it for `held` seconds"""
+        self._service_time += 0.2 * (held - self._service_time)
+        self._drop_client(client)
+        self._release_slot()
+
+    def _admit(self, client: str):
+        self.in_flight += 1
+        self._clients[client] = self._clients.get(client, 0) + 1
+        self.admitted += 1
+        ADMITTED.inc(self.endpoint)
+        QUEUE_WAIT.observe(self.endpoint, value=0.0)
+        self._update_gauges()
+
+    def _release_slot(self):
+        # Hand the slot to the oldest waiter still waiting, if any
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._update_gauges()
+                return
+        self.in_flight -= 1
+        self._update_gauges()
+
+    def _remove_waiter(self, waiter: asyncio.Future):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _drop_client(self, client: str):
+        remaining = self._clients.get(client, 0) - 1
+        if remaining > 0:
+            self._clients[client] = remaining
+        else:
+            self._clients.pop(client, None)
+
+    def _reject(self, reason: str):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        REJECTED.inc(self.endpoint, reason)
+
+    def _update_gauges(self):
+        IN_FLIGHT.set(self.endpoint, value=self.in_flight)
+        QUEUE_DEPTH.set(self.endpoint, value=len(self._waiters))
+
+    def stats(self) -> Dict[str, Any]:
+        """Get slot usage, queue depth and rejection counts"""
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "clients": len(self._clients),
+            "max_concurrent": self.limits.max_concurrent,
+            "max_queue": self.limits.max_queue,
+            "max_per_client": self.limits.max_per_client,
+            "mean_service_time": round(self._service_time, 3),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected)
+        }
+
+
+def is_trusted_proxy(address: Optional[str], trusted: Iterable[IPNetwork] = TRUSTED_PROXIES) -> bool:
+    """Whether an address is one of the trusted proxies"""
+    if not address:
+        return False
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted)
+
+
+def client_key(scope, trusted_proxies: Iterable[IPNetwork] = TRUSTED_PROXIES) -> str:
+    """
+    Client identity: the peer address, or behind a trusted proxy the
+    right-most X-Forwarded-For hop that is not itself a trusted proxy
+
+    Hops left of that one are set by the client and are ignored.
+    """
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    trusted_proxies = list(trusted_proxies)
+    if not trusted_proxies or not is_trusted_proxy(peer, trusted_proxies):
+        return peer
+
+    hops = [
+        hop.strip()
+        for name, value in scope.get("headers", [])
+        if name == b"x-forwarded-for"
+        for hop in value.decode("latin-1").split(",")
+        if hop.strip()
+    ]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop, trusted_proxies):
+            return hop
+    return hops[0] if hops else peer
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying admission control to selected endpoints
+
+    The slot is held until the response has been sent, so streamed
+    responses count against the limit for their whole duration.
+    """
+
+    def __init__(
+        self,
+        app,
+        endpoints: Iterable[str] = ADMISSION_ENDPOINTS,
+        limits: Optional[AdmissionLimits] = None,
+        trusted_proxies: Optional[Iterable[IPNetwork]] = None
+    ):
+        self.app = app
+        self.trusted_proxies = list(TRUSTED_PROXIES if trusted_proxies is None else trusted_proxies)
+        limits = limits or AdmissionLimits.from_env()
+        self.limiters = {endpoint: EndpointLimiter(endpoint, limits) for endpoint in endpoints}
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.limiters.get(scope.get("path")) if scope["type"] == "http" else None
+        if limiter is None or scope.get("method") == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        client = client_key(scope, self.trusted_proxies)
+        try:
+            await limiter.acquire(client)
+        except AdmissionRejected as rejection:
+            logger.warning(
+                "⚠️ [ADMISSION] %s rejected for %s: %s (retry after %ss)",
+                limiter.endpoint, client, rejection.reason, rejection.retry_after
+            )
+            await _send_rejection(send, rejection)
+            return
+
+        admitted_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(client, time.perf_counter() - admitted_at)
+
+    def stats(self) -> Dict[str, Any]:
+        return {endpoint: limiter.stats() for endpoint, limiter in self.limiters.items()}
+
+
+async def _send_rejection(send, rejection: AdmissionRejected):
+    body = json.dumps({"detail": rejection.reason}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": rejection.status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(rejection.retry_after).encode("latin-1"))
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
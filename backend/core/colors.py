@@ -0,0 +1,190 @@
+"""
+Color Service
+
+One named color palette shared by NLP, planning, 3D generation and
+computer vision. RGB values are mapped to the nearest palette name
+through a precomputed lookup table over quantized RGB (5 bits per
+channel), so a lookup is a single index operation, for one color or for
+a whole array of pixels at once.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import threading
+
+
+# Named colors and the hex codes generated objects use for them
+PALETTE: Dict[str, str] = {
+    "red": "#ff0000",
+    "crimson": "#dc143c",
+    "maroon": "#800000",
+    "pink": "#ffc0cb",
+    "coral": "#ff7f50",
+    "salmon": "#fa8072",
+    "orange": "#ffa500",
+    "gold": "#ffd700",
+    "yellow": "#ffff00",
+    "khaki": "#f0e68c",
+    "beige": "#f5f5dc",
+    "tan": "#d2b48c",
+    "brown": "#8B4513",
+    "olive": "#808000",
+    "green": "#00ff00",
+    "teal": "#008080",
+    "cyan": "#00ffff",
+    "turquoise": "#40e0d0",
+    "blue": "#0000ff",
+    "navy": "#000080",
+    "indigo": "#4b0082",
+    "purple": "#800080",
+    "violet": "#ee82ee",
+    "magenta": "#ff00ff",
+    "lavender": "#e6e6fa",
+    "white": "#ffffff",
+    "silver": "#c0c0c0",
+    "gray": "#808080",
+    "charcoal": "#36454f",
+    "black": "#000000",
+}
+
+# Other spellings accepted for palette colors
+ALIASES: Dict[str, str] = {
+    "grey": "gray",
+    "golden": "gold",
+    "aqua": "cyan",
+    "fuchsia": "magenta",
+}
+
+# Additional RGB points that should map to a palette name
+_EXTRA_REFERENCES: Dict[str, Tuple[str, ...]] = {
+    "green": ("#008000",),
+}
+
+COLOR_NAMES: Tuple[str, ...] = tuple(PALETTE)
+
+DEFAULT_HEX = "#808080"
+
+# RGB values farther than this from every palette color have no name
+MAX_DISTANCE = 100.0
+
+# Bits kept per channel in the lookup table (32 levels, 32768 entries)
+_BITS = 5
+_SHIFT = 8 - _BITS
+_LEVELS = 1 << _BITS
+# Lookup table value for "no palette color close enough"
+NO_COLOR_INDEX = 255
+
+_lut: Optional[bytes] = None
+_lut_lock = threading.Lock()
+
+
+def hex_to_rgb(hex_code: str) -> Tuple[int, int, int]:
+    value = hex_code.lstrip("#")
+    return int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+
+
+def canonical_name(word: str) -> Optional[str]:
+    """Palette name for a color word or alias, or None if it is not a color"""
+    word = word.lower()
+    if word in PALETTE:
+        return word
+    return ALIASES.get(word)
+
+
+def name_to_hex(color: str, default: Optional[str] = DEFAULT_HEX) -> Optional[str]:
+    """Hex code for a color name; hex codes are returned as they are"""
+    if color.startswith("#"):
+        return color
+    name = canonical_name(color)
+    return PALETTE[name] if name else default
+
+
+def _references() -> List[Tuple[int, Tuple[int, int, int]]]:
+    """(palette index, rgb) for every point in the lookup table"""
+    references = [(index, hex_to_rgb(PALETTE[name])) for index, name in enumerate(COLOR_NAMES)]
+    for name, extra in _EXTRA_REFERENCES.items():
+        references.extend((COLOR_NAMES.index(name), hex_to_rgb(code)) for code in extra)
+    return references
+
+
+def _build_lut() -> bytes:
+    """Nearest palette index for the center of every quantized RGB cell"""
+    references = _references()
+    offset = (1 << _SHIFT) / 2
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+    if np is not None:
+        levels = np.arange(_LEVELS) * (1 << _SHIFT) + offset
+        r, g, b = np.meshgrid(levels, levels, levels, indexing="ij")
+        centers = np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1)
+        points = np.array([rgb for _, rgb in references], dtype=np.float64)
+        indexes = np.array([index for index, _ in references], dtype=np.uint8)
+        distances = ((centers[:, None, :] - points[None, :, :]) ** 2).sum(axis=2)
+        nearest = distances.argmin(axis=1)
+        table = indexes[nearest]
+        table[distances[np.arange(len(centers)), nearest] > MAX_DISTANCE ** 2] = NO_COLOR_INDEX
+        return table.astype(np.uint8).tobytes()
+
+    table = bytearray(_LEVELS ** 3)
+    limit = MAX_DISTANCE ** 2
+    for cell in range(len(table)):
+        cr = (cell >> (2 * _BITS)) * (1 << _SHIFT) + offset
+        cg = ((cell >> _BITS) & (_LEVELS - 1)) * (1 << _SHIFT) + offset
+        cb = (cell & (_LEVELS - 1)) * (1 << _SHIFT) + offset
+        best, best_distance = NO_COLOR_INDEX, float("inf")
+        for index, (pr, pg, pb) in references:
+            distance = (cr - pr) ** 2 + (cg - pg) ** 2 + (cb - pb) ** 2
+            if distance < best_distance:
+                best, best_distance = index, distance
+        table[cell] = best if best_distance <= limit else NO_COLOR_INDEX
+    return bytes(table)
+
+
+def _table() -> bytes:
+    global _lut
+    if _lut is None:
+        with _lut_lock:
+            if _lut is None:
+                _lut = _build_lut()
+    return _lut
+
+
+def warm_up():
+    """Build the lookup table ahead of the first lookup"""
+    _table()
+
+
+def rgb_to_name(rgb: Sequence[int]) -> Optional[str]:
+    """Nearest palette name for an RGB color, or None if nothing is close"""
+    if len(rgb) < 3:
+        return None
+    r, g, b = (min(max(int(channel), 0), 255) for channel in rgb[:3])
+    index = _table()[(r >> _SHIFT) << (2 * _BITS) | (g >> _SHIFT) << _BITS | (b >> _SHIFT)]
+    return COLOR_NAMES[index] if index != NO_COLOR_INDEX else None
+
+
+def rgb_array_to_indices(pixels):
+    """
+    Palette index of every pixel in an (..., 3) uint8 RGB array
+
+    Pixels with no palette color close enough get NO_COLOR_INDEX.
+    """
+    import numpy as np
+
+    pixels = np.asarray(pixels, dtype=np.uint8)
+    cells = (
+        (pixels[..., 0].astype(np.intp) >> _SHIFT) << (2 * _BITS)
+        | (pixels[..., 1].astype(np.intp) >> _SHIFT) << _BITS
+        | (pixels[..., 2].astype(np.intp) >> _SHIFT)
+    )
+    return np.frombuffer(_table(), dtype=np.uint8)[cells]
+
+
+def rgb_array_to_names(pixels):
+    """Palette name (or None) of every pixel in an (..., 3) uint8 RGB array"""
+    import numpy as np
+
+    names = np.array(COLOR_NAMES + (None,) * (256 - len(COLOR_NAMES)), dtype=object)
+    return names[rgb_array_to_indices(pixels)]
+
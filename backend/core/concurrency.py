@@ -0,0 +1,141 @@
+"""
+Per-Context Concurrency Control
+
+Serializes work on the same scene context while letting different
+contexts run fully in parallel, and measures how fairly lock wait time
+is spread across contexts.
+"""
+from typing import Dict, Any, List
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+import asyncio
+import time
+
+
+@dataclass
+class _LockEntry:
+    """A context lock and the number of tasks holding or waiting for it"""
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    users: int = 0
+
+
+@dataclass
+class _ContextWaitStats:
+    """Accumulated lock wait statistics for one context"""
+    acquisitions: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    total_hold: float = 0.0
+
+
+class ContextLockManager:
+    """
+    Async locks keyed by context id
+
+    Locks are created on first use and discarded once no task holds or
+    waits for them. asyncio.Lock wakes waiters in FIFO order, so requests
+    for the same context are applied in arrival order.
+    """
+
+    def __init__(self, max_tracked_contexts: int = 1000):
+        self._locks: Dict[str, _LockEntry] = {}
+        self.max_tracked_contexts = max_tracked_contexts
+        self._wait_stats: "OrderedDict[str, _ContextWaitStats]" = OrderedDict()
+        self.acquisitions = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @asynccontextmanager
+    async def acquire(self, context_id: str):
+        """Hold the lock for a context for the duration of the block"""
+        entry = self._locks.get(context_id)
+        if entry is None:
+            entry = self._locks[context_id] = _LockEntry()
+        entry.users += 1
+
+        requested_at = time.perf_counter()
+        try:
+            async with entry.lock:
+                acquired_at = time.perf_counter()
+                try:
+                    yield
+                finally:
+                    self._record(context_id, acquired_at - requested_at, time.perf_counter() - acquired_at)
+        finally:
+            entry.users -= 1
+            if entry.users == 0 and self._locks.get(context_id) is entry:
+                del self._locks[context_id]
+
+    def is_busy(self, context_id: str) -> bool:
+        """
+        Whether any task holds or waits for a context's lock
+
+        The context store uses this to keep contexts with in-progress
+        requests from being evicted.
+        """
+        return context_id in self._locks
+
+    def _record(self, context_id: str, wait: float, hold: float):
+        self.acquisitions += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+        stats = self._wait_stats.get(context_id)
+        if stats is None:
+            stats = self._wait_stats[context_id] = _ContextWaitStats()
+            if len(self._wait_stats) > self.max_tracked_contexts:
+                self._wait_stats.popitem(last=False)
+        else:
+            self._wait_stats.move_to_end(context_id)
+
+        stats.acquisitions += 1
+        stats.total_wait += wait
+        stats.max_wait = max(stats.max_wait, wait)
+        stats.total_hold += hold
+
+    def fairness_index(self) -> float:
+        """
+        Jain's fairness index over the mean lock wait of each context
+
+        1.0 means every context waits equally long; values near 1/n mean a
+        few contexts absorb nearly all of the waiting.
+        """
+        mean_waits = [
+            stats.total_wait / stats.acquisitions
+            for stats in self._wait_stats.values()
+            if stats.acquisitions
+        ]
+        total = sum(mean_waits)
+        squares = sum(w * w for w in mean_waits)
+        if not mean_waits or squares == 0:
+            return 1.0
+        return (total * total) / (len(mean_waits) * squares)
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        """Get lock occupancy, wait times and fairness across contexts"""
+        busiest: List[Dict[str, Any]] = sorted(
+            (
+                {
+                    "context_id": context_id,
+                    "acquisitions": stats.acquisitions,
+                    "mean_wait": stats.total_wait / stats.acquisitions,
+                    "max_wait": stats.max_wait,
+                    "mean_hold": stats.total_hold / stats.acquisitions
+                }
+                for context_id, stats in self._wait_stats.items()
+                if stats.acquisitions
+            ),
+            key=lambda item: item["mean_wait"],
+            reverse=True
+        )[:top]
+
+        return {
+            "active_contexts": len(self._locks),
+            "waiting": sum(max(0, entry.users - 1) for entry in self._locks.values()),
+            "acquisitions": self.acquisitions,
+            "mean_wait": self.total_wait / self.acquisitions if self.acquisitions else 0.0,
+            "max_wait": self.max_wait,
+            "fairness_index": self.fairness_index(),
+            "slowest_contexts": busiest
+        }
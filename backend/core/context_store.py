@@ -0,0 +1,543 @@
+"""
+Scene Context Store
+
+Bounded, dict-like storage for active scene contexts with LRU and idle-TTL
+eviction and an approximate memory cap. With a persistent backend, the
+store only holds hot contexts in memory and loads the rest lazily. In
+shared mode several worker processes use the same backend, and cached
+contexts are revalidated against the stored version on every access.
+
+Request handlers use the *_async methods, which run backend reads and
+writes in a worker thread so a slow or contended backend never blocks
+the event loop.
+"""
+from typing import Dict, Any, List, Optional, Callable, Iterator, Set, Tuple
+from collections import OrderedDict
+from collections.abc import MutableMapping
+import asyncio
+import json
+import logging
+import time
+
+from core.persistence import ContextBackend, ContextVersionConflict
+
+logger = logging.getLogger(__name__)
+
+
+# Called as hook(context_id, context, reason) whenever a context is evicted
+EvictionHook = Callable[[str, Any, str], None]
+
+
+def estimate_context_size(context) -> int:
+    """
+    Approximate the memory held by a scene context in bytes
+
+    Uses the length of its JSON encoding, which tracks the object and
+    history payloads that dominate context memory.
+    """
+    try:
+        return len(json.dumps(
+            [list(context.objects), context.environment, context.lighting,
+             context.camera, list(context.history)],
+            default=str
+        ))
+    except Exception:
+        return 0
+
+
+class ContextStore(MutableMapping):
+    """
+    Dict-like context store with bounded size
+
+    Contexts are evicted least-recently-used first when the store exceeds
+    `max_contexts` or `max_memory_bytes`, and are dropped once idle for
+    longer than `idle_ttl` seconds. Every eviction is counted and passed
+    to the registered eviction hooks.
+
+    When a `backend` is given, contexts are persisted on `commit()`,
+    either immediately (write-through) or on the next `flush()`
+    (write-behind). Evicted contexts stay in the backend and are loaded
+    back on their next access.
+
+    Contexts that `is_busy` reports as in use (e.g. locked by a request)
+    are never evicted, so a request's changes cannot be dropped between
+    its edits and its commit. Contexts with unsaved write-behind changes
+    are not evicted either; a background flush saves them first, and
+    they become evictable once written.
+
+    Every persisted context carries a version. Saves are optimistic: if
+    another worker saved the context first, `commit()` raises
+    ContextVersionConflict and the caller should `reload()` and retry.
+
+    `pending_history` returns a context's queue of history entries waiting
+    to be stored. They are written in the same save as the context and
+    removed from the queue only once that save succeeds, so a conflicting
+    attempt that is reloaded and retried never stores them twice.
+
+    The mapping interface and the synchronous methods call the backend
+    directly; `get_async()`, `commit_async()`, `reload_async()`,
+    `delete_async()`, `release_async()` and `flush_async()` do the same
+    work with backend calls moved to a thread.
+    """
+
+    def __init__(
+        self,
+        max_contexts: Optional[int] = None,
+        idle_ttl: Optional[float] = None,
+        max_memory_bytes: Optional[int] = None,
+        size_estimator: Callable[[Any], int] = estimate_context_size,
+        clock: Callable[[], float] = time.monotonic,
+        backend: Optional[ContextBackend] = None,
+        serializer: Optional[Callable[[Any], Dict[str, Any]]] = None,
+        deserializer: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        pending_history: Optional[Callable[[Any], List[Dict[str, Any]]]] = None,
+        write_behind: bool = False,
+        shared: bool = False,
+        is_busy: Optional[Callable[[str], bool]] = None
+    ):
+        self.max_contexts = max_contexts
+        self.idle_ttl = idle_ttl
+        self.max_memory_bytes = max_memory_bytes
+        self.size_estimator = size_estimator
+        self.clock = clock
+        self.backend = backend
+        self.serializer = serializer
+        self.deserializer = deserializer
+        self.pending_history = pending_history
+        self.write_behind = write_behind
+        self.shared = shared
+        self.is_busy = is_busy
+        self._flush_task: Optional[asyncio.Task] = None
+        self._dirty: Set[str] = set()
+        self._versions: Dict[str, int] = {}
+        self.loads = 0
+        self.writes = 0
+        self.conflicts = 0
+
+        self._contexts: "OrderedDict[str, Any]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self._memory_bytes = 0
+        self._eviction_hooks: List[EvictionHook] = []
+        self.evictions: Dict[str, int] = {"lru": 0, "ttl": 0, "memory": 0, "released": 0}
+
+    def add_eviction_hook(self, hook: EvictionHook):
+        """Register a callback invoked for every evicted context"""
+        self._eviction_hooks.append(hook)
+
+    # Mapping interface
+
+    def __getitem__(self, context_id: str):
+        self._expire(context_id)
+        if self.shared:
+            self._revalidate(context_id)
+        if context_id not in self._contexts and not self._load(context_id):
+            raise KeyError(context_id)
+        context = self._contexts[context_id]
+        self._touch(context_id)
+        return context
+
+    def __setitem__(self, context_id: str, context):
+        if context_id in self._contexts:
+            self._memory_bytes -= self._sizes.get(context_id, 0)
+        self._contexts[context_id] = context
+        self._sizes[context_id] = self.size_estimator(context)
+        self._memory_bytes += self._sizes[context_id]
+        self._versions.setdefault(context_id, 0)
+        self._touch(context_id)
+        self.sweep()
+        self._enforce_limits(keep=context_id)
+
+    def __delitem__(self, context_id: str):
+        """Delete a context from memory and from the backend"""
+        if context_id not in self._contexts and not self._load(context_id):
+            raise KeyError(context_id)
+        self._drop(context_id)
+        self._dirty.discard(context_id)
+        if self.backend is not None:
+            self.backend.delete(context_id)
+
+    def __contains__(self, context_id) -> bool:
+        self._expire(context_id)
+        if self.shared:
+            self._revalidate(context_id)
+        if context_id in self._contexts:
+            return True
+        return self._load(context_id)
+
+    def __iter__(self) -> Iterator[str]:
+        # Iterate over a snapshot so lookups during iteration are safe
+        return iter(list(self._contexts.keys()))
+
+    def __len__(self) -> int:
+        return len(self._contexts)
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """Snapshot of (context_id, context) pairs without refreshing recency"""
+        return list(self._contexts.items())
+
+    def values(self) -> List[Any]:
+        """Snapshot of contexts without refreshing recency"""
+        return list(self._contexts.values())
+
+    def clear(self):
+        """Drop every context from memory; persisted copies are kept"""
+        self._contexts.clear()
+        self._versions.clear()
+        self._last_access.clear()
+        self._sizes.clear()
+        self._memory_bytes = 0
+
+    # Asynchronous access for request handlers
+
+    async def get_async(self, context_id: str) -> Optional[Any]:
+        """Context by id, loading it from the backend if needed; None if missing"""
+        self._expire(context_id)
+        if self.shared:
+            await self._revalidate_async(context_id)
+        if context_id not in self._contexts and not await self._load_async(context_id):
+            return None
+        self._touch(context_id)
+        return self._contexts[context_id]
+
+    async def commit_async(self, context_id: str):
+        """
+        Like commit(), with the backend write in a worker thread
+
+        Raises:
+            ContextVersionConflict: another worker saved the context first
+            KeyError: the context is no longer held in memory
+        """
+        if context_id not in self._contexts:
+            raise KeyError(context_id)
+        if self.backend is not None:
+            if self.write_behind:
+                self._dirty.add(context_id)
+            else:
+                await self._save_async(context_id)
+        self.update_size(context_id)
+
+    async def reload_async(self, context_id: str):
+        """Like reload(), with the backend read in a worker thread"""
+        self._dirty.discard(context_id)
+        if context_id in self._contexts:
+            self._drop(context_id)
+        if not await self._load_async(context_id):
+            raise KeyError(context_id)
+        return self._contexts[context_id]
+
+    async def delete_async(self, context_id: str) -> bool:
+        """Delete a context from memory and the backend; False if it did not exist"""
+        if await self.get_async(context_id) is None:
+            return False
+        self._drop(context_id)
+        self._dirty.discard(context_id)
+        if self.backend is not None:
+            await asyncio.to_thread(self.backend.delete, context_id)
+        return True
+
+    async def release_async(self, context_id: str) -> bool:
+        """Like release(), writing pending changes in a worker thread"""
+        if context_id not in self._contexts:
+            return False
+        if context_id in self._dirty:
+            self._dirty.discard(context_id)
+            try:
+                await self._save_async(context_id)
+            except ContextVersionConflict as e:
+                logger.warning("⚠️ [CONTEXT_STORE] Dropping stale write: %s", e)
+        return self.release(context_id)
+
+    async def flush_async(self) -> int:
+        """Like flush(), with the backend writes in a worker thread"""
+        pending = list(self._dirty)
+        for context_id in pending:
+            # Discarded first so a commit made during the write marks it again
+            self._dirty.discard(context_id)
+            if context_id in self._contexts:
+                try:
+                    await self._save_async(context_id)
+                except ContextVersionConflict as e:
+                    logger.warning("⚠️ [CONTEXT_STORE] Dropping stale write: %s", e)
+        return len(pending)
+
+    # Size and eviction management
+
+    @property
+    def memory_bytes(self) -> int:
+        """Approximate memory held by all stored contexts"""
+        return self._memory_bytes
+
+    def version(self, context_id: str) -> int:
+        """Persisted version of a cached context (0 if never saved)"""
+        return self._versions.get(context_id, 0)
+
+    def reload(self, context_id: str):
+        """Replace the cached copy of a context with the persisted one"""
+        self._dirty.discard(context_id)
+        if context_id in self._contexts:
+            self._drop(context_id)
+        if not self._load(context_id):
+            raise KeyError(context_id)
+        return self._contexts[context_id]
+
+    def release(self, context_id: str) -> bool:
+        """
+        Flush a context and drop it from memory, keeping the persisted copy
+
+        Used when another worker takes over ownership of the context.
+        """
+        if context_id not in self._contexts:
+            return False
+        self._evict(context_id, "released")
+        return True
+
+    def commit(self, context_id: str):
+        """
+        Record that a context changed: re-measure it and persist it
+
+        Raises:
+            ContextVersionConflict: another worker saved the context first
+            KeyError: the context is no longer held in memory
+        """
+        if context_id not in self._contexts:
+            raise KeyError(context_id)
+        if self.backend is not None:
+            if self.write_behind:
+                self._dirty.add(context_id)
+            else:
+                self._save(context_id)
+        self.update_size(context_id)
+
+    def flush(self) -> int:
+        """Write every pending write-behind context to the backend"""
+        pending = list(self._dirty)
+        for context_id in pending:
+            if context_id in self._contexts:
+                try:
+                    self._save(context_id)
+                except ContextVersionConflict as e:
+                    logger.warning("⚠️ [CONTEXT_STORE] Dropping stale write: %s", e)
+        self._dirty.difference_update(pending)
+        return len(pending)
+
+    def update_size(self, context_id: str):
+        """Re-measure a context after it changed and enforce the memory cap"""
+        if context_id not in self._contexts:
+            return
+        new_size = self.size_estimator(self._contexts[context_id])
+        self._memory_bytes += new_size - self._sizes.get(context_id, 0)
+        self._sizes[context_id] = new_size
+        self._enforce_limits(keep=context_id)
+
+    def sweep(self) -> int:
+        """Evict every context idle for longer than the TTL"""
+        if not self.idle_ttl:
+            return 0
+        expired = [cid for cid in self._contexts if self._is_expired(cid)]
+        return sum(1 for context_id in expired if self._expire(context_id))
+
+    def stats(self) -> Dict[str, Any]:
+        """Get store occupancy and eviction counters"""
+        return {
+            "contexts": len(self._contexts),
+            "max_contexts": self.max_contexts,
+            "memory_bytes": self._memory_bytes,
+            "max_memory_bytes": self.max_memory_bytes,
+            "idle_ttl": self.idle_ttl,
+            "evictions": dict(self.evictions),
+            "backend": self.backend.name if self.backend is not None else None,
+            "write_behind": self.write_behind,
+            "pending_writes": len(self._dirty),
+            "shared": self.shared,
+            "loads": self.loads,
+            "writes": self.writes,
+            "conflicts": self.conflicts
+        }
+
+    def _can_load(self, context_id: str) -> bool:
+        return self.backend is not None and self.deserializer is not None and isinstance(context_id, str)
+
+    def _load(self, context_id: str) -> bool:
+        """Lazily bring a persisted context into memory"""
+        if not self._can_load(context_id):
+            return False
+        loaded = self.backend.load(context_id)
+        if loaded is None:
+            return False
+        self._install(context_id, *loaded)
+        return True
+
+    async def _load_async(self, context_id: str) -> bool:
+        if not self._can_load(context_id):
+            return False
+        loaded = await asyncio.to_thread(self.backend.load, context_id)
+        if context_id in self._contexts:
+            # Loaded by another request while this one waited
+            return True
+        if loaded is None:
+            return False
+        self._install(context_id, *loaded)
+        return True
+
+    def _install(self, context_id: str, data: Dict[str, Any], version: int):
+        context = self.deserializer(data)
+        self._contexts[context_id] = context
+        self._versions[context_id] = version
+        self._sizes[context_id] = self.size_estimator(context)
+        self._memory_bytes += self._sizes[context_id]
+        self._touch(context_id)
+        self.loads += 1
+        self._enforce_limits(keep=context_id)
+
+    def _save(self, context_id: str):
+        if self.backend is None or self.serializer is None:
+            return
+        context = self._contexts[context_id]
+        history = self._history_to_store(context)
+        try:
+            self._versions[context_id] = self.backend.save(
+                context_id,
+                self.serializer(context),
+                expected_version=self._versions.get(context_id, 0),
+                history=history
+            )
+        except ContextVersionConflict:
+            self.conflicts += 1
+            raise
+        self._saved(context, history)
+
+    async def _save_async(self, context_id: str):
+        if self.backend is None or self.serializer is None:
+            return
+        context = self._contexts[context_id]
+        data = self.serializer(context)
+        history = self._history_to_store(context)
+        try:
+            version = await asyncio.to_thread(
+                self.backend.save, context_id, data, self._versions.get(context_id, 0), history
+            )
+        except ContextVersionConflict:
+            self.conflicts += 1
+            raise
+        if self._contexts.get(context_id) is context:
+            self._versions[context_id] = version
+        self._saved(context, history)
+
+    def _history_to_store(self, context) -> List[Dict[str, Any]]:
+        return list(self.pending_history(context)) if self.pending_history is not None else []
+
+    def _saved(self, context, history: List[Dict[str, Any]]):
+        if history:
+            # Entries queued while the save ran stay for the next one
+            del self.pending_history(context)[:len(history)]
+        self.writes += 1
+
+    def _revalidation_version(self, context_id: str) -> Optional[int]:
+        """Cached version to check against the backend, or None if no check is needed"""
+        if self.backend is None or context_id not in self._contexts or context_id in self._dirty:
+            return None
+        cached_version = self._versions.get(context_id, 0)
+        # Version 0: created here and not saved yet
+        return cached_version or None
+
+    def _revalidate(self, context_id: str):
+        """Drop a cached context that another worker changed or deleted"""
+        cached_version = self._revalidation_version(context_id)
+        if cached_version is not None and self.backend.get_version(context_id) != cached_version:
+            self._drop(context_id)
+
+    async def _revalidate_async(self, context_id: str):
+        cached_version = self._revalidation_version(context_id)
+        if cached_version is None:
+            return
+        stored_version = await asyncio.to_thread(self.backend.get_version, context_id)
+        if stored_version != cached_version and self._versions.get(context_id) == cached_version:
+            self._drop(context_id)
+
+    def _drop(self, context_id: str):
+        """Remove a context from memory only"""
+        del self._contexts[context_id]
+        self._versions.pop(context_id, None)
+        self._last_access.pop(context_id, None)
+        self._memory_bytes -= self._sizes.pop(context_id, 0)
+
+    def _touch(self, context_id: str):
+        self._contexts.move_to_end(context_id)
+        self._last_access[context_id] = self.clock()
+
+    def _is_expired(self, context_id: str) -> bool:
+        if not self.idle_ttl:
+            return False
+        last_access = self._last_access.get(context_id)
+        return last_access is not None and self.clock() - last_access > self.idle_ttl
+
+    def _enforce_limits(self, keep: Optional[str] = None):
+        """Evict least-recently-used contexts until within limits"""
+        while self.max_contexts and len(self._contexts) > self.max_contexts:
+            if not self._evict_oldest("lru", keep):
+                break
+        while self.max_memory_bytes and self._memory_bytes > self.max_memory_bytes:
+            if not self._evict_oldest("memory", keep):
+                break
+
+    def _evict_oldest(self, reason: str, keep: Optional[str]) -> bool:
+        for context_id in self._contexts:
+            if context_id != keep and self._evictable(context_id):
+                self._evict(context_id, reason)
+                return True
+        return False
+
+    def _expire(self, context_id: str) -> bool:
+        """Evict a context if it is past its TTL and nothing is using it"""
+        if self._is_expired(context_id) and self._evictable(context_id):
+            self._evict(context_id, "ttl")
+            return True
+        return False
+
+    def _evictable(self, context_id: str) -> bool:
+        if self.is_busy is not None and self.is_busy(context_id):
+            return False
+        if context_id in self._dirty:
+            # Saving here would block the request that triggered the eviction
+            self._schedule_flush()
+            return False
+        return True
+
+    def _schedule_flush(self):
+        """Start a background flush, after which limits are enforced again"""
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._flush_task = loop.create_task(self._flush_and_enforce())
+
+    async def _flush_and_enforce(self):
+        try:
+            await self.flush_async()
+        except Exception as e:
+            logger.warning("⚠️ [CONTEXT_STORE] Background flush failed: %s", e)
+        self.sweep()
+        self._enforce_limits()
+
+    def _evict(self, context_id: str, reason: str):
+        context = self._contexts.get(context_id)
+        if context is None:
+            return
+        # Only release() gets here with pending changes; LRU and TTL
+        # eviction skip dirty contexts until the background flush ran
+        if context_id in self._dirty:
+            try:
+                self._save(context_id)
+            except ContextVersionConflict as e:
+                logger.warning("⚠️ [CONTEXT_STORE] Dropping stale write: %s", e)
+            self._dirty.discard(context_id)
+        self._drop(context_id)
+        self.evictions[reason] = self.evictions.get(reason, 0) + 1
+        for hook in self._eviction_hooks:
+            try:
+                hook(context_id, context, reason)
+            except Exception as e:
+                logger.warning("⚠️ [CONTEXT_STORE] Eviction hook failed for %s: %s", context_id, e)
@@ -0,0 +1,90 @@
+"""
+JSON Encoding
+
+Fast JSON encoding for API responses. Uses orjson when it is installed
+and the standard library otherwise.
+
+Scene objects do not change once generated, so the object store keeps
+each object's encoded bytes. A scene snapshot carries those bytes in an
+EncodedList, and encode() splices them into the response by
+concatenation instead of encoding every object again.
+"""
+from typing import Any, Dict, Iterable, List
+import json
+import logging
+
+from fastapi.responses import JSONResponse
+
+from core.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    HAS_ORJSON = False
+
+
+if HAS_ORJSON:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(value: Any) -> bytes:
+        """Encode a value as compact UTF-8 JSON"""
+        return orjson.dumps(value, default=str, option=_ORJSON_OPTIONS)
+else:
+    _encoder = json.JSONEncoder(
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=str
+    )
+
+    def dumps(value: Any) -> bytes:
+        """Encode a value as compact UTF-8 JSON"""
+        return _encoder.encode(value).encode("utf-8")
+
+
+class EncodedList(list):
+    """
+    List of JSON-compatible items with each item's encoding alongside
+
+    Behaves like a plain list in process; encode() uses the stored bytes
+    instead of encoding the items again.
+    """
+
+    def __init__(self, items: Iterable[Any], encoded: List[bytes]):
+        super().__init__(items)
+        self.encoded = encoded
+
+
+def _has_fragments(value: Dict[str, Any]) -> bool:
+    for item in value.values():
+        if isinstance(item, EncodedList) or (isinstance(item, dict) and _has_fragments(item)):
+            return True
+    return False
+
+
+def encode(value: Any) -> bytes:
+    """
+    Encode a value as JSON, splicing in pre-encoded lists
+
+    Only dicts on the path to an EncodedList are assembled piece by piece;
+    everything else is encoded in a single call.
+    """
+    if isinstance(value, EncodedList):
+        return b"[" + b",".join(value.encoded) + b"]"
+    if isinstance(value, dict) and _has_fragments(value):
+        return b"{" + b",".join(
+            dumps(str(key)) + b":" + encode(item) for key, item in value.items()
+        ) + b"}"
+    return dumps(value)
+
+
+class JarvisJSONResponse(JSONResponse):
+    """JSON response rendered with encode(), keeping cached object encodings"""
+
+    def render(self, content: Any) -> bytes:
+        with span("encode"):
+            return encode(content)
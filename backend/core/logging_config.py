@@ -0,0 +1,152 @@
+"""
+Logging Configuration
+
+Leveled, per-module logging for the backend. Modules log through
+`logging.getLogger(__name__)`; records are put on an in-process queue and
+written by a background listener thread, so request handlers never block
+on stdout. DEBUG records can be sampled to keep verbose tracing
+affordable in production.
+
+Environment:
+    JARVIS_LOG_LEVEL: root level (default INFO)
+    JARVIS_LOG_LEVELS: per-module overrides, e.g. "nlp=DEBUG,core.context_store=WARNING"
+    JARVIS_LOG_DEBUG_SAMPLE_RATE: fraction of DEBUG records kept (default 1.0)
+    JARVIS_LOG_FORMAT: "text" (default) or "json"
+"""
+from typing import Dict, Optional
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+
+from core.telemetry import current_request_id
+
+
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s %(name)s [%(request_id)s]: %(message)s"
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+class DebugSampler(logging.Filter):
+    """Keep a random fraction of DEBUG records; other levels always pass"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class RequestIdFilter(logging.Filter):
+    """Tag records with the id of the request being handled, or "-" """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log collectors"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _InProcessQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread
+
+    The stock handler formats the whole record, traceback included, in
+    the calling thread so it can be pickled. The queue here never leaves
+    the process, so only the message arguments are merged (they may be
+    mutated after the call); tracebacks are formatted by the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _parse_module_levels(spec: str) -> Dict[str, int]:
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.partition("=")
+        if sep and name.strip():
+            levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return {name: level for name, level in levels.items() if isinstance(level, int)}
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    debug_sample_rate: Optional[float] = None,
+    log_format: Optional[str] = None,
+    stream=None
+) -> QueueListener:
+    """
+    Route all logging through a background queue listener
+
+    Safe to call more than once; later calls replace the earlier setup.
+    Arguments default to the environment settings.
+    """
+    global _listener, _queue_handler
+
+    level = (level or os.getenv("JARVIS_LOG_LEVEL", "INFO")).upper()
+    if debug_sample_rate is None:
+        debug_sample_rate = float(os.getenv("JARVIS_LOG_DEBUG_SAMPLE_RATE", "1.0"))
+    log_format = (log_format or os.getenv("JARVIS_LOG_FORMAT", "text")).lower()
+
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _queue_handler = _InProcessQueueHandler(log_queue)
+    _queue_handler.addFilter(DebugSampler(debug_sample_rate))
+    # Queue handler filters run in the thread that logs the record, where
+    # the request context is still set; the listener thread has none, so
+    # this filter must stay here rather than on the output handler
+    _queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_queue_handler)
+    for name, module_level in _parse_module_levels(os.getenv("JARVIS_LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# Write out queued records before the interpreter exits
+atexit.register(shutdown_logging)
@@ -0,0 +1,266 @@
+"""
+Scene Object Store
+
+Id-keyed storage for the objects of a scene with secondary indexes by
+type, color and material. Lookups, updates and deletes by id are O(1),
+attribute queries are O(k) in the number of matches, and object ids stay
+stable no matter what else is removed from the scene.
+
+The store still behaves like the plain object list it replaces: it keeps
+insertion order and supports append, len, iteration and legacy
+positional access. It also tracks which objects changed since the last
+drain_changes() call, which scene versioning turns into deltas, and
+caches each object's JSON encoding until the object is changed. The
+total size of those encodings is kept up to date as objects change, so
+measuring a scene only encodes the objects changed since the last time.
+"""
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Set
+from itertools import islice
+import uuid
+
+from core.json_encoding import EncodedList, dumps
+
+
+# Object attributes with a secondary index
+INDEXED_ATTRIBUTES = ("type", "color", "material")
+
+
+def _index_key(obj: Dict[str, Any], attribute: str) -> Optional[str]:
+    """Value of an indexed attribute, normalized for lookups"""
+    if attribute == "type":
+        value = obj.get("type")
+    else:
+        material = obj.get("material")
+        if not isinstance(material, dict):
+            return None
+        # The material index uses the requested material name, e.g. "wood"
+        value = material.get("color" if attribute == "color" else "name")
+    return str(value).lower() if value is not None else None
+
+
+class SceneObjectStore:
+    """
+    Ordered, id-keyed collection of scene objects
+
+    Objects without an "id" get one when added. The indexes must be kept
+    in sync, so change stored objects through update() rather than in
+    place.
+    """
+
+    def __init__(self, objects: Iterable[Dict[str, Any]] = ()):
+        self._objects: Dict[str, Dict[str, Any]] = {}
+        self._indexes: Dict[str, Dict[str, Set[str]]] = {name: {} for name in INDEXED_ATTRIBUTES}
+        # Insertion sequence numbers, so query results keep scene order
+        self._sequence: Dict[str, int] = {}
+        self._next_sequence = 0
+        # object id -> "add", "replace" or "remove" since the last drain
+        self._changes: Dict[str, str] = {}
+        # object id -> JSON encoding, dropped whenever the object changes
+        self._encoded: Dict[str, bytes] = {}
+        # Total length of the cached encodings, and ids not encoded yet
+        self._encoded_bytes = 0
+        self._unencoded: Set[str] = set()
+        for obj in objects:
+            self.add(obj)
+        self._changes.clear()
+
+    # List compatibility
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(list(self._objects.values()))
+
+    def __bool__(self) -> bool:
+        return bool(self._objects)
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        """Object at a list position (O(n); prefer get() with an id)"""
+        return self._objects[self.id_at(index)]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, SceneObjectStore):
+            return list(self._objects.values()) == list(other._objects.values())
+        if isinstance(other, list):
+            return list(self._objects.values()) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"SceneObjectStore({list(self._objects.values())!r})"
+
+    def append(self, obj: Dict[str, Any]):
+        self.add(obj)
+
+    def pop(self, index: int = -1) -> Dict[str, Any]:
+        """Remove and return the object at a list position"""
+        return self.remove(self.id_at(index))
+
+    def clear(self):
+        for object_id in list(self._objects):
+            self._mark(object_id, "remove")
+        self._objects.clear()
+        self._sequence.clear()
+        self._encoded.clear()
+        self._encoded_bytes = 0
+        self._unencoded.clear()
+        for index in self._indexes.values():
+            index.clear()
+
+    def id_at(self, index: int) -> str:
+        """Id of the object at a list position"""
+        count = len(self._objects)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("object index out of range")
+        return next(islice(self._objects, index, None))
+
+    # Id-keyed access
+
+    def add(self, obj: Dict[str, Any]) -> str:
+        """Add an object, or replace the object with the same id; returns its id"""
+        object_id = obj.get("id")
+        if not object_id:
+            object_id = str(uuid.uuid4())
+            obj["id"] = object_id
+        if object_id in self._objects:
+            self._unindex(object_id, self._objects[object_id])
+            self._mark(object_id, "replace")
+        else:
+            self._sequence[object_id] = self._next_sequence
+            self._next_sequence += 1
+            self._mark(object_id, "add")
+        self._objects[object_id] = obj
+        self._index(object_id, obj)
+        self._invalidate(object_id)
+        return object_id
+
+    def get(self, object_id: str) -> Optional[Dict[str, Any]]:
+        return self._objects.get(object_id)
+
+    def __contains__(self, item) -> bool:
+        if isinstance(item, dict):
+            return self._objects.get(item.get("id")) is item
+        return item in self._objects
+
+    def remove(self, object_id: str) -> Dict[str, Any]:
+        """Remove an object by id and return it"""
+        obj = self._objects.pop(object_id)
+        del self._sequence[object_id]
+        self._invalidate(object_id)
+        self._unencoded.discard(object_id)
+        self._unindex(object_id, obj)
+        self._mark(object_id, "remove")
+        return obj
+
+    def discard(self, object_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        """Remove every listed object that exists and return the removed objects"""
+        return [self.remove(object_id) for object_id in list(object_ids) if object_id in self._objects]
+
+    def update(self, object_id: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply changes to an object and refresh its index entries"""
+        obj = self._objects[object_id]
+        self._unindex(object_id, obj)
+        obj.update({key: value for key, value in changes.items() if key != "id"})
+        self._index(object_id, obj)
+        self._invalidate(object_id)
+        self._mark(object_id, "replace")
+        return obj
+
+    # Attribute queries
+
+    def ids_by(self, attribute: str, value: Any) -> Set[str]:
+        """Ids of objects whose indexed attribute equals value"""
+        if value is None:
+            return set()
+        return set(self._indexes[attribute].get(str(value).lower(), ()))
+
+    def find(self, **criteria: Any) -> List[Dict[str, Any]]:
+        """
+        Objects matching every given indexed attribute
+
+        Example: store.find(type="cube", color="#ff0000")
+        """
+        unknown = set(criteria) - set(INDEXED_ATTRIBUTES)
+        if unknown:
+            raise ValueError(f"Not an indexed attribute: {', '.join(sorted(unknown))}")
+        if not criteria:
+            return list(self._objects.values())
+
+        # Intersect starting from the smallest candidate set
+        candidate_sets = sorted(
+            (self.ids_by(attribute, value) for attribute, value in criteria.items()),
+            key=len
+        )
+        matches = set.intersection(*candidate_sets)
+        return [self._objects[object_id] for object_id in sorted(matches, key=self._sequence.get)]
+
+    def counts(self, attribute: str) -> Dict[str, int]:
+        """Number of objects per value of an indexed attribute"""
+        return {value: len(ids) for value, ids in self._indexes[attribute].items()}
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Objects in scene order, as a plain list"""
+        return list(self._objects.values())
+
+    def encoded(self, object_id: str) -> bytes:
+        """JSON encoding of an object, cached until the object changes"""
+        data = self._encoded.get(object_id)
+        if data is None:
+            data = self._encoded[object_id] = dumps(self._objects[object_id])
+            self._encoded_bytes += len(data)
+            self._unencoded.discard(object_id)
+        return data
+
+    def encoded_size(self) -> int:
+        """Total length of all object encodings, encoding only changed objects"""
+        for object_id in list(self._unencoded):
+            self.encoded(object_id)
+        return self._encoded_bytes
+
+    def to_encoded_list(self) -> EncodedList:
+        """Objects in scene order, with their cached encodings for responses"""
+        return EncodedList(
+            self._objects.values(),
+            [self.encoded(object_id) for object_id in self._objects]
+        )
+
+    def drain_changes(self) -> Dict[str, str]:
+        """Changes since the last call, as object id -> add/replace/remove"""
+        changes, self._changes = self._changes, {}
+        return changes
+
+    def _invalidate(self, object_id: str):
+        """Drop an object's cached encoding after it changed"""
+        data = self._encoded.pop(object_id, None)
+        if data is not None:
+            self._encoded_bytes -= len(data)
+        self._unencoded.add(object_id)
+
+    def _mark(self, object_id: str, change: str):
+        """Fold a change into the pending change of an object"""
+        previous = self._changes.get(object_id)
+        if previous == "add":
+            if change == "remove":
+                # Added and removed again: nothing to report
+                del self._changes[object_id]
+            return
+        if previous == "remove" and change == "add":
+            change = "replace"
+        self._changes[object_id] = change
+
+    def _index(self, object_id: str, obj: Dict[str, Any]):
+        for attribute in INDEXED_ATTRIBUTES:
+            key = _index_key(obj, attribute)
+            if key is not None:
+                self._indexes[attribute].setdefault(key, set()).add(object_id)
+
+    def _unindex(self, object_id: str, obj: Dict[str, Any]):
+        for attribute in INDEXED_ATTRIBUTES:
+            key = _index_key(obj, attribute)
+            ids = self._indexes[attribute].get(key)
+            if ids is not None:
+                ids.discard(object_id)
+                if not ids:
+                    del self._indexes[attribute][key]
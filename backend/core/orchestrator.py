@@ -3,37 +3,208 @@ Core Orchestration Engine - The "Brain" of Jarvis
 
 This module coordinates all AI modules and manages the overall system state.
 """
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable, Deque, Tuple, Awaitable, Union
 import asyncio
+import os
+from collections import deque
+from copy import deepcopy
 from dataclasses import dataclass, field
 from datetime import datetime
-import traceback
+import logging
 
 from nlp.processor import NLPProcessor
 from cv.processor import ComputerVisionProcessor
 from generation.text_to_3d import TextTo3DGenerator
 from generation.scene_builder import SceneBuilder
+from core.action_executor import ActionPlanExecutor, ActionOutcome, Footprint
+from core.context_store import ContextStore
+from core.persistence import create_context_backend, ContextVersionConflict
+from core.concurrency import ContextLockManager
+from core.object_store import SceneObjectStore
+from core.scene_versioning import SceneChangeLog, SCENE_SECTIONS, build_delta
+from core.plan_cache import PlanCache, plan_cache_key, fingerprint_file
+from core.telemetry import span, mark_stage_error, registry
+from core.startup import startup_timer
+from core import colors
+from core.json_encoding import dumps
+
+logger = logging.getLogger(__name__)
+
+
+# Context state each action type reads and writes. Actions only wait for
+# earlier actions that write something they read.
+ACTION_FOOTPRINTS: Dict[str, Footprint] = {
+    "generate_object": (frozenset(), frozenset({"objects"})),
+    "generate_environment": (frozenset(), frozenset({"environment"})),
+    "delete_objects": (frozenset({"objects"}), frozenset({"objects"})),
+}
+
+# Tracing stage names of the input branches
+BRANCH_STAGES = {"text": "nlp", "image": "cv", "video": "video"}
+
+# Receives progress events (name, data) while a request is processed
+ProgressCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+# Plans a request against the scene as it is when the request is applied
+PlanFactory = Callable[["SceneContext"], Awaitable[List[Dict[str, Any]]]]
+
+# Number of recent history entries kept on each context; older entries
+# are compacted into a summary and, with a persistent backend, spilled
+HISTORY_DEPTH = int(os.getenv("JARVIS_HISTORY_DEPTH", "50"))
+
+# Context attributes a modify_scene action may replace
+MODIFIABLE_ATTRIBUTES = ("objects",) + SCENE_SECTIONS
+
+
+def _encoded_size(value: Any) -> int:
+    try:
+        return len(dumps(value))
+    except Exception:
+        return 0
 
 
 @dataclass
 class SceneContext:
     """Maintains the state of the current 3D environment"""
     scene_id: str
-    objects: List[Dict[str, Any]] = field(default_factory=list)
+    objects: SceneObjectStore = field(default_factory=SceneObjectStore)
     environment: Dict[str, Any] = field(default_factory=dict)
     lighting: Dict[str, Any] = field(default_factory=dict)
     camera: Dict[str, Any] = field(default_factory=dict)
-    history: List[Dict[str, Any]] = field(default_factory=list)
+    history: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=HISTORY_DEPTH))
+    history_summary: Dict[str, Any] = field(default_factory=dict)
     created_at: datetime = field(default_factory=datetime.now)
-    
+    # Bumped by record_version() whenever the scene changed
+    version: int = 0
+    change_log: SceneChangeLog = field(default_factory=SceneChangeLog, repr=False, compare=False)
+    # Whether entries pushed out of the ring buffer are kept in the backend
+    spill_history: bool = field(default=False, repr=False, compare=False)
+    # Spilled entries waiting to be stored with the next commit
+    pending_history: List[Dict[str, Any]] = field(default_factory=list, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._mark_recorded()
+        # Encoded size of the history entries, kept current by add_to_history()
+        object.__setattr__(self, "_history_bytes", sum(_encoded_size(entry) for entry in self.history))
+
+    def __setattr__(self, name: str, value: Any):
+        # Keep objects indexed even when a plain list is assigned
+        if name == "objects" and not isinstance(value, SceneObjectStore):
+            value = SceneObjectStore(value)
+        super().__setattr__(name, value)
+
     def add_to_history(self, action: str, details: Dict[str, Any]):
-        """Add an action to the history"""
-        self.history.append({
+        """Add an action to the history, compacting the oldest entry when full"""
+        history_bytes = self._history_bytes
+        if self.history.maxlen and len(self.history) >= self.history.maxlen:
+            entry = self.history.popleft()
+            history_bytes -= _encoded_size(entry)
+            self._compact_history_entry(entry)
+        entry = {
             "timestamp": datetime.now().isoformat(),
             "action": action,
             "details": details
+        }
+        self.history.append(entry)
+        object.__setattr__(self, "_history_bytes", history_bytes + _encoded_size(entry))
+
+    def estimated_size(self) -> int:
+        """
+        Approximate memory held by the context in bytes
+
+        Reuses the object store's cached encodings and the running history
+        size, so only objects changed since the last call are encoded.
+        """
+        try:
+            sections = dumps([getattr(self, section) for section in SCENE_SECTIONS])
+            return self.objects.encoded_size() + len(sections) + self._history_bytes
+        except Exception:
+            return 0
+
+    def _compact_history_entry(self, entry: Dict[str, Any]):
+        """Fold an entry leaving the ring buffer into the history summary"""
+        summary = self.history_summary
+        summary["compacted"] = summary.get("compacted", 0) + 1
+        summary.setdefault("first_timestamp", entry.get("timestamp"))
+        summary["last_timestamp"] = entry.get("timestamp")
+        actions = summary.setdefault("actions", {})
+        actions[entry.get("action", "unknown")] = actions.get(entry.get("action", "unknown"), 0) + 1
+
+        if self.spill_history:
+            # Stored in the same transaction as the context, see ContextStore
+            self.pending_history.append(entry)
+            summary["spilled"] = summary.get("spilled", 0) + 1
+
+    def record_version(self) -> int:
+        """
+        Record the changes made since the last call as a new scene version
+
+        Returns the current version, unchanged if nothing changed.
+        """
+        operations = []
+        if self.objects is not self._recorded_objects:
+            # The whole object collection was replaced
+            self.objects.drain_changes()
+            operations.append({"op": "replace", "path": "/objects", "value": deepcopy(self.objects.to_list())})
+        else:
+            for object_id, change in self.objects.drain_changes().items():
+                operation = {"op": change, "path": f"/objects/{object_id}"}
+                if change != "remove":
+                    operation["value"] = deepcopy(self.objects.get(object_id))
+                operations.append(operation)
+
+        for section in SCENE_SECTIONS:
+            value = getattr(self, section)
+            if value != self._recorded_sections.get(section):
+                operations.append({"op": "replace", "path": f"/{section}", "value": deepcopy(value)})
+
+        if operations:
+            self.version += 1
+            self.change_log.record(self.version, operations)
+            self._mark_recorded()
+        return self.version
+
+    def delta_since(self, since_version: int) -> Optional[Dict[str, Any]]:
+        """Changes since a client's version, or None if a snapshot is needed"""
+        return build_delta(self.change_log, since_version, self.version, len(self.objects))
+
+    def _mark_recorded(self):
+        object.__setattr__(self, "_recorded_objects", self.objects)
+        object.__setattr__(self, "_recorded_sections", {
+            section: deepcopy(getattr(self, section)) for section in SCENE_SECTIONS
         })
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the persistent part of the context to a dict"""
+        return {
+            "scene_id": self.scene_id,
+            "objects": self.objects.to_list(),
+            "environment": self.environment,
+            "lighting": self.lighting,
+            "camera": self.camera,
+            "history": list(self.history),
+            "history_summary": self.history_summary,
+            "created_at": self.created_at.isoformat(),
+            "version": self.version,
+            "change_log": self.change_log.to_list()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SceneContext":
+        """Rebuild a context from to_dict() output"""
+        return cls(
+            scene_id=data["scene_id"],
+            objects=data.get("objects", []),
+            environment=data.get("environment", {}),
+            lighting=data.get("lighting", {}),
+            camera=data.get("camera", {}),
+            history=deque(data.get("history", [])[-HISTORY_DEPTH:], maxlen=HISTORY_DEPTH),
+            history_summary=data.get("history_summary", {}),
+            created_at=datetime.fromisoformat(data["created_at"]) if data.get("created_at") else datetime.now(),
+            version=data.get("version", 0),
+            change_log=SceneChangeLog(data.get("change_log", []))
+        )
+
 
 class JarvisOrchestrator:
     """
@@ -46,59 +217,201 @@ class JarvisOrchestrator:
         self.text_to_3d: Optional[TextTo3DGenerator] = None
         self.scene_builder: Optional[SceneBuilder] = None
         
-        self.active_contexts: Dict[str, SceneContext] = {}
+        self.context_locks = ContextLockManager()
+        context_backend = self._create_context_backend()
+        shared_contexts = self._shared_contexts_enabled(context_backend)
+        self.active_contexts: ContextStore = ContextStore(
+            max_contexts=int(os.getenv("JARVIS_MAX_CONTEXTS", "1000")),
+            idle_ttl=float(os.getenv("JARVIS_CONTEXT_TTL", "3600")),
+            max_memory_bytes=int(float(os.getenv("JARVIS_CONTEXT_MEMORY_MB", "256")) * 1024 * 1024),
+            backend=context_backend,
+            serializer=SceneContext.to_dict,
+            deserializer=self._load_context,
+            pending_history=lambda context: context.pending_history,
+            size_estimator=SceneContext.estimated_size,
+            # Write-behind would let other workers read stale scenes
+            write_behind=(
+                not shared_contexts
+                and os.getenv("JARVIS_CONTEXT_WRITE_MODE", "through").lower() == "behind"
+            ),
+            shared=shared_contexts,
+            # A request holding the lock has uncommitted edits
+            is_busy=self.context_locks.is_busy
+        )
+        self.commit_retries = int(os.getenv("JARVIS_CONTEXT_COMMIT_RETRIES", "3"))
+        self.context_flush_interval = float(os.getenv("JARVIS_CONTEXT_FLUSH_INTERVAL", "5"))
+        self._flush_task: Optional[asyncio.Task] = None
+        self._warm_up_task: Optional[asyncio.Task] = None
+        self.active_contexts.add_eviction_hook(self._on_context_evicted)
         self.knowledge_base: Dict[str, Any] = {}
+
+        # Per-modality processing timeouts in seconds
+        self.branch_timeouts: Dict[str, float] = {
+            "text": float(os.getenv("JARVIS_TEXT_TIMEOUT", "30")),
+            "image": float(os.getenv("JARVIS_IMAGE_TIMEOUT", "30")),
+            "video": float(os.getenv("JARVIS_VIDEO_TIMEOUT", "60"))
+        }
+
+        self.action_executor = ActionPlanExecutor(
+            max_concurrency=int(os.getenv("JARVIS_MAX_ACTION_CONCURRENCY", "4"))
+        )
+        self.plan_cache = PlanCache(max_entries=int(os.getenv("JARVIS_PLAN_CACHE_SIZE", "512")))
+        self._register_metrics()
         
     async def initialize(self):
-        """Initialize all AI modules"""
-        print("🚀 Initializing Jarvis Orchestrator...")
+        """
+        Initialize all AI modules
 
-        try:
-            print("📚 Initializing NLP Processor...")
-            self.nlp_processor = NLPProcessor()
-            if hasattr(self.nlp_processor, 'initialize'):
-                await self.nlp_processor.initialize()
-            print("✅ NLP Processor ready")
-        except Exception as e:
-            print(f"⚠️ NLP Processor initialization failed: {e}")
-            self.nlp_processor = NLPProcessor()
+        The processors are independent, so they are initialized
+        concurrently and each phase is timed in the startup report. Heavy
+        CV dependencies are loaded in the background after startup.
+        """
+        logger.info("🚀 Initializing Jarvis Orchestrator...")
+
+        with startup_timer.phase("initialize"):
+            self.nlp_processor, self.cv_processor, self.text_to_3d, self.scene_builder = await asyncio.gather(
+                self._initialize_component("nlp", "📚 NLP Processor", NLPProcessor),
+                self._initialize_component("cv", "👁️ Computer Vision Processor", ComputerVisionProcessor),
+                self._initialize_component("text_to_3d", "🎨 3D Generator", TextTo3DGenerator),
+                self._initialize_component("scene_builder", "🏗️ Scene Builder", SceneBuilder)
+            )
+            self._load_knowledge_base()
+
+        if self.active_contexts.write_behind:
+            self._flush_task = asyncio.create_task(self._flush_contexts_periodically())
+        if os.getenv("JARVIS_PRELOAD_MODULES", "true").lower() in ("1", "true", "yes"):
+            self._warm_up_task = asyncio.create_task(self._warm_up())
+
+        logger.info("✅ Jarvis Orchestrator initialized successfully")
+
+    async def _initialize_component(self, phase: str, label: str, factory: Callable[[], Any]) -> Any:
+        """Create and initialize one module, falling back to an uninitialized instance"""
+        with startup_timer.phase(f"initialize.{phase}"):
+            try:
+                logger.info("Initializing %s...", label)
+                component = factory()
+                if hasattr(component, 'initialize'):
+                    await component.initialize()
+                logger.info("✅ %s ready", label)
+                return component
+            except Exception as e:
+                logger.warning("⚠️ %s initialization failed: %s", label, e)
+                return factory()
 
+    async def _warm_up(self):
+        """Load lazily imported dependencies before the first request needs them"""
         try:
-            print("👁️ Initializing Computer Vision Processor...")
-            self.cv_processor = ComputerVisionProcessor()
-            if hasattr(self.cv_processor, 'initialize'):
-                await self.cv_processor.initialize()
-            print("✅ CV Processor ready")
+            with startup_timer.phase("warm_up.cv"):
+                await self.cv_processor.warm_up()
+            logger.debug("[STARTUP] CV dependencies loaded")
         except Exception as e:
-            print(f"⚠️ CV Processor initialization failed: {e}")
-            self.cv_processor = ComputerVisionProcessor()
+            logger.warning("⚠️ Warm-up failed: %s", e)
 
+    def _create_context_backend(self):
+        """Create the persistent context backend, falling back to memory only"""
         try:
-            print("🎨 Initializing 3D Generators...")
-            self.text_to_3d = TextTo3DGenerator()
-            if hasattr(self.text_to_3d, 'initialize'):
-                await self.text_to_3d.initialize()
-            print("✅ 3D Generator ready")
+            backend = create_context_backend()
+            if backend:
+                logger.info("💾 Persisting scene contexts with %s backend", backend.name)
+            return backend
         except Exception as e:
-            print(f"⚠️ 3D Generator initialization failed: {e}")
-            self.text_to_3d = TextTo3DGenerator()
+            logger.warning("⚠️ Context persistence unavailable, keeping contexts in memory only: %s", e)
+            return None
 
-        try:
-            print("🏗️ Initializing Scene Builder...")
-            self.scene_builder = SceneBuilder()
-            print("✅ Scene Builder ready")
-        except Exception as e:
-            print(f"⚠️ Scene Builder initialization failed: {e}")
-            self.scene_builder = SceneBuilder()
+    def _new_context(self, context_id: str) -> SceneContext:
+        """Create an empty context wired to the history spill store"""
+        context = SceneContext(scene_id=context_id)
+        self._attach_history_spill(context)
+        return context
+
+    def _load_context(self, data: Dict[str, Any]) -> SceneContext:
+        """Rebuild a persisted context wired to the history spill store"""
+        context = SceneContext.from_dict(data)
+        self._attach_history_spill(context)
+        return context
+
+    def _attach_history_spill(self, context: SceneContext):
+        context.spill_history = self.active_contexts.backend is not None
+
+    async def get_history(self, context_id: str, limit: int = 100) -> Optional[Dict[str, Any]]:
+        """Recent history of a context plus older entries spilled to the backend"""
+        context = await self.active_contexts.get_async(context_id)
+        if context is None:
+            return None
+        recent = list(context.history)[-limit:]
+        older: List[Dict[str, Any]] = []
+        backend = self.active_contexts.backend
+        if backend is not None and len(recent) < limit:
+            older = await asyncio.to_thread(backend.load_history, context_id, limit - len(recent))
+        return {
+            "context_id": context_id,
+            "entries": older + recent,
+            "summary": context.history_summary,
+            "depth": context.history.maxlen
+        }
 
-        self._load_knowledge_base()
-        print("✅ Jarvis Orchestrator initialized successfully")
+    def _register_metrics(self):
+        """Expose context store, lock and plan cache state on /metrics"""
+        contexts = registry.gauge("jarvis_scene_contexts", "Scene contexts held in memory")
+        context_memory = registry.gauge("jarvis_scene_context_memory_bytes", "Approximate memory held by scene contexts")
+        evictions = registry.counter("jarvis_scene_context_evictions_total", "Evicted scene contexts", ("reason",))
+        lock_waiters = registry.gauge("jarvis_context_lock_waiting", "Requests waiting for a scene context lock")
+        plan_cache = registry.counter("jarvis_plan_cache_lookups_total", "Action plan cache lookups", ("result",))
+
+        def collect():
+            store_stats = self.active_contexts.stats()
+            contexts.set(value=store_stats["contexts"])
+            context_memory.set(value=store_stats["memory_bytes"])
+            for reason, count in store_stats["evictions"].items():
+                evictions.set(reason, value=count)
+            lock_waiters.set(value=self.context_locks.stats(top=0)["waiting"])
+            plan_cache.set("hit", value=self.plan_cache.hits)
+            plan_cache.set("miss", value=self.plan_cache.misses)
+
+        registry.add_collector(collect)
+
+    def _shared_contexts_enabled(self, backend) -> bool:
+        """
+        Whether contexts are shared with other worker processes
+
+        On by default whenever a persistent backend is configured, since
+        the number of worker processes cannot be detected reliably (e.g.
+        `uvicorn --workers N` does not set WEB_CONCURRENCY). A single
+        process, or workers that each own their contexts as behind the
+        shard router, can set JARVIS_SHARED_CONTEXTS=false to skip the
+        revalidation and allow write-behind.
+        """
+        flag = os.getenv("JARVIS_SHARED_CONTEXTS")
+        if flag is not None:
+            shared = flag.lower() in ("1", "true", "yes")
+        else:
+            shared = backend is not None
+
+        if shared and backend is None:
+            logger.warning("⚠️ Shared contexts need a persistent context backend; contexts stay per-worker")
+            return False
+        return shared
+
+    async def _flush_contexts_periodically(self):
+        """Write-behind loop: persist changed contexts at a fixed interval"""
+        while True:
+            await asyncio.sleep(self.context_flush_interval)
+            try:
+                await self.active_contexts.flush_async()
+            except Exception as e:
+                logger.warning("⚠️ Error flushing scene contexts: %s", e)
         
+    def _on_context_evicted(self, context_id: str, context: SceneContext, reason: str):
+        """Release resources held by a context dropped from the store"""
+        logger.debug("[ORCHESTRATOR] Evicted context %s (%s)", context_id, reason)
+        if hasattr(context, 'simulator'):
+            context.simulator.stop()
+
     def _load_knowledge_base(self):
         """Load pre-defined knowledge about 3D assets and properties"""
         self.knowledge_base = {
             "materials": ["wood", "metal", "glass", "plastic", "stone", "fabric"],
-            "colors": ["red", "blue", "green", "yellow", "white", "black"],
+            "colors": list(colors.COLOR_NAMES),
             "shapes": ["cube", "sphere", "cylinder", "cone", "plane"],
             "environments": ["forest", "city", "interior", "desert", "ocean"],
             "lighting": ["morning", "noon", "sunset", "night", "studio"]
@@ -109,7 +422,10 @@ class JarvisOrchestrator:
         text: Optional[str] = None,
         image_path: Optional[str] = None,
         video_url: Optional[str] = None,
-        context_id: Optional[str] = None
+        context_id: Optional[str] = None,
+        new_context_id: Optional[str] = None,
+        since_version: Optional[int] = None,
+        on_event: Optional[ProgressCallback] = None
     ) -> Dict[str, Any]:
         """
         Main entry point for processing user requests
@@ -119,95 +435,90 @@ class JarvisOrchestrator:
             image_path: Path to uploaded image
             video_url: YouTube or video URL
             context_id: Existing scene context ID
+            new_context_id: ID to use if a new context has to be created
+                (assigned by the shard router so the context lands on its owner)
+            since_version: Scene version the client already has; the
+                response then carries a delta instead of the full scene
+                when possible
+            on_event: Optional coroutine receiving progress events as
+                they happen: "context", "analysis", "plan", one "action"
+                per executed action, and "retry" when a plan is re-applied
 
         Returns:
             Response with generated 3D content and metadata
         """
         import uuid
-        import traceback
 
-        print(f"\n[ORCHESTRATOR] Processing request")
-        print(f"  Text: {text[:50] if text else 'None'}...")
-        print(f"  Context ID: {context_id}")
+        # Resolve the context before locking it; requests for the same
+        # context run one at a time, different contexts run in parallel
+        if not (context_id and await self.active_contexts.get_async(context_id) is not None):
+            context_id = None
+            new_context_id = new_context_id or str(uuid.uuid4())
+
+        async with self.context_locks.acquire(context_id or new_context_id):
+            return await self._process_request_locked(
+                text=text,
+                image_path=image_path,
+                video_url=video_url,
+                context_id=context_id,
+                new_context_id=new_context_id,
+                since_version=since_version if context_id else None,
+                on_event=on_event
+            )
+
+    async def _process_request_locked(
+        self,
+        text: Optional[str],
+        image_path: Optional[str],
+        video_url: Optional[str],
+        context_id: Optional[str],
+        new_context_id: Optional[str],
+        since_version: Optional[int] = None,
+        on_event: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """Process a request while holding its context lock"""
+        import uuid
+
+        logger.debug("[ORCHESTRATOR] Processing request: text=%r context_id=%s", text[:50] if text else None, context_id)
 
         try:
             # Get or create context
-            if context_id and context_id in self.active_contexts:
-                context = self.active_contexts[context_id]
-                print(f"[ORCHESTRATOR] Using existing context: {context_id}")
+            context = await self.active_contexts.get_async(context_id) if context_id else None
+            if context is not None:
+                logger.debug("[ORCHESTRATOR] Using existing context: %s", context_id)
             else:
-                context_id = str(uuid.uuid4())
-                context = SceneContext(scene_id=context_id)
+                context_id = new_context_id or str(uuid.uuid4())
+                context = self._new_context(context_id)
                 self.active_contexts[context_id] = context
-                print(f"[ORCHESTRATOR] Created new context: {context_id}")
-
-            try:
-                # Process multimodal inputs
-                print(f"[ORCHESTRATOR] Processing multimodal inputs...")
-                processed_data = await self._process_multimodal_inputs(
-                    text=text,
-                    image_path=image_path,
-                    video_url=video_url
-                )
-                print(f"[ORCHESTRATOR] Multimodal processing complete")
-            except Exception as e:
-                print(f"⚠️ [ORCHESTRATOR] Multimodal processing error: {e}")
-                traceback.print_exc()
-                processed_data = {
-                    "text_analysis": None,
-                    "image_analysis": None,
-                    "video_analysis": None
-                }
+                logger.debug("[ORCHESTRATOR] Created new context: %s", context_id)
 
-            try:
-                # Integrate information and plan actions
-                print(f"[ORCHESTRATOR] Creating action plan...")
-                action_plan = await self._create_action_plan(processed_data, context)
-                print(f"[ORCHESTRATOR] Action plan created with {len(action_plan)} actions")
-            except Exception as e:
-                print(f"⚠️ [ORCHESTRATOR] Action plan creation error: {e}")
-                traceback.print_exc()
-                # Fallback: create a simple default action
-                action_plan = [{
-                    "action": "generate_object",
-                    "object_type": "cube",
-                    "attributes": {"color": "blue"}
-                }]
+            if on_event is not None:
+                await on_event("context", {"context_id": context_id, "scene_version": context.version})
 
-            try:
-                # Execute action plan
-                print(f"[ORCHESTRATOR] Executing action plan...")
-                result = await self._execute_action_plan(action_plan, context)
-                print(f"[ORCHESTRATOR] Action plan executed. Success: {result.get('success', False)}")
-            except Exception as e:
-                print(f"⚠️ [ORCHESTRATOR] Action plan execution error: {e}")
-                traceback.print_exc()
-                result = {
-                    "actions_executed": 0,
-                    "results": [],
-                    "success": False,
-                    "error": str(e)
-                }
+            action_plan = await self._plan_request(text, image_path, video_url, context, on_event=on_event)
 
-            # Update context history
-            context.add_to_history("user_request", {
+            request_info = {
                 "text": text,
                 "has_image": image_path is not None,
                 "has_video": video_url is not None
-            })
+            }
+            context, (result,) = await self._apply_plans(
+                context_id, context, [(request_info, action_plan)], on_event=on_event
+            )
 
+            with span("serialize"):
+                scene = self.scene_payload(context, since_version)
             response = {
                 "context_id": context_id,
                 "result": result,
-                "scene": self._serialize_context(context),
+                **scene,
                 "status": "success" if result.get("success", False) else "partial"
             }
-            print(f"[ORCHESTRATOR] Request processing complete. Status: {response['status']}")
+            logger.debug("[ORCHESTRATOR] Request processing complete. Status: %s", response['status'])
             return response
 
         except Exception as e:
-            print(f"\n❌ [ORCHESTRATOR] CRITICAL ERROR in process_request: {e}")
-            print(traceback.format_exc())
+            logger.error("❌ [ORCHESTRATOR] CRITICAL ERROR in process_request: %s", e, exc_info=True)
 
             # Return a valid fallback response instead of raising
             fallback_context_id = context_id or str(uuid.uuid4())
@@ -230,20 +541,283 @@ class JarvisOrchestrator:
                 "status": "error",
                 "message": f"Processing error: {str(e)}"
             }
-            print(f"[ORCHESTRATOR] Returning error response")
+            logger.debug("[ORCHESTRATOR] Returning error response")
             return fallback_response
     
+    async def process_batch(
+        self,
+        commands: List[str],
+        context_id: Optional[str] = None,
+        new_context_id: Optional[str] = None,
+        since_version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Apply an ordered list of text commands to one scene
+
+        NLP runs for all commands concurrently up front. Each command is
+        then planned and executed in order against the scene as the
+        earlier commands left it, so plans (and plan cache keys) reflect
+        the scene they are applied to. The scene is committed and
+        serialized once for the whole batch.
+
+        Args:
+            commands: Natural language commands, in the order to apply them
+            context_id: Existing scene context ID
+            new_context_id: ID to use if a new context has to be created
+            since_version: Scene version the client already has
+
+        Returns:
+            One result per command plus the final scene (or a delta)
+        """
+        import uuid
+
+        if not (context_id and await self.active_contexts.get_async(context_id) is not None):
+            context_id = None
+            new_context_id = new_context_id or str(uuid.uuid4())
+
+        async with self.context_locks.acquire(context_id or new_context_id):
+            return await self._process_batch_locked(
+                commands,
+                context_id=context_id,
+                new_context_id=new_context_id,
+                since_version=since_version if context_id else None
+            )
+
+    async def _process_batch_locked(
+        self,
+        commands: List[str],
+        context_id: Optional[str],
+        new_context_id: Optional[str],
+        since_version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Process a batch while holding its context lock"""
+        logger.debug("[ORCHESTRATOR] Processing batch of %s commands: context_id=%s", len(commands), context_id)
+
+        context = await self.active_contexts.get_async(context_id) if context_id else None
+        if context is None:
+            context_id = new_context_id
+            context = self._new_context(context_id)
+            self.active_contexts[context_id] = context
+
+        # Start every analysis now; each plan only waits for its own
+        analyses = [
+            asyncio.ensure_future(self._process_multimodal_inputs(text=text, image_path=None, video_url=None))
+            for text in commands
+        ]
+
+        def planner(text: str, analysis: Awaitable[Dict[str, Any]]) -> PlanFactory:
+            async def plan(current: SceneContext) -> List[Dict[str, Any]]:
+                return await self._plan_request(text, None, None, current, analysis=analysis)
+            return plan
+
+        try:
+            planned = [
+                ({"text": text, "has_image": False, "has_video": False}, planner(text, analysis))
+                for text, analysis in zip(commands, analyses)
+            ]
+            context, results = await self._apply_plans(context_id, context, planned)
+        finally:
+            for analysis in analyses:
+                analysis.cancel()
+
+        with span("serialize"):
+            scene = self.scene_payload(context, since_version)
+        succeeded = sum(1 for result in results if result.get("success"))
+        if succeeded == len(results):
+            status = "success"
+        else:
+            status = "partial" if succeeded else "error"
+        return {
+            "context_id": context_id,
+            "results": [
+                {"command": text, **result}
+                for text, result in zip(commands, results)
+            ],
+            "commands_succeeded": succeeded,
+            **scene,
+            "status": status
+        }
+
+    async def _apply_plans(
+        self,
+        context_id: str,
+        context: SceneContext,
+        planned: List[Tuple[Dict[str, Any], Union[List[Dict[str, Any]], PlanFactory]]],
+        on_event: Optional[ProgressCallback] = None
+    ) -> Tuple[SceneContext, List[Dict[str, Any]]]:
+        """
+        Execute action plans in order, record one scene version and commit
+
+        A plan may be given as a PlanFactory, which is called with the
+        context right before the plan is executed, after the earlier plans
+        were applied. If another worker changed the scene in the meantime,
+        the plans are re-applied (and factories called again) on its
+        latest version. Returns the committed context and one execution
+        result per plan.
+        """
+        on_result = None
+        if on_event is not None:
+            async def on_result(index: int, action: Dict[str, Any], result: Dict[str, Any]):
+                await on_event("action", {"index": index, "action": action.get("action"), "result": result})
+
+        for attempt in range(self.commit_retries + 1):
+            results = []
+            for request_info, action_plan in planned:
+                try:
+                    if callable(action_plan):
+                        action_plan = await action_plan(context)
+                    # Execute action plan
+                    logger.debug("[ORCHESTRATOR] Executing action plan...")
+                    with span("execute", actions=len(action_plan)):
+                        result = await self._execute_action_plan(action_plan, context, on_result=on_result)
+                    logger.debug("[ORCHESTRATOR] Action plan executed. Success: %s", result.get('success', False))
+                except Exception as e:
+                    logger.warning("⚠️ [ORCHESTRATOR] Action plan execution error: %s", e, exc_info=True)
+                    result = {
+                        "actions_executed": 0,
+                        "results": [],
+                        "success": False,
+                        "error": str(e)
+                    }
+                results.append(result)
+
+                # Update context history
+                context.add_to_history("user_request", request_info)
+            context.record_version()
+
+            try:
+                with span("commit"):
+                    await self.active_contexts.commit_async(context_id)
+                return context, results
+            except ContextVersionConflict as conflict:
+                if attempt == self.commit_retries:
+                    raise
+                logger.warning("⚠️ [ORCHESTRATOR] %s; retrying on latest version", conflict)
+                context = await self.active_contexts.reload_async(context_id)
+                if on_event is not None:
+                    # Earlier action events are superseded by the re-applied plan
+                    await on_event("retry", {"attempt": attempt + 1, "scene_version": context.version})
+
+    async def _plan_request(
+        self,
+        text: Optional[str],
+        image_path: Optional[str],
+        video_url: Optional[str],
+        context: SceneContext,
+        analysis: Optional[Awaitable[Dict[str, Any]]] = None,
+        on_event: Optional[ProgressCallback] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze the inputs and plan actions, reusing the cached plan of an
+        identical earlier request when there is one
+
+        `analysis` is an already started analysis of the same inputs, used
+        instead of running a new one on a cache miss. `on_event` receives
+        the "analysis" and "plan" progress events.
+        """
+        cache_key = None
+        if self.plan_cache.enabled and (text or image_path or video_url):
+            image_fingerprint = await asyncio.to_thread(fingerprint_file, image_path) if image_path else None
+            if not image_path or image_fingerprint:
+                cache_key = plan_cache_key(text, image_fingerprint, video_url, self._scene_signature(context))
+                cached_plan = self.plan_cache.get(cache_key)
+                if cached_plan is not None:
+                    logger.debug("[PLAN_CACHE] Hit: reusing plan with %s actions", len(cached_plan))
+                    if on_event is not None:
+                        await on_event("plan", {"actions": cached_plan, "cached": True})
+                    return cached_plan
+
+        cacheable = cache_key is not None
+        try:
+            # Process multimodal inputs
+            logger.debug("[ORCHESTRATOR] Processing multimodal inputs...")
+            processed_data = await (analysis or self._process_multimodal_inputs(
+                text=text,
+                image_path=image_path,
+                video_url=video_url
+            ))
+            logger.debug("[ORCHESTRATOR] Multimodal processing complete")
+        except Exception as e:
+            logger.warning("⚠️ [ORCHESTRATOR] Multimodal processing error: %s", e, exc_info=True)
+            cacheable = False
+            processed_data = {
+                "text_analysis": None,
+                "image_analysis": None,
+                "video_analysis": None
+            }
+
+        if on_event is not None:
+            await on_event("analysis", self._analysis_summary(processed_data))
+
+        try:
+            # Integrate information and plan actions
+            logger.debug("[ORCHESTRATOR] Creating action plan...")
+            with span("plan"):
+                action_plan = await self._create_action_plan(processed_data, context)
+            logger.debug("[ORCHESTRATOR] Action plan created with %s actions", len(action_plan))
+        except Exception as e:
+            logger.warning("⚠️ [ORCHESTRATOR] Action plan creation error: %s", e, exc_info=True)
+            cacheable = False
+            # Fallback: create a simple default action
+            action_plan = [{
+                "action": "generate_object",
+                "object_type": "cube",
+                "attributes": {"color": "blue"}
+            }]
+
+        if on_event is not None:
+            await on_event("plan", {"actions": action_plan, "cached": False})
+
+        # Only plans built from complete analyses are worth reusing
+        if cacheable and not any(
+            (analysis or {}).get("error") for analysis in processed_data.values()
+        ):
+            self.plan_cache.put(cache_key, action_plan)
+        return action_plan
+
+    def _analysis_summary(self, processed_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Parsed intent and any branch errors, for progress events"""
+        text_analysis = processed_data.get("text_analysis") or {}
+        return {
+            "intent": text_analysis.get("intent"),
+            "entities": text_analysis.get("entities", []),
+            "attributes": text_analysis.get("attributes", {}),
+            "errors": {
+                branch: analysis["error"]
+                for branch, analysis in processed_data.items()
+                if isinstance(analysis, dict) and analysis.get("error")
+            }
+        }
+
+    def _scene_signature(self, context: SceneContext) -> Tuple:
+        """
+        Cheap summary of the scene state that planning depends on
+
+        Object types present and the environment type; counts and object
+        ids are left out so repeated commands keep hitting the cache.
+        """
+        return (
+            tuple(sorted(context.objects.counts("type"))),
+            context.environment.get("type") if isinstance(context.environment, dict) else None
+        )
+
     async def _process_multimodal_inputs(
         self,
         text: Optional[str],
         image_path: Optional[str],
         video_url: Optional[str]
     ) -> Dict[str, Any]:
-        """Process all input modalities"""
-        print(f"\n[MULTIMODAL] Processing inputs:")
-        print(f"  Text: {text[:50] if text else 'None'}...")
-        print(f"  Image: {image_path}")
-        print(f"  Video: {video_url}")
+        """
+        Process all input modalities
+
+        Each modality runs as an independent branch with its own timeout,
+        so total latency is that of the slowest branch and a failure in
+        one branch never affects the others.
+        """
+        logger.debug(
+            "[MULTIMODAL] Processing inputs: text=%r image=%s video=%s",
+            text[:50] if text else None, image_path, video_url
+        )
 
         results = {
             "text_analysis": None,
@@ -251,58 +825,73 @@ class JarvisOrchestrator:
             "video_analysis": None
         }
 
-        # Process text
+        branches = {}
         if text and self.nlp_processor:
-            try:
-                print(f"[MULTIMODAL] Processing text with NLP...")
-                results["text_analysis"] = await self.nlp_processor.process(text)
-                print(f"[MULTIMODAL] Text processing successful")
-            except Exception as e:
-                print(f"❌ [MULTIMODAL] Error processing text: {e}")
-                import traceback
-                traceback.print_exc()
-                results["text_analysis"] = {
+            branches["text_analysis"] = self._run_branch(
+                "text",
+                self._analyze_text(text),
+                fallback={
                     "intent": "create",
                     "entities": [],
                     "attributes": {},
-                    "raw_text": text,
-                    "error": str(e)
+                    "raw_text": text
                 }
-
-        # Process image
+            )
         if image_path and self.cv_processor:
-            try:
-                print(f"[MULTIMODAL] Processing image from: {image_path}")
-                import os as os_module
-                if not os_module.path.exists(image_path):
-                    print(f"⚠️ [MULTIMODAL] Image file not found: {image_path}")
-                    results["image_analysis"] = {"error": f"Image file not found: {image_path}"}
-                else:
-                    file_size = os_module.path.getsize(image_path)
-                    print(f"[MULTIMODAL] Image file found ({file_size} bytes)")
-                    results["image_analysis"] = await self.cv_processor.process_image(image_path)
-                    print(f"[MULTIMODAL] Image processing successful")
-                    if results["image_analysis"].get("error"):
-                        print(f"⚠️ [MULTIMODAL] Image analysis returned error: {results['image_analysis']['error']}")
-            except Exception as e:
-                print(f"❌ [MULTIMODAL] Error processing image: {e}")
-                import traceback
-                traceback.print_exc()
-                results["image_analysis"] = {"error": str(e)}
-
-        # Process video
+            branches["image_analysis"] = self._run_branch(
+                "image", self._analyze_image(image_path), fallback={}
+            )
         if video_url and self.cv_processor:
-            try:
-                print(f"[MULTIMODAL] Processing video: {video_url}")
-                results["video_analysis"] = await self.cv_processor.process_video(video_url)
-                print(f"[MULTIMODAL] Video processing successful")
-            except Exception as e:
-                print(f"❌ [MULTIMODAL] Error processing video: {e}")
-                import traceback
-                traceback.print_exc()
-                results["video_analysis"] = {"error": str(e)}
+            branches["video_analysis"] = self._run_branch(
+                "video", self.cv_processor.process_video(video_url), fallback={}
+            )
+
+        if branches:
+            outcomes = await asyncio.gather(*branches.values())
+            results.update(zip(branches.keys(), outcomes))
 
         return results
+
+    async def _run_branch(
+        self,
+        name: str,
+        coro,
+        fallback: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Run one input branch with a timeout, converting failures to error results"""
+        timeout = self.branch_timeouts.get(name)
+        stage = BRANCH_STAGES.get(name, name)
+        try:
+            logger.debug("[MULTIMODAL] Processing %s branch...", name)
+            with span(stage):
+                result = await asyncio.wait_for(coro, timeout=timeout)
+            if isinstance(result, dict) and result.get("error"):
+                mark_stage_error(stage)
+            logger.debug("[MULTIMODAL] %s processing successful", name.capitalize())
+            return result
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ [MULTIMODAL] %s processing timed out after %ss", name.capitalize(), timeout)
+            return {**fallback, "error": f"{name} processing timed out after {timeout}s"}
+        except Exception as e:
+            logger.error("❌ [MULTIMODAL] Error processing %s: %s", name, e, exc_info=True)
+            return {**fallback, "error": str(e)}
+
+    async def _analyze_text(self, text: str) -> Dict[str, Any]:
+        """Text branch: run the NLP processor"""
+        return await self.nlp_processor.process(text)
+
+    async def _analyze_image(self, image_path: str) -> Dict[str, Any]:
+        """Image branch: check the upload and run the CV processor"""
+        if not os.path.exists(image_path):
+            logger.warning("⚠️ [MULTIMODAL] Image file not found: %s", image_path)
+            return {"error": f"Image file not found: {image_path}"}
+
+        file_size = os.path.getsize(image_path)
+        logger.debug("[MULTIMODAL] Image file found (%s bytes)", file_size)
+        image_analysis = await self.cv_processor.process_image(image_path)
+        if image_analysis.get("error"):
+            logger.warning("⚠️ [MULTIMODAL] Image analysis returned error: %s", image_analysis['error'])
+        return image_analysis
     
     async def _create_action_plan(
         self,
@@ -312,30 +901,30 @@ class JarvisOrchestrator:
         """
         Create a sequence of actions based on processed inputs
         """
-        print(f"\n[ACTION_PLAN] Creating action plan from processed data")
-        print(f"[ACTION_PLAN] Processed data keys: {processed_data.keys()}")
+        logger.debug("[ACTION_PLAN] Creating action plan from processed data")
+        logger.debug("[ACTION_PLAN] Processed data keys: %s", processed_data.keys())
         plan = []
 
         try:
             text_analysis = processed_data.get("text_analysis") or {}
             image_analysis = processed_data.get("image_analysis") or {}
 
-            print(f"[ACTION_PLAN] Text analysis: {text_analysis.get('intent') if text_analysis else 'None'}")
-            print(f"[ACTION_PLAN] Image analysis error: {image_analysis.get('error')}")
-            print(f"[ACTION_PLAN] Image analysis keys: {image_analysis.keys() if image_analysis else 'None'}")
+            logger.debug("[ACTION_PLAN] Text analysis: %s", text_analysis.get('intent') if text_analysis else 'None')
+            logger.debug("[ACTION_PLAN] Image analysis error: %s", image_analysis.get('error'))
+            logger.debug("[ACTION_PLAN] Image analysis keys: %s", image_analysis.keys() if image_analysis else 'None')
 
             has_text = text_analysis and not text_analysis.get("error")
             has_image = image_analysis and not image_analysis.get("error")
 
-            print(f"[ACTION_PLAN] Has text: {has_text}, Has image: {has_image}")
+            logger.debug("[ACTION_PLAN] Has text: %s, Has image: %s", has_text, has_image)
 
             # Analyze intent from text
             if has_text:
-                print(f"[ACTION_PLAN] Text analysis available")
+                logger.debug("[ACTION_PLAN] Text analysis available")
                 intent = text_analysis.get("intent", "create")
                 entities = text_analysis.get("entities", [])
                 attributes = text_analysis.get("attributes", {})
-                print(f"[ACTION_PLAN] Intent: {intent}, Entities: {len(entities)}, Attributes: {attributes}")
+                logger.debug("[ACTION_PLAN] Intent: %s, Entities: %s, Attributes: %s", intent, len(entities), attributes)
 
                 if intent == "create":
                     # Plan for creating new objects
@@ -359,7 +948,7 @@ class JarvisOrchestrator:
                                 })
                     else:
                         # No entities found, create a default object with image attributes
-                        print(f"[ACTION_PLAN] No entities found in text, using default object with image attributes")
+                        logger.debug("[ACTION_PLAN] No entities found in text, using default object with image attributes")
                         image_attrs = self._extract_image_attributes(image_analysis)
                         plan.append({
                             "action": "generate_object",
@@ -383,10 +972,10 @@ class JarvisOrchestrator:
 
             # Handle image-only input (no text)
             elif has_image:
-                print(f"[ACTION_PLAN] Image analysis available but no text command")
+                logger.debug("[ACTION_PLAN] Image analysis available but no text command")
                 # Create objects based on image analysis
                 image_attrs = self._extract_image_attributes(image_analysis)
-                print(f"[ACTION_PLAN] Image attributes extracted: {image_attrs}")
+                logger.debug("[ACTION_PLAN] Image attributes extracted: %s", image_attrs)
 
                 # Create a sphere or geometric shape based on image complexity
                 complexity = image_analysis.get("complexity", 0.5)
@@ -404,7 +993,7 @@ class JarvisOrchestrator:
 
             # Enhance with image data if both text and image exist
             if has_image and has_text:
-                print(f"[ACTION_PLAN] Enhancing plan with image styling")
+                logger.debug("[ACTION_PLAN] Enhancing plan with image styling")
                 detected_objects = image_analysis.get("objects", [])
                 if detected_objects:
                     plan.append({
@@ -415,20 +1004,18 @@ class JarvisOrchestrator:
 
             # If no plan was created, add a default action
             if not plan:
-                print(f"[ACTION_PLAN] No plan created, using default cube")
+                logger.debug("[ACTION_PLAN] No plan created, using default cube")
                 plan.append({
                     "action": "generate_object",
                     "object_type": "cube",
                     "attributes": {"color": "blue"}
                 })
 
-            print(f"[ACTION_PLAN] Plan created with {len(plan)} actions: {[p['action'] for p in plan]}")
+            logger.debug("[ACTION_PLAN] Plan created with %s actions: %s", len(plan), [p['action'] for p in plan])
             return plan
 
         except Exception as e:
-            print(f"⚠️ [ACTION_PLAN] Error in action plan creation: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.warning("⚠️ [ACTION_PLAN] Error in action plan creation: %s", e, exc_info=True)
             # Return a default plan
             return [{
                 "action": "generate_object",
@@ -485,203 +1072,199 @@ class JarvisOrchestrator:
 
     def _rgb_to_color_name(self, rgb: List[int]) -> Optional[str]:
         """Convert RGB values to color names"""
-        if len(rgb) < 3:
-            return None
-
-        r, g, b = rgb[0], rgb[1], rgb[2]
-
-        # Simple color name mapping based on RGB values
-        color_map = {
-            "red": (255, 0, 0),
-            "green": (0, 128, 0),
-            "blue": (0, 0, 255),
-            "yellow": (255, 255, 0),
-            "cyan": (0, 255, 255),
-            "magenta": (255, 0, 255),
-            "white": (255, 255, 255),
-            "black": (0, 0, 0),
-            "gray": (128, 128, 128)
-        }
-
-        # Find closest color
-        min_distance = float('inf')
-        closest_color = None
-
-        for color_name, (cr, cg, cb) in color_map.items():
-            distance = ((r - cr) ** 2 + (g - cg) ** 2 + (b - cb) ** 2) ** 0.5
-            if distance < min_distance:
-                min_distance = distance
-                closest_color = color_name
-
-        # Only return color if it's reasonably close
-        if min_distance < 100:
-            return closest_color
-
-        return None
+        return colors.rgb_to_name(rgb)
     
+    def _action_footprint(self, action: Dict[str, Any]) -> Footprint:
+        """Return the context state an action reads and writes"""
+        action_type = action.get("action", "unknown")
+        if action_type == "modify_scene":
+            # Modifications write exactly the attributes they name
+            return frozenset(), frozenset(action.get("modifications", {}).keys())
+        return ACTION_FOOTPRINTS.get(action_type, (frozenset(), frozenset()))
+
     async def _execute_action_plan(
         self,
         action_plan: List[Dict[str, Any]],
-        context: SceneContext
+        context: SceneContext,
+        on_result: Optional[Callable[[int, Dict[str, Any], Dict[str, Any]], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
-        """Execute the planned actions"""
-        print(f"[EXECUTOR] Executing {len(action_plan)} actions")
-        results = []
-
-        for i, action in enumerate(action_plan):
-            action_type = action.get("action", "unknown")
-            print(f"[EXECUTOR] Action {i+1}/{len(action_plan)}: {action_type}")
-
-            try:
-                if action_type == "generate_object":
-                    result = await self._generate_object(action, context)
-                    results.append(result)
-                    print(f"[EXECUTOR]   ✓ Generated object: {action.get('object_type')}")
-
-                elif action_type == "generate_environment":
-                    result = await self._generate_environment(action, context)
-                    results.append(result)
-                    print(f"[EXECUTOR]   ✓ Generated environment")
-
-                elif action_type == "modify_scene":
-                    result = await self._modify_scene(action, context)
-                    results.append(result)
-                    print(f"[EXECUTOR]   ✓ Modified scene")
-
-                elif action_type == "delete_objects":
-                    result = await self._delete_objects(action, context)
-                    results.append(result)
-                    print(f"[EXECUTOR]   ✓ Deleted objects")
+        """
+        Execute the planned actions
 
-                else:
-                    print(f"[EXECUTOR]   ⚠️ Unknown action type: {action_type}")
-                    results.append({
-                        "status": "error",
-                        "action": action_type,
-                        "error": f"Unknown action type: {action_type}"
-                    })
+        Independent actions run concurrently; their changes to the
+        context are applied in plan order, and on_result is called as
+        each one is applied.
+        """
+        logger.debug("[EXECUTOR] Executing %s actions", len(action_plan))
 
-            except Exception as e:
-                print(f"[EXECUTOR]   ❌ Error executing {action_type}: {e}")
-                import traceback
-                traceback.print_exc()
-                results.append({
-                    "status": "error",
-                    "action": action_type,
-                    "error": str(e)
-                })
+        results = await self.action_executor.execute(
+            action_plan,
+            run_action=lambda action: self._run_action(action, context),
+            footprint=self._action_footprint,
+            on_result=on_result
+        )
 
         success_count = len([r for r in results if r.get("status") == "success"])
-        print(f"[EXECUTOR] Execution complete. {success_count}/{len(results)} successful")
+        logger.debug("[EXECUTOR] Execution complete. %s/%s successful", success_count, len(results))
 
         return {
             "actions_executed": len(results),
             "results": results,
             "success": success_count > 0
         }
+
+    async def _run_action(
+        self,
+        action: Dict[str, Any],
+        context: SceneContext
+    ) -> ActionOutcome:
+        """Dispatch a single action to its handler"""
+        action_type = action.get("action", "unknown")
+        handlers = {
+            "generate_object": self._generate_object,
+            "generate_environment": self._generate_environment,
+            "modify_scene": self._modify_scene,
+            "delete_objects": self._delete_objects
+        }
+
+        handler = handlers.get(action_type)
+        if handler is None:
+            logger.warning("[EXECUTOR]   ⚠️ Unknown action type: %s", action_type)
+            return ActionOutcome({
+                "status": "error",
+                "action": action_type,
+                "error": f"Unknown action type: {action_type}"
+            })
+
+        stage = f"action.{action_type}"
+        try:
+            with span(stage):
+                outcome = await handler(action, context)
+            if outcome.result.get("status") == "error":
+                mark_stage_error(stage)
+            logger.debug("[EXECUTOR]   ✓ %s finished: %s", action_type, outcome.result.get('status'))
+            return outcome
+        except Exception as e:
+            logger.error("[EXECUTOR]   ❌ Error executing %s: %s", action_type, e, exc_info=True)
+            return ActionOutcome({
+                "status": "error",
+                "action": action_type,
+                "error": str(e)
+            })
     
     async def _generate_object(
         self,
         action: Dict[str, Any],
         context: SceneContext
-    ) -> Dict[str, Any]:
+    ) -> ActionOutcome:
         """Generate a 3D object"""
-        import traceback
-
         object_type = action.get("object_type", "cube")
         attributes = action.get("attributes", {})
 
-        print(f"[GENERATOR] Generating object: {object_type}, attributes: {attributes}")
+        logger.debug("[GENERATOR] Generating object: %s, attributes: %s", object_type, attributes)
 
         try:
             # Use text-to-3D generator
             if self.text_to_3d:
                 try:
-                    print(f"[GENERATOR] Calling text_to_3d.generate...")
+                    logger.debug("[GENERATOR] Calling text_to_3d.generate...")
                     object_data = await self.text_to_3d.generate(
                         prompt=f"a {object_type}",
                         attributes=attributes
                     )
-                    print(f"[GENERATOR] Generated object data received")
+                    logger.debug("[GENERATOR] Generated object data received")
+                except Exception as gen_error:
+                    logger.warning("⚠️ [GENERATOR] Error in text_to_3d.generate: %s", gen_error, exc_info=True)
+                    raise
 
-                    # Add to context
+                def apply():
                     context.objects.append(object_data)
-                    print(f"[GENERATOR] Added object to context. Total objects: {len(context.objects)}")
+                    logger.debug("[GENERATOR] Added object to context. Total objects: %s", len(context.objects))
 
-                    return {
-                        "status": "success",
-                        "object": object_data
-                    }
-                except Exception as gen_error:
-                    print(f"⚠️ [GENERATOR] Error in text_to_3d.generate: {gen_error}")
-                    traceback.print_exc()
-                    raise
+                return ActionOutcome({
+                    "status": "success",
+                    "object": object_data
+                }, apply)
 
-            print(f"⚠️ [GENERATOR] text_to_3d generator not available")
-            return {
+            logger.warning("⚠️ [GENERATOR] text_to_3d generator not available")
+            return ActionOutcome({
                 "status": "error",
                 "message": "3D generator not available"
-            }
+            })
         except Exception as e:
-            print(f"❌ [GENERATOR] Error generating object: {e}")
-            traceback.print_exc()
-            return {
+            logger.error("❌ [GENERATOR] Error generating object: %s", e, exc_info=True)
+            return ActionOutcome({
                 "status": "error",
                 "message": str(e),
                 "object_type": object_type
-            }
+            })
     
     async def _generate_environment(
         self,
         action: Dict[str, Any],
         context: SceneContext
-    ) -> Dict[str, Any]:
+    ) -> ActionOutcome:
         """Generate an environment"""
         try:
             env_type = action.get("environment_type", "basic")
 
             if self.scene_builder:
                 env_data = await self.scene_builder.create_environment(env_type)
-                context.environment = env_data
 
-                return {
+                def apply():
+                    context.environment = env_data
+
+                return ActionOutcome({
                     "status": "success",
                     "environment": env_data
-                }
+                }, apply)
 
-            return {"status": "error", "message": "Scene builder not available"}
+            return ActionOutcome({"status": "error", "message": "Scene builder not available"})
         except Exception as e:
-            print(f"Error generating environment: {e}")
-            return {"status": "error", "message": str(e)}
+            logger.error("❌ Error generating environment: %s", e)
+            return ActionOutcome({"status": "error", "message": str(e)})
 
     async def _modify_scene(
         self,
         action: Dict[str, Any],
         context: SceneContext
-    ) -> Dict[str, Any]:
-        """Modify existing scene elements"""
-        try:
-            modifications = action.get("modifications", {})
+    ) -> ActionOutcome:
+        """
+        Modify existing scene elements
 
-            # Apply modifications to context
+        Only the object list and the scene sections can be replaced; other
+        context attributes (id, version, history) are internal.
+        """
+        modifications = action.get("modifications", {})
+        if not isinstance(modifications, dict):
+            return ActionOutcome({"status": "error", "message": "Modifications must be an object"})
+        for key, value in modifications.items():
+            expected = list if key == "objects" else dict
+            if key not in MODIFIABLE_ATTRIBUTES:
+                return ActionOutcome({"status": "error", "message": f"Cannot modify '{key}'"})
+            if not isinstance(value, expected):
+                return ActionOutcome({"status": "error", "message": f"'{key}' must be a {expected.__name__}"})
+
+        def apply():
             for key, value in modifications.items():
-                if hasattr(context, key):
-                    setattr(context, key, value)
+                setattr(context, key, value)
 
-            return {
-                "status": "success",
-                "modifications": modifications
-            }
-        except Exception as e:
-            print(f"Error modifying scene: {e}")
-            return {"status": "error", "message": str(e)}
+        return ActionOutcome({
+            "status": "success",
+            "modifications": modifications
+        }, apply)
 
     async def _delete_objects(
         self,
         action: Dict[str, Any],
         context: SceneContext
-    ) -> Dict[str, Any]:
-        """Delete objects from the scene"""
+    ) -> ActionOutcome:
+        """
+        Delete objects from the scene
+
+        Runs after every earlier action that adds objects has been applied,
+        so the remaining object list computed here is current.
+        """
         try:
             targets = action.get("targets", [])
             deleted_count = 0
@@ -689,44 +1272,67 @@ class JarvisOrchestrator:
             # If no targets specified, delete all objects
             if not targets:
                 deleted_count = len(context.objects)
-                context.objects = []
-                return {
+
+                def apply_clear():
+                    context.objects.clear()
+
+                return ActionOutcome({
                     "status": "success",
                     "deleted_count": deleted_count,
                     "message": f"Deleted all {deleted_count} objects"
-                }
+                }, apply_clear)
 
-            # Delete specific targets by index or name
+            # Resolve targets to object ids now; indexes refer to the
+            # object order before any of this action's deletions
+            object_ids = set()
             for target in targets:
                 if isinstance(target, int):
                     # Delete by index
                     if 0 <= target < len(context.objects):
-                        context.objects.pop(target)
-                        deleted_count += 1
+                        object_ids.add(context.objects.id_at(target))
                 elif isinstance(target, dict):
                     # Delete by matching attributes
-                    target_value = target.get("value", "")
-                    context.objects = [obj for obj in context.objects if obj.get("type") != target_value]
-                    deleted_count += 1
+                    object_ids |= context.objects.ids_by("type", target.get("value", ""))
                 elif isinstance(target, str):
-                    # Delete by object type or id
-                    context.objects = [obj for obj in context.objects if obj.get("type") != target and obj.get("id") != target]
-                    deleted_count += 1
+                    # Delete by object id or type
+                    if target in context.objects:
+                        object_ids.add(target)
+                    else:
+                        object_ids |= context.objects.ids_by("type", target)
+            deleted_count = len(object_ids)
+
+            def apply():
+                context.objects.discard(object_ids)
 
-            return {
+            return ActionOutcome({
                 "status": "success",
                 "deleted_count": deleted_count,
                 "message": f"Deleted {deleted_count} object(s)"
-            }
+            }, apply)
         except Exception as e:
-            print(f"Error deleting objects: {e}")
-            return {"status": "error", "message": str(e)}
+            logger.error("❌ Error deleting objects: %s", e)
+            return ActionOutcome({"status": "error", "message": str(e)})
     
+    def scene_payload(self, context: SceneContext, since_version: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Scene part of a response: a delta from since_version when the
+        change log covers it cheaply, otherwise the full scene
+        """
+        if since_version is not None:
+            delta = context.delta_since(since_version)
+            if delta is not None:
+                return {"scene_version": context.version, "delta": delta}
+        return {"scene_version": context.version, "scene": self._serialize_context(context)}
+
     def _serialize_context(self, context: SceneContext) -> Dict[str, Any]:
         """Convert context to JSON-serializable format"""
         return {
             "scene_id": context.scene_id,
-            "objects": context.objects,
+            "version": context.version,
+            # Snapshot, so later requests on this scene cannot change a
+            # response that has not been encoded yet; carries each object's
+            # cached encoding
+            "objects": context.objects.to_encoded_list(),
             "environment": context.environment,
             "lighting": context.lighting,
             "camera": context.camera,
@@ -735,5 +1341,17 @@ class JarvisOrchestrator:
     
     async def cleanup(self):
         """Cleanup resources"""
-        print("🧹 Cleaning up resources...")
+        logger.info("🧹 Cleaning up resources...")
+        if self._flush_task:
+            self._flush_task.cancel()
+        if self._warm_up_task:
+            self._warm_up_task.cancel()
+        try:
+            await self.active_contexts.flush_async()
+        except Exception as e:
+            logger.warning("⚠️ Error flushing scene contexts: %s", e)
         self.active_contexts.clear()
+        if self.active_contexts.backend:
+            self.active_contexts.backend.close()
+        if self.nlp_processor:
+            self.nlp_processor.close()
@@ -0,0 +1,381 @@
+"""
+Scene Context Persistence
+
+Pluggable storage backends that keep scene contexts across restarts and
+share them between worker processes. Contexts are stored as
+zlib-compressed compact JSON with a version number used for optimistic
+concurrency control.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from abc import ABC, abstractmethod
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class ContextVersionConflict(Exception):
+    """Raised when a context was changed by another worker since it was loaded"""
+
+    def __init__(self, context_id: str, expected_version: int, actual_version: Optional[int]):
+        super().__init__(
+            f"Context {context_id} is at version {actual_version}, expected {expected_version}"
+        )
+        self.context_id = context_id
+        self.expected_version = expected_version
+        self.actual_version = actual_version
+
+
+def encode_payload(data: Dict[str, Any]) -> bytes:
+    """Encode a context dict into the compact on-disk format"""
+    return zlib.compress(
+        json.dumps(data, separators=(",", ":"), default=str).encode("utf-8")
+    )
+
+
+def decode_payload(payload: bytes) -> Dict[str, Any]:
+    """Decode a context dict from the compact on-disk format"""
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+class ContextBackend(ABC):
+    """
+    Base class for persistent context storage
+
+    Every stored context has a version that starts at 1 and increases by
+    one on each save. Version 0 means "never saved". Subclasses must
+    implement the abstract methods; history storage is optional.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def load(self, context_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Load a stored context and its version, or None if it does not exist"""
+
+    @abstractmethod
+    def get_version(self, context_id: str) -> Optional[int]:
+        """Current version of a stored context, or None if it does not exist"""
+
+    @abstractmethod
+    def save(
+        self,
+        context_id: str,
+        data: Dict[str, Any],
+        expected_version: Optional[int] = None,
+        history: Optional[List[Dict[str, Any]]] = None
+    ) -> int:
+        """
+        Store a context and return its new version
+
+        If expected_version is given, the save only succeeds when the stored
+        version still matches it; otherwise ContextVersionConflict is raised.
+        History entries compacted out of the context's ring buffer are
+        stored only if the save succeeds.
+        """
+
+    @abstractmethod
+    def delete(self, context_id: str):
+        """Remove a stored context"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored contexts"""
+
+    def load_history(self, context_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recent spilled history entries, oldest first"""
+        return []
+
+    def close(self):
+        """Release backend resources"""
+
+
+class SQLiteContextBackend(ContextBackend):
+    """
+    Stores contexts in a single SQLite database file
+
+    The database runs in WAL mode, so several worker processes can share
+    the same file.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=busy_timeout
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS contexts ("
+            " context_id TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " version INTEGER NOT NULL DEFAULT 1,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS context_history ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " context_id TEXT NOT NULL,"
+            " entry BLOB NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS context_history_by_context ON context_history (context_id, id)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(contexts)")]
+        if "version" not in columns:
+            # Databases created before versioning was added
+            self._conn.execute("ALTER TABLE contexts ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+    def load(self, context_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, version FROM contexts WHERE context_id = ?", (context_id,)
+            ).fetchone()
+        return (decode_payload(row[0]), row[1]) if row else None
+
+    def get_version(self, context_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM contexts WHERE context_id = ?", (context_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(
+        self,
+        context_id: str,
+        data: Dict[str, Any],
+        expected_version: Optional[int] = None,
+        history: Optional[List[Dict[str, Any]]] = None
+    ) -> int:
+        payload = encode_payload(data)
+        entries = [(context_id, encode_payload(entry)) for entry in history or []]
+
+        with self._lock:
+            # The context and its spilled history are written together or not at all
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._save_unlocked(context_id, payload, expected_version)
+                if entries:
+                    self._conn.executemany(
+                        "INSERT INTO context_history (context_id, entry) VALUES (?, ?)", entries
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return version
+
+    def _save_unlocked(self, context_id: str, payload: bytes, expected_version: Optional[int]) -> int:
+        now = time.time()
+        if expected_version is None:
+            self._conn.execute(
+                "INSERT INTO contexts (context_id, data, version, updated_at) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(context_id) DO UPDATE SET "
+                "data = excluded.data, version = contexts.version + 1, updated_at = excluded.updated_at",
+                (context_id, payload, now)
+            )
+            return self._conn.execute(
+                "SELECT version FROM contexts WHERE context_id = ?", (context_id,)
+            ).fetchone()[0]
+
+        if expected_version == 0:
+            try:
+                self._conn.execute(
+                    "INSERT INTO contexts (context_id, data, version, updated_at) VALUES (?, ?, 1, ?)",
+                    (context_id, payload, now)
+                )
+                return 1
+            except sqlite3.IntegrityError:
+                raise ContextVersionConflict(context_id, 0, self._version_unlocked(context_id))
+
+        cursor = self._conn.execute(
+            "UPDATE contexts SET data = ?, version = version + 1, updated_at = ? "
+            "WHERE context_id = ? AND version = ?",
+            (payload, now, context_id, expected_version)
+        )
+        if cursor.rowcount == 0:
+            raise ContextVersionConflict(
+                context_id, expected_version, self._version_unlocked(context_id)
+            )
+        return expected_version + 1
+
+    def _version_unlocked(self, context_id: str) -> Optional[int]:
+        row = self._conn.execute(
+            "SELECT version FROM contexts WHERE context_id = ?", (context_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def delete(self, context_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM contexts WHERE context_id = ?", (context_id,))
+            self._conn.execute("DELETE FROM context_history WHERE context_id = ?", (context_id,))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM contexts").fetchone()[0]
+
+    def load_history(self, context_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entry FROM context_history WHERE context_id = ? ORDER BY id DESC LIMIT ?",
+                (context_id, limit)
+            ).fetchall()
+        return [decode_payload(row[0]) for row in reversed(rows)]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class FileContextBackend(ContextBackend):
+    """
+    Stores each context as a compressed file in a directory
+
+    Versioned saves take a per-context lock file (created with O_EXCL, so
+    it works on every platform), which makes compare-and-swap safe across
+    worker processes on the same host. A save gives up with TimeoutError
+    if the lock stays taken for lock_timeout seconds.
+    """
+
+    name = "file"
+
+    def __init__(self, directory: str, lock_timeout: float = 0.5, stale_lock_age: float = 30.0):
+        self.directory = directory
+        self.lock_timeout = lock_timeout
+        self.stale_lock_age = stale_lock_age
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, context_id: str) -> str:
+        # Context ids are UUIDs; strip anything that could escape the directory
+        safe_id = "".join(c for c in context_id if c.isalnum() or c in "-_")
+        return os.path.join(self.directory, f"{safe_id}.json.z")
+
+    def _read(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "rb") as f:
+                record = decode_payload(f.read())
+        except FileNotFoundError:
+            return None
+        if "context" not in record:
+            # Files written before versioning was added
+            record = {"version": 1, "context": record}
+        return record
+
+    def load(self, context_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        record = self._read(self._path(context_id))
+        return (record["context"], record["version"]) if record else None
+
+    def get_version(self, context_id: str) -> Optional[int]:
+        record = self._read(self._path(context_id))
+        return record["version"] if record else None
+
+    def save(
+        self,
+        context_id: str,
+        data: Dict[str, Any],
+        expected_version: Optional[int] = None,
+        history: Optional[List[Dict[str, Any]]] = None
+    ) -> int:
+        path = self._path(context_id)
+        lock_path = f"{path}.lock"
+        self._acquire_lock(lock_path)
+        try:
+            record = self._read(path)
+            current_version = record["version"] if record else 0
+            if expected_version is not None and expected_version != current_version:
+                raise ContextVersionConflict(
+                    context_id, expected_version, current_version if record else None
+                )
+
+            new_version = current_version + 1
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(encode_payload({"version": new_version, "context": data}))
+            # Atomic replace so readers never see a partial file
+            os.replace(tmp_path, path)
+            if history:
+                # Still under the lock, so only the winning save appends
+                self._append_history(context_id, history)
+            return new_version
+        finally:
+            self._release_lock(lock_path)
+
+    def _acquire_lock(self, lock_path: str):
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > self.stale_lock_age:
+                        # Left behind by a crashed worker
+                        self._release_lock(lock_path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Timed out waiting for context lock {lock_path}")
+                time.sleep(0.005)
+
+    def _release_lock(self, lock_path: str):
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+    def _history_path(self, context_id: str) -> str:
+        return self._path(context_id)[:-len(".json.z")] + ".history.jsonl"
+
+    def delete(self, context_id: str):
+        for path in (self._path(context_id), self._history_path(context_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def count(self) -> int:
+        return len([name for name in os.listdir(self.directory) if name.endswith(".json.z")])
+
+    def _append_history(self, context_id: str, entries: List[Dict[str, Any]]):
+        # Appends of a single short line are atomic on local filesystems
+        with open(self._history_path(context_id), "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(",", ":"), default=str) + "\n")
+
+    def load_history(self, context_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        try:
+            with open(self._history_path(context_id), "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        return [json.loads(line) for line in lines[-limit:] if line.strip()]
+
+
+def create_context_backend() -> Optional[ContextBackend]:
+    """
+    Create the context backend configured by the environment
+
+    JARVIS_CONTEXT_BACKEND selects "sqlite" (default), "file" or "memory"
+    (no persistence). JARVIS_CONTEXT_PATH sets the database file or
+    directory.
+    """
+    backend_type = os.getenv("JARVIS_CONTEXT_BACKEND", "sqlite").lower()
+
+    if backend_type in ("memory", "none", ""):
+        return None
+    if backend_type == "file":
+        return FileContextBackend(os.getenv("JARVIS_CONTEXT_PATH", os.path.join("data", "contexts")))
+    if backend_type == "sqlite":
+        return SQLiteContextBackend(os.getenv("JARVIS_CONTEXT_PATH", os.path.join("data", "contexts.db")))
+
+    raise ValueError(f"Unknown context backend: {backend_type}")
@@ -0,0 +1,101 @@
+"""
+Action Plan Cache
+
+Memoizes action plans for repeated commands. Plans are keyed on the
+normalized command text, a fingerprint of the uploaded image, the video
+URL and a signature of the scene state planning depends on, so a
+repeated command skips NLP, vision and planning entirely.
+"""
+from typing import Dict, Any, List, Optional, Tuple, Hashable
+from collections import OrderedDict
+from copy import deepcopy
+import hashlib
+import re
+
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s.!?,;:]+$")
+
+
+def normalize_command(text: Optional[str]) -> str:
+    """Case- and whitespace-insensitive form of a command"""
+    if not text:
+        return ""
+    text = _WHITESPACE.sub(" ", text.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def fingerprint_file(path: Optional[str], chunk_size: int = 1 << 20) -> Optional[str]:
+    """Content hash of a file, or None if there is no readable file"""
+    if not path:
+        return None
+    digest = hashlib.sha1()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class PlanCache:
+    """
+    LRU cache of action plans
+
+    Plans are copied on the way in and out, so executing a cached plan
+    can never change the cached copy.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._plans: "OrderedDict[Hashable, List[Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: Hashable) -> Optional[List[Dict[str, Any]]]:
+        plan = self._plans.get(key)
+        if plan is None:
+            self.misses += 1
+            return None
+        self._plans.move_to_end(key)
+        self.hits += 1
+        return deepcopy(plan)
+
+    def put(self, key: Hashable, plan: List[Dict[str, Any]]):
+        if not self.enabled:
+            return
+        self._plans[key] = deepcopy(plan)
+        self._plans.move_to_end(key)
+        while len(self._plans) > self.max_entries:
+            self._plans.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._plans.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache occupancy and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._plans),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+
+def plan_cache_key(
+    text: Optional[str],
+    image_fingerprint: Optional[str],
+    video_url: Optional[str],
+    scene_signature: Tuple
+) -> Tuple:
+    return (normalize_command(text), image_fingerprint, video_url or None, scene_signature)
@@ -0,0 +1,131 @@
+"""
+Scene Versioning
+
+Monotonic scene versions with a bounded change log, so clients that
+already hold a scene can fetch a small delta instead of the full
+snapshot.
+
+Deltas are lists of JSON-Patch style operations ({"op", "path",
+"value"}). Objects are addressed by id ("/objects/<id>") rather than by
+list position, so operations stay valid however objects are reordered
+or removed. Scene sections are addressed by name ("/environment").
+"""
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+from collections import deque
+import os
+
+
+# Top-level scene sections versioned alongside the objects
+SCENE_SECTIONS = ("environment", "lighting", "camera")
+
+# Number of versions whose changes are kept per scene
+CHANGE_LOG_DEPTH = int(os.getenv("JARVIS_SCENE_CHANGE_LOG", "100"))
+
+# A delta is replaced by a full snapshot once it has more operations than
+# this fraction of the scene's object count (plus the scene sections)
+SNAPSHOT_RATIO = float(os.getenv("JARVIS_SCENE_DELTA_RATIO", "0.5"))
+
+Operation = Dict[str, Any]
+
+
+def compact_operations(operations: Iterable[Operation]) -> List[Operation]:
+    """
+    Merge consecutive operations on the same path into at most one each
+
+    An add followed by a remove cancels out, a remove followed by an add
+    becomes a replace, and an add followed by a replace stays an add with
+    the latest value.
+    """
+    merged: Dict[str, Operation] = {}
+    for operation in operations:
+        path = operation["path"]
+        if operation["op"] != "remove" and path.count("/") == 1:
+            # Replacing a whole section supersedes earlier changes inside it
+            for child in [key for key in merged if key.startswith(path + "/")]:
+                del merged[child]
+        previous = merged.pop(path, None)
+        if previous is None:
+            merged[path] = operation
+        elif operation["op"] == "remove":
+            if previous["op"] != "add":
+                merged[path] = operation
+        elif previous["op"] == "add":
+            merged[path] = {**operation, "op": "add"}
+        elif previous["op"] == "remove" and operation["op"] == "add":
+            merged[path] = {**operation, "op": "replace"}
+        else:
+            merged[path] = operation
+    return list(merged.values())
+
+
+class SceneChangeLog:
+    """
+    Operations recorded for recent scene versions
+
+    Each entry holds the operations that took the scene from the previous
+    version to the entry's version.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[int, List[Operation]]] = (), depth: int = CHANGE_LOG_DEPTH):
+        self._entries: "deque[Tuple[int, List[Operation]]]" = deque(
+            ((version, operations) for version, operations in entries), maxlen=depth
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def oldest_version(self) -> Optional[int]:
+        """Earliest version a delta can start from"""
+        if not self._entries:
+            return None
+        return self._entries[0][0] - 1
+
+    def record(self, version: int, operations: List[Operation]):
+        self._entries.append((version, operations))
+
+    def operations_since(self, since_version: int, current_version: int) -> Optional[List[Operation]]:
+        """
+        Compacted operations from since_version up to current_version
+
+        Returns None when the log no longer covers since_version.
+        """
+        if since_version == current_version:
+            return []
+        if since_version > current_version:
+            return None
+        oldest = self.oldest_version
+        if oldest is None or since_version < oldest:
+            return None
+        return compact_operations(
+            operation
+            for version, operations in self._entries
+            if version > since_version
+            for operation in operations
+        )
+
+    def to_list(self) -> List[List[Any]]:
+        return [[version, operations] for version, operations in self._entries]
+
+
+def build_delta(
+    change_log: SceneChangeLog,
+    since_version: int,
+    current_version: int,
+    object_count: int
+) -> Optional[Dict[str, Any]]:
+    """
+    Delta from since_version to current_version, or None when a full
+    snapshot should be sent instead
+    """
+    operations = change_log.operations_since(since_version, current_version)
+    if operations is None:
+        return None
+    if len(operations) > int(object_count * SNAPSHOT_RATIO) + len(SCENE_SECTIONS):
+        # Close to the size of the scene itself
+        return None
+    return {
+        "from_version": since_version,
+        "to_version": current_version,
+        "operations": operations
+    }
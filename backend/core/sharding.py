@@ -0,0 +1,127 @@
+"""
+Context Sharding
+
+Consistent hashing of scene context ids onto worker processes, plus the
+helpers the shard router uses to find the context id of a request.
+"""
+from typing import Dict, Any, List, Optional, Iterable
+from bisect import bisect
+from urllib.parse import parse_qs
+import hashlib
+import json
+import re
+
+
+# Header used by the shard router to hand a pre-assigned id to the worker
+# that will create a new context
+ASSIGNED_CONTEXT_HEADER = "X-Jarvis-Context-Id"
+
+# Request paths that address a context directly: /api/scene/{id}... and
+# /api/simulation/{id}/...
+_CONTEXT_PATH = re.compile(r"^/?api/(?:scene|simulation)/([^/]+)(?:/|$)")
+
+# Paths under /api/simulation/ that are not context ids
+_RESERVED_SIMULATION_PATHS = {"metrics"}
+
+
+def _hash(key: str) -> int:
+    """Stable 64-bit hash, identical in every process"""
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping context ids to workers
+
+    Each worker owns many virtual points on the ring, so adding or removing
+    a worker only moves about 1/N of the contexts.
+    """
+
+    def __init__(self, workers: Iterable[str] = (), replicas: int = 128):
+        self.replicas = replicas
+        self.workers: List[str] = []
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        for worker in workers:
+            self.add_worker(worker)
+
+    def add_worker(self, worker: str):
+        """Add a worker and its virtual points"""
+        if worker in self.workers:
+            return
+        self.workers.append(worker)
+        for i in range(self.replicas):
+            self._owners[_hash(f"{worker}#{i}")] = worker
+        self._points = sorted(self._owners)
+
+    def remove_worker(self, worker: str):
+        """Remove a worker and its virtual points"""
+        if worker not in self.workers:
+            return
+        self.workers.remove(worker)
+        self._owners = {point: owner for point, owner in self._owners.items() if owner != worker}
+        self._points = sorted(self._owners)
+
+    def owner(self, context_id: str) -> str:
+        """Worker that owns a context"""
+        if not self._points:
+            raise LookupError("No workers in the hash ring")
+        index = bisect(self._points, _hash(context_id)) % len(self._points)
+        return self._owners[self._points[index]]
+
+    def copy(self) -> "HashRing":
+        return HashRing(self.workers, replicas=self.replicas)
+
+    def moved(self, context_ids: Iterable[str], new_ring: "HashRing") -> Dict[str, Dict[str, str]]:
+        """Contexts whose owner differs between this ring and new_ring"""
+        moves = {}
+        for context_id in context_ids:
+            old_owner = self.owner(context_id)
+            new_owner = new_ring.owner(context_id)
+            if old_owner != new_owner:
+                moves[context_id] = {"from": old_owner, "to": new_owner}
+        return moves
+
+
+def context_id_from_path(path: str) -> Optional[str]:
+    """Context id addressed by a request path, if any"""
+    match = _CONTEXT_PATH.match(path)
+    if not match or match.group(1) in _RESERVED_SIMULATION_PATHS:
+        return None
+    return match.group(1)
+
+
+def _multipart_field(body: bytes, boundary: bytes, name: str) -> Optional[str]:
+    """Read one plain form field from a multipart body without parsing files"""
+    marker = f'name="{name}"'.encode("utf-8")
+    for part in body.split(b"--" + boundary):
+        head, sep, value = part.partition(b"\r\n\r\n")
+        if sep and marker in head and b"filename=" not in head:
+            return value.rstrip(b"\r\n").decode("utf-8", errors="replace")
+    return None
+
+
+def context_id_from_body(content_type: str, body: bytes) -> Optional[str]:
+    """Context id carried in a JSON, urlencoded or multipart request body"""
+    if not body:
+        return None
+    content_type = content_type or ""
+
+    try:
+        if content_type.startswith("application/json"):
+            data: Any = json.loads(body)
+            value = data.get("context_id") if isinstance(data, dict) else None
+            return value or None
+
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            values = parse_qs(body.decode("utf-8")).get("context_id")
+            return values[0] if values else None
+
+        if content_type.startswith("multipart/form-data"):
+            match = re.search(r'boundary="?([^";]+)"?', content_type)
+            if match:
+                return _multipart_field(body, match.group(1).encode("utf-8"), "context_id") or None
+    except Exception:
+        return None
+
+    return None
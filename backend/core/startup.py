@@ -0,0 +1,69 @@
+"""
+Startup Timing
+
+Records how long each phase of a cold start takes (module imports,
+processor initialization, background warm-up) and the time until the
+service first reports ready, for logs, /api/diagnostics and /metrics.
+"""
+from typing import Dict, Any, Optional
+from contextlib import contextmanager
+import logging
+import time
+
+from core.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+
+STARTUP_PHASE = registry.gauge(
+    "jarvis_startup_phase_seconds", "Duration of each startup phase", ("phase",)
+)
+TIME_TO_READY = registry.gauge(
+    "jarvis_startup_time_to_ready_seconds", "Seconds from process start until the service was ready"
+)
+
+
+class StartupTimer:
+    """Durations of named startup phases, measured from a common start"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.time_to_ready: Optional[float] = None
+
+    def record(self, phase: str, seconds: float):
+        self.phases[phase] = seconds
+        STARTUP_PHASE.set(phase, value=seconds)
+
+    def mark(self, phase: str):
+        """Record a phase that ran from process start until now"""
+        self.record(phase, time.perf_counter() - self.started_at)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block as one startup phase; phases may overlap"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def ready(self):
+        """Record the time to ready and log the per-phase report"""
+        self.time_to_ready = time.perf_counter() - self.started_at
+        TIME_TO_READY.set(value=self.time_to_ready)
+        logger.info(
+            "⏱️ Ready in %.0fms (%s)",
+            self.time_to_ready * 1000,
+            ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in self.phases.items())
+        )
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "time_to_ready_ms": round(self.time_to_ready * 1000, 1) if self.time_to_ready is not None else None,
+            "phases_ms": {phase: round(seconds * 1000, 1) for phase, seconds in self.phases.items()}
+        }
+
+
+# Created when main imports this module, before anything heavy is loaded
+startup_timer = StartupTimer()
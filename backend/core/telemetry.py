@@ -0,0 +1,299 @@
+"""
+Request Tracing and Metrics
+
+Times each stage of a request in spans tied together by a request id,
+and keeps counters, gauges and latency histograms that are exposed in
+the Prometheus text format on /metrics.
+"""
+from typing import Dict, Any, List, Optional, Callable, Tuple, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import logging
+import time
+import uuid
+
+from simulation.metrics import TimingHistogram
+
+logger = logging.getLogger(__name__)
+
+
+# Histogram bucket upper bounds in seconds for request and stage latency
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+REQUEST_ID_HEADER = "X-Request-Id"
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def set(self, *label_values: str, value: float):
+        """Set the value directly, e.g. to mirror a count kept elsewhere"""
+        self.values[label_values] = value
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, float]]:
+        for label_values, value in self.values.items():
+            yield self.name, label_values, value
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1.0):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    """Latency histogram with optional labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.histograms: Dict[LabelValues, TimingHistogram] = {}
+
+    def observe(self, *label_values: str, value: float):
+        histogram = self.histograms.get(label_values)
+        if histogram is None:
+            histogram = self.histograms[label_values] = TimingHistogram(self.buckets)
+        histogram.observe(value)
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, float]]:
+        for label_values, histogram in self.histograms.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram.counts):
+                cumulative += count
+                yield f"{self.name}_bucket", label_values + (_format_value(bound),), cumulative
+            yield f"{self.name}_bucket", label_values + ("+Inf",), histogram.count
+            yield f"{self.name}_sum", label_values, histogram.total
+            yield f"{self.name}_count", label_values, histogram.count
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            ",".join(label_values) or "all": histogram.to_dict()
+            for label_values, histogram in self.histograms.items()
+        }
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together on /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        # Called before rendering to refresh gauges that mirror other state
+        self._collectors: List[Callable[[], None]] = []
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Histogram:
+        return self._register(Histogram(name, help_text, labels))
+
+    def add_collector(self, collector: Callable[[], None]):
+        self._collectors.append(collector)
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning("⚠️ Metrics collector failed: %s", e)
+
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            label_names = metric.labels + (("le",) if metric.kind == "histogram" else ())
+            for sample_name, label_values, value in metric.samples():
+                names = label_names if len(label_values) == len(label_names) else metric.labels
+                labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, label_values))
+                lines.append(f"{sample_name}{{{labels}}} {value}" if labels else f"{sample_name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter(
+    "jarvis_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+)
+REQUEST_LATENCY = registry.histogram(
+    "jarvis_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+REQUESTS_IN_FLIGHT = registry.gauge(
+    "jarvis_requests_in_flight", "HTTP requests currently being handled"
+)
+STAGE_LATENCY = registry.histogram(
+    "jarvis_stage_duration_seconds", "Latency of each request processing stage", ("stage",)
+)
+STAGES_IN_FLIGHT = registry.gauge(
+    "jarvis_stage_in_flight", "Request processing stages currently running", ("stage",)
+)
+STAGE_ERRORS = registry.counter(
+    "jarvis_stage_errors_total", "Request processing stages that raised or failed", ("stage",)
+)
+
+
+@dataclass
+class Trace:
+    """Spans recorded while handling one request"""
+    request_id: str
+    started_at: float = field(default_factory=time.perf_counter)
+    spans: List[Dict[str, Any]] = field(default_factory=list)
+
+    def server_timing(self) -> str:
+        """Spans as a Server-Timing header value (durations in milliseconds)"""
+        totals: Dict[str, float] = {}
+        for span_record in self.spans:
+            totals[span_record["stage"]] = totals.get(span_record["stage"], 0.0) + span_record["duration_ms"]
+        return ", ".join(f"{stage};dur={duration:.2f}" for stage, duration in totals.items())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"request_id": self.request_id, "spans": list(self.spans)}
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("jarvis_trace", default=None)
+
+
+def start_trace(request_id: Optional[str] = None) -> Trace:
+    """Begin a trace for the current request and make it current"""
+    trace = Trace(request_id=request_id or uuid.uuid4().hex)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+
+def mark_stage_error(stage: str):
+    """Count a stage that handled its own failure instead of raising"""
+    STAGE_ERRORS.inc(stage)
+
+
+@contextmanager
+def span(stage: str, **attributes: Any):
+    """
+    Time one stage of the current request
+
+    The duration goes into the stage latency histogram and, when a trace
+    is active, into the trace with its offset from the request start.
+    Works in sync and async code; concurrent stages get separate spans.
+    """
+    trace = _current_trace.get()
+    STAGES_IN_FLIGHT.inc(stage)
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        STAGES_IN_FLIGHT.dec(stage)
+        STAGE_LATENCY.observe(stage, value=duration)
+        if trace is not None:
+            trace.spans.append({
+                "stage": stage,
+                "start_ms": round((started - trace.started_at) * 1000, 3),
+                "duration_ms": round(duration * 1000, 3),
+                "status": status,
+                **attributes
+            })
+            logger.debug("[TRACE] %s %s %.2fms %s", trace.request_id, stage, duration * 1000, status)
+
+
+class TelemetryMiddleware:
+    """
+    ASGI middleware that starts a trace for every HTTP request
+
+    Counts requests and their latency by route template, tracks requests
+    in flight, and returns the request id (X-Request-Id, taken from the
+    request when present) and a Server-Timing header with the stage
+    durations.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128] or None
+                break
+        trace = start_trace(request_id)
+        status_code = 500
+
+        async def send_with_trace_headers(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.lower().encode("latin-1"), trace.request_id.encode("latin-1")))
+                timing = trace.server_timing()
+                if timing:
+                    headers.append((b"server-timing", timing.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_trace_headers)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # Route templates keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", None) or "other"
+            duration = time.perf_counter() - trace.started_at
+            REQUESTS.inc(scope["method"], route, str(status_code))
+            REQUEST_LATENCY.observe(scope["method"], route, value=duration)
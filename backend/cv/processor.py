@@ -5,28 +5,52 @@ Handles image and video analysis for 3D content generation.
 """
 from typing import Dict, Any, List, Optional
 import asyncio
+import logging
+import threading
+
+from core import colors
+
+logger = logging.getLogger(__name__)
+
+# CV dependencies are heavy to import, so they are loaded on first use
+# (or by warm_up) rather than when this module is imported
+cv2 = None
+np = None
+Image = None
+HAS_CV2 = False
+HAS_NUMPY = False
+HAS_PIL = False
+_dependencies_loaded = False
+_dependencies_lock = threading.Lock()
+
+
+def load_dependencies():
+    """Import OpenCV, NumPy and PIL once, using graceful fallbacks"""
+    global cv2, np, Image, HAS_CV2, HAS_NUMPY, HAS_PIL, _dependencies_loaded
+    if _dependencies_loaded:
+        return
+    with _dependencies_lock:
+        if _dependencies_loaded:
+            return
+        try:
+            import cv2 as _cv2
+            cv2, HAS_CV2 = _cv2, True
+        except ImportError:
+            logger.warning("⚠️ Warning: OpenCV (cv2) not available, using fallback CV processor")
+
+        try:
+            import numpy as _np
+            np, HAS_NUMPY = _np, True
+        except ImportError:
+            logger.warning("⚠️ Warning: NumPy not available")
 
-# Try to import CV dependencies, use graceful fallback if unavailable
-try:
-    import cv2
-    HAS_CV2 = True
-except ImportError:
-    print("⚠️ Warning: OpenCV (cv2) not available, using fallback CV processor")
-    HAS_CV2 = False
-
-try:
-    import numpy as np
-    HAS_NUMPY = True
-except ImportError:
-    print("⚠️ Warning: NumPy not available")
-    HAS_NUMPY = False
-
-try:
-    from PIL import Image
-    HAS_PIL = True
-except ImportError:
-    print("⚠️ Warning: PIL not available")
-    HAS_PIL = False
+        try:
+            from PIL import Image as _Image
+            Image, HAS_PIL = _Image, True
+        except ImportError:
+            logger.warning("⚠️ Warning: PIL not available")
+
+        _dependencies_loaded = True
 
 
 class ComputerVisionProcessor:
@@ -40,7 +64,12 @@ class ComputerVisionProcessor:
     async def initialize(self):
         """Initialize CV models"""
         self.initialized = True
-        print("✓ Computer Vision Processor ready")
+        logger.info("✓ Computer Vision Processor ready")
+
+    async def warm_up(self):
+        """Load the CV dependencies and color table ahead of the first image request"""
+        await asyncio.to_thread(load_dependencies)
+        await asyncio.to_thread(colors.warm_up)
     
     async def process_image(self, image_path: str) -> Dict[str, Any]:
         """
@@ -52,6 +81,9 @@ class ComputerVisionProcessor:
         Returns:
             Extracted visual features and detected objects
         """
+        if not _dependencies_loaded:
+            await asyncio.to_thread(load_dependencies)
+
         if not HAS_CV2:
             # Fallback if CV2 not available
             return {
@@ -64,6 +96,11 @@ class ComputerVisionProcessor:
                 "warning": "CV2 not available - using minimal analysis"
             }
 
+        # OpenCV work is CPU-bound, keep it off the event loop
+        return await asyncio.to_thread(self._analyze_image, image_path)
+
+    def _analyze_image(self, image_path: str) -> Dict[str, Any]:
+        """Run the blocking image analysis"""
         try:
             # Load image
             img = cv2.imread(image_path)
@@ -76,8 +113,12 @@ class ComputerVisionProcessor:
             # Basic analysis
             height, width = img.shape[:2]
 
-            # Detect dominant colors
+            # Detect dominant colors and name them with the shared lookup table
             dominant_colors = self._extract_dominant_colors(img_rgb)
+            dominant_color_names = (
+                colors.rgb_array_to_names(np.array(dominant_colors, dtype=np.uint8)).tolist()
+                if dominant_colors else []
+            )
 
             # Simple edge detection for complexity
             edges = cv2.Canny(img, 100, 200)
@@ -89,6 +130,7 @@ class ComputerVisionProcessor:
             return {
                 "dimensions": {"width": width, "height": height},
                 "dominant_colors": dominant_colors,
+                "dominant_color_names": dominant_color_names,
                 "complexity": float(complexity),
                 "depth_estimate": depth_info,
                 "objects": [],  # Would be populated by object detection model
@@ -117,7 +159,12 @@ class ComputerVisionProcessor:
         }
     
     def _extract_dominant_colors(self, img, k: int = 5) -> List[List[int]]:
-        """Extract dominant colors using k-means clustering"""
+        """
+        Extract the dominant colors of an image, as measured RGB
+
+        Pixels are binned by RGB quantized to 4 bits per channel; the k
+        fullest bins are returned as the mean color of their pixels.
+        """
         if not HAS_NUMPY:
             return []
 
@@ -129,12 +176,15 @@ class ComputerVisionProcessor:
             indices = np.random.choice(len(pixels), 10000, replace=False)
             pixels = pixels[indices]
 
-        # Simple color extraction (could use k-means for better results)
-        unique_colors = np.unique(pixels, axis=0)
-
-        # Return top 5 most common
-        colors = unique_colors[:min(k, len(unique_colors))]
-        return [color.tolist() for color in colors]
+        pixels = pixels.astype(np.intp)
+        bins = (pixels[:, 0] >> 4) << 8 | (pixels[:, 1] >> 4) << 4 | (pixels[:, 2] >> 4)
+        counts = np.bincount(bins, minlength=4096)
+        sums = np.stack(
+            [np.bincount(bins, weights=pixels[:, channel], minlength=4096) for channel in range(3)],
+            axis=1
+        )
+        top = [index for index in np.argsort(counts)[::-1][:k] if counts[index] > 0]
+        return [[int(round(value)) for value in sums[index] / counts[index]] for index in top]
     
     def _estimate_depth(self, img) -> Dict[str, Any]:
         """Simplified depth estimation"""
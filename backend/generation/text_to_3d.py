@@ -6,8 +6,13 @@ Generates 3D models from natural language descriptions.
 from typing import Dict, Any, Optional
 import uuid
 import json
+import logging
 import math
 
+from core import colors
+
+logger = logging.getLogger(__name__)
+
 
 class TextTo3DGenerator:
     """
@@ -31,7 +36,7 @@ class TextTo3DGenerator:
         """Initialize the 3D generation model"""
         # In production, this would load actual ML models
         self.model_loaded = True
-        print("✓ Text-to-3D Generator ready (using procedural fallback)")
+        logger.info("✓ Text-to-3D Generator ready (using procedural fallback)")
     
     async def generate(
         self,
@@ -48,7 +53,7 @@ class TextTo3DGenerator:
         Returns:
             3D model data in a structured format
         """
-        print(f"[3D_GEN] Generating 3D model from prompt: {prompt}")
+        logger.debug("[3D_GEN] Generating 3D model from prompt: %s", prompt)
 
         try:
             if attributes is None:
@@ -56,17 +61,22 @@ class TextTo3DGenerator:
 
             # Extract object type from prompt
             object_type = self._extract_object_type(prompt)
-            print(f"[3D_GEN] Extracted object type: {object_type}")
+            logger.debug("[3D_GEN] Extracted object type: %s", object_type)
 
             # Generate based on type
             if object_type in self.primitive_shapes:
-                print(f"[3D_GEN] Using primitive shape generator for: {object_type}")
+                logger.debug("[3D_GEN] Using primitive shape generator for: %s", object_type)
                 model_data = self.primitive_shapes[object_type](attributes)
             else:
                 # For complex objects, create a placeholder
-                print(f"[3D_GEN] Using complex object generator for: {object_type}")
+                logger.debug("[3D_GEN] Using complex object generator for: %s", object_type)
                 model_data = self._generate_complex_object(prompt, attributes)
 
+            # Keep the material the user asked for, e.g. "wood"; "type" is
+            # the renderer's material class
+            if attributes.get("material") and isinstance(model_data.get("material"), dict):
+                model_data["material"]["name"] = str(attributes["material"]).lower()
+
             # Add metadata
             model_data.update({
                 "id": str(uuid.uuid4()),
@@ -75,13 +85,11 @@ class TextTo3DGenerator:
                 "generated_by": "text_to_3d"
             })
 
-            print(f"[3D_GEN] 3D model generated successfully")
+            logger.debug("[3D_GEN] 3D model generated successfully")
             return model_data
 
         except Exception as e:
-            print(f"❌ [3D_GEN] Error generating 3D model: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.error("❌ [3D_GEN] Error generating 3D model: %s", e, exc_info=True)
 
             # Return a fallback cube
             return {
@@ -276,21 +284,4 @@ class TextTo3DGenerator:
     
     def _parse_color(self, color: str) -> str:
         """Convert color name to hex code"""
-        color_map = {
-            "red": "#ff0000",
-            "blue": "#0000ff",
-            "green": "#00ff00",
-            "yellow": "#ffff00",
-            "white": "#ffffff",
-            "black": "#000000",
-            "gray": "#808080",
-            "purple": "#800080",
-            "orange": "#ffa500",
-            "brown": "#8B4513"
-        }
-        
-        # If already a hex code, return as is
-        if color.startswith("#"):
-            return color
-        
-        return color_map.get(color.lower(), "#808080")
+        return colors.name_to_hex(color)
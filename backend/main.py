@@ -1,19 +1,33 @@
 """
 Jarvis Backend - Main Application Entry Point
 """
+# Imported first so startup timing covers every other import
+from core.startup import startup_timer
+
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import logging
 import os
 from dotenv import load_dotenv  # pyright: ignore[reportMissingImports]
 
-from core.orchestrator import JarvisOrchestrator
-from api.routes import router
+from core.logging_config import configure_logging
 
 # Load environment variables
 load_dotenv()
 
+# Set up logging before the modules that log on import
+configure_logging()
+logger = logging.getLogger(__name__)
+
+from core.orchestrator import JarvisOrchestrator
+from core.telemetry import TelemetryMiddleware, registry
+from core.admission import AdmissionMiddleware
+from core.json_encoding import JarvisJSONResponse
+from api.routes import router
+
 # Initialize orchestrator
 orchestrator = None
 
@@ -22,28 +36,28 @@ orchestrator = None
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     global orchestrator
-    print("🤖 Initializing Jarvis...")
+    logger.info("🤖 Initializing Jarvis...")
     try:
         orchestrator = JarvisOrchestrator()
         await orchestrator.initialize()
-        print("✅ Jarvis is ready!")
+        logger.info("✅ Jarvis is ready!")
+        startup_timer.ready()
     except Exception as e:
-        print(f"⚠️ Warning during Jarvis initialization: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.warning("⚠️ Warning during Jarvis initialization: %s", e, exc_info=True)
         # Ensure orchestrator is still created even if initialization partially failed
         if orchestrator is None:
-            print("Creating minimal orchestrator instance...")
+            logger.info("Creating minimal orchestrator instance...")
             orchestrator = JarvisOrchestrator()
+        startup_timer.ready()
 
     yield
 
-    print("👋 Shutting down Jarvis...")
+    logger.info("👋 Shutting down Jarvis...")
     try:
         if orchestrator:
             await orchestrator.cleanup()
     except Exception as e:
-        print(f"⚠️ Error during cleanup: {e}")
+        logger.warning("⚠️ Error during cleanup: %s", e)
 
 
 # Create FastAPI app
@@ -51,9 +65,14 @@ app = FastAPI(
     title="Jarvis 3D AI",
     description="A Jarvis-like AI for interactive 3D content generation",
     version="0.1.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=JarvisJSONResponse
 )
 
+# Concurrency limits and a bounded wait queue for the expensive endpoints.
+# Added first so it runs inside CORS and rejections still carry CORS headers.
+app.add_middleware(AdmissionMiddleware)
+
 # CORS middleware - allow all origins for Railway deployment
 # In production, check if we're running on Railway
 is_production = os.getenv("RAILWAY_ENVIRONMENT_NAME") or os.getenv("PORT")
@@ -80,8 +99,12 @@ app.add_middleware(
     allow_credentials=True if not is_production else False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-Id", "Server-Timing", "Retry-After"],
 )
 
+# Request ids, per-stage timing spans and request metrics
+app.add_middleware(TelemetryMiddleware)
+
 # Create upload directory
 os.makedirs("uploads", exist_ok=True)
 
@@ -95,6 +118,8 @@ app.include_router(router, prefix="/api")
 from api.simulation_routes import router as simulation_router
 app.include_router(simulation_router, prefix="/api")
 
+startup_timer.mark("imports")
+
 
 @app.get("/")
 async def root():
@@ -121,6 +146,12 @@ async def health_check():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request, stage and scene metrics in Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/health")
 async def api_health_check():
     """API Health check endpoint"""
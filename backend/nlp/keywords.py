@@ -0,0 +1,74 @@
+"""
+Keyword Matching
+
+Precompiled vocabulary matcher for rule-based NLP. Every vocabulary
+phrase is compiled into a single regular expression alternation bounded
+by word edges, so one scan of the text returns all hits with their
+positions, and words inside other words ("cone" in "scone") never match.
+"""
+from typing import Dict, Iterable, List, Tuple
+from dataclasses import dataclass
+import re
+
+
+@dataclass(frozen=True)
+class KeywordHit:
+    """One vocabulary phrase found in a text"""
+    category: str
+    # Canonical form, e.g. "cube" for "cubes"
+    value: str
+    start: int
+    end: int
+
+
+def plural(word: str) -> str:
+    if word.endswith("y") and word[-2:-1] not in "aeiou":
+        return word[:-1] + "ies"
+    if word.endswith(("s", "x", "ch", "sh")):
+        return word + "es"
+    return word + "s"
+
+
+def with_plurals(words: Iterable[str]) -> Dict[str, str]:
+    """Map each word and its plural to the word"""
+    forms = {}
+    for word in words:
+        forms[word] = word
+        forms[plural(word)] = word
+    return forms
+
+
+class KeywordMatcher:
+    """
+    Single-pass matcher for a categorized vocabulary
+
+    The vocabulary maps each category to {phrase: canonical value}.
+    Phrases may contain spaces, which match any run of whitespace; longer
+    phrases win over shorter ones starting at the same place.
+    """
+
+    def __init__(self, vocabulary: Dict[str, Dict[str, str]]):
+        self._lookup: Dict[str, Tuple[str, str]] = {}
+        for category, phrases in vocabulary.items():
+            for phrase, value in phrases.items():
+                phrase = " ".join(phrase.lower().split())
+                existing = self._lookup.get(phrase)
+                if existing is not None and existing != (category, value):
+                    raise ValueError(f"Phrase {phrase!r} is in both {existing[0]} and {category}")
+                self._lookup[phrase] = (category, value)
+
+        alternatives = sorted(self._lookup, key=len, reverse=True)
+        self._pattern = re.compile(
+            r"(?<!\w)(?:"
+            + "|".join(re.escape(phrase).replace(r"\ ", r"\s+") for phrase in alternatives)
+            + r")(?!\w)",
+            re.IGNORECASE
+        )
+
+    def find(self, text: str) -> List[KeywordHit]:
+        """All vocabulary hits in text, in order of position"""
+        hits = []
+        for match in self._pattern.finditer(text):
+            category, value = self._lookup[" ".join(match.group(0).lower().split())]
+            hits.append(KeywordHit(category, value, match.start(), match.end()))
+        return hits
@@ -0,0 +1,128 @@
+"""
+LLM Micro-Batching
+
+Gathers commands that arrive within a short window and hands them to a
+batch handler together, so concurrent requests share one LLM call
+instead of paying the per-call overhead and rate limit each.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+import os
+
+from core.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+
+BATCHES = registry.counter(
+    "jarvis_llm_batches_total", "LLM calls made for micro-batches of commands"
+)
+BATCHED_COMMANDS = registry.counter(
+    "jarvis_llm_batched_commands_total", "Commands sent to the LLM through micro-batches"
+)
+
+# Analyzes a batch of commands; returns one result per command, in order
+BatchHandler = Callable[[List[str]], Awaitable[List[Any]]]
+
+
+class LLMBatcher:
+    """
+    Collects submitted commands until the window closes or the batch is full
+
+    The window starts with the first command of a batch. Each caller gets
+    the result at its own position in the handler's output; if the
+    handler fails, every caller in the batch gets the error.
+    """
+
+    def __init__(self, handler: BatchHandler, window: float = 0.01, max_batch: int = 8):
+        self.handler = handler
+        self.window = window
+        self.max_batch = max(max_batch, 1)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.commands = 0
+
+    @classmethod
+    def from_env(cls, handler: BatchHandler) -> Optional["LLMBatcher"]:
+        """
+        Batcher configured by the environment, or None when disabled
+
+        JARVIS_LLM_BATCH_WINDOW_MS sets how long a batch collects commands
+        (0 disables batching) and JARVIS_LLM_BATCH_MAX the largest batch.
+        """
+        window_ms = float(os.getenv("JARVIS_LLM_BATCH_WINDOW_MS", "0"))
+        if window_ms <= 0:
+            return None
+        return cls(
+            handler,
+            window=window_ms / 1000,
+            max_batch=int(os.getenv("JARVIS_LLM_BATCH_MAX", "8"))
+        )
+
+    async def submit(self, text: str) -> Any:
+        """Queue a command for the next batch and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        self.batches += 1
+        self.commands += len(batch)
+        BATCHES.inc()
+        BATCHED_COMMANDS.inc(amount=len(batch))
+        logger.debug("[LLM_BATCH] Sending %d commands", len(batch))
+
+        try:
+            results = await self.handler([text for text, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Expected {len(batch)} results, got {len(results)}")
+        except Exception as e:
+            logger.warning("⚠️ [LLM_BATCH] Batch of %d failed: %s", len(batch), e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            # Callers that went away have cancelled their future
+            if not future.done():
+                future.set_result(result)
+
+    def close(self):
+        """Cancel pending and running batches"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for _, future in self._pending:
+            future.cancel()
+        self._pending = []
+        for task in self._tasks:
+            task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "commands": self.commands,
+            "average_batch_size": self.commands / self.batches if self.batches else 0.0
+        }
@@ -0,0 +1,218 @@
+"""
+LLM Response Cache
+
+Two-tier cache for parsed LLM analyses: an in-memory LRU tier in front
+of a persistent SQLite tier shared by every worker process. Entries are
+keyed on the normalized command text, the model and a version of the
+prompt, so changing either never serves stale analyses, and expire after
+a TTL.
+"""
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from copy import deepcopy
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from core.plan_cache import normalize_command
+from core.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+
+LOOKUPS = registry.counter(
+    "jarvis_llm_cache_lookups_total", "LLM response cache lookups by outcome", ("result",)
+)
+
+
+def prompt_version(*parts: str) -> str:
+    """Short fingerprint of the prompt text an analysis was produced with"""
+    return hashlib.sha1("\x00".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+def cache_key(text: str, model: str, prompt: str) -> str:
+    normalized = normalize_command(text)
+    return hashlib.sha256(f"{model}\x00{prompt}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+class DiskCacheTier:
+    """Persistent tier: one SQLite table of JSON entries with expiry times"""
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=busy_timeout
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Entry and its expiry time, or None if missing or expired"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        data, expires_at = row
+        if expires_at <= time.time():
+            self.delete(key)
+            return None
+        return json.loads(data), expires_at
+
+    def put(self, key: str, value: Dict[str, Any], expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, data, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, default=str), expires_at)
+            )
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        """Delete expired entries; returns how many were removed"""
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LLMResponseCache:
+    """
+    Memory LRU tier backed by an optional disk tier
+
+    Disk reads and writes run in a thread so they never block the event
+    loop. A disk hit is promoted into the memory tier with the remaining
+    TTL of the disk entry.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 86400.0,
+        disk: Optional[DiskCacheTier] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = disk
+        self._memory: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.stores = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["LLMResponseCache"]:
+        """
+        Cache configured by the environment, or None when disabled
+
+        JARVIS_LLM_CACHE_SIZE sets the memory entries (0 disables the
+        cache), JARVIS_LLM_CACHE_TTL the lifetime in seconds and
+        JARVIS_LLM_CACHE_PATH the SQLite file ("" keeps the cache in
+        memory only).
+        """
+        max_entries = int(os.getenv("JARVIS_LLM_CACHE_SIZE", "1024"))
+        if max_entries <= 0:
+            return None
+        disk = None
+        path = os.getenv("JARVIS_LLM_CACHE_PATH", os.path.join("data", "llm_cache.db"))
+        if path:
+            try:
+                disk = DiskCacheTier(path)
+            except Exception as e:
+                logger.warning("⚠️ LLM disk cache unavailable, caching in memory only: %s", e)
+        return cls(
+            max_entries=max_entries,
+            ttl=float(os.getenv("JARVIS_LLM_CACHE_TTL", "86400")),
+            disk=disk
+        )
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                LOOKUPS.inc("memory_hit")
+                return deepcopy(value)
+            del self._memory[key]
+            self.expirations += 1
+
+        if self.disk is not None:
+            try:
+                stored = await asyncio.to_thread(self.disk.get, key)
+            except Exception as e:
+                logger.warning("⚠️ [LLM_CACHE] Disk read failed: %s", e)
+                stored = None
+            if stored is not None:
+                value, expires_at = stored
+                self._remember(key, value, expires_at)
+                self.disk_hits += 1
+                LOOKUPS.inc("disk_hit")
+                return deepcopy(value)
+
+        self.misses += 1
+        LOOKUPS.inc("miss")
+        return None
+
+    async def put(self, key: str, value: Dict[str, Any]):
+        expires_at = time.time() + self.ttl
+        value = deepcopy(value)
+        self._remember(key, value, expires_at)
+        self.stores += 1
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.put, key, value, expires_at)
+            except Exception as e:
+                logger.warning("⚠️ [LLM_CACHE] Disk write failed: %s", e)
+
+    def _remember(self, key: str, value: Dict[str, Any], expires_at: float):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get occupancy and per-tier hit rates"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "disk": self.disk.path if self.disk is not None else None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_hit_rate": self.memory_hits / lookups if lookups else 0.0,
+            "expirations": self.expirations,
+            "stores": self.stores
+        }
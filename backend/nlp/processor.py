@@ -4,18 +4,66 @@ Natural Language Processing Module
 Handles text understanding, intent classification, entity extraction,
 and semantic parsing for 3D scene generation.
 """
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, TYPE_CHECKING
+from copy import deepcopy
+import asyncio
+import importlib.util
+import json
+import logging
 import os
 import re
 
-# Try to import OpenAI, use fallback if unavailable
-try:
+from core import colors
+from core.plan_cache import normalize_command
+from core.telemetry import registry
+from nlp.keywords import KeywordMatcher, KeywordHit, with_plurals
+from nlp.llm_batcher import LLMBatcher
+from nlp.llm_cache import LLMResponseCache, cache_key, prompt_version
+
+if TYPE_CHECKING:
     from openai import AsyncOpenAI
-    HAS_OPENAI = True
-except ImportError:
-    print("⚠️ Warning: OpenAI library not available, using rule-based NLP")
-    HAS_OPENAI = False
-    AsyncOpenAI = None
+
+logger = logging.getLogger(__name__)
+
+COALESCED = registry.counter(
+    "jarvis_nlp_coalesced_total", "NLP requests that joined an identical request already in flight"
+)
+
+# Vocabulary of the rule-based parser: category -> {phrase: canonical value}
+RULE_VOCABULARY: Dict[str, Dict[str, str]] = {
+    "delete": {word: "delete" for word in (
+        "delete", "deletes", "deleted", "deleting", "remove", "removes", "removed", "removing",
+        "clear", "clears", "cleared", "clearing"
+    )},
+    "modify": {word: "modify" for word in (
+        "change", "changes", "changed", "changing", "modify", "modifies", "modified", "modifying",
+        "update", "updates", "updated", "updating"
+    )},
+    "query": {word: "query" for word in ("what", "show", "shows", "showing", "how many")},
+    "shape": with_plurals(["cube", "sphere", "cylinder", "cone", "plane"]),
+    "environment": with_plurals(["forest", "city", "interior", "desert", "ocean", "mountain", "river"]),
+    "object": with_plurals(["car", "tree", "house", "chair", "table", "building", "sky"]),
+    "color": {**{name: name for name in colors.COLOR_NAMES}, **colors.ALIASES},
+    "size": {word: word for word in ("tiny", "small", "medium", "large", "huge", "big")},
+    "material": {
+        "wood": "wood", "wooden": "wood", "metal": "metal", "metallic": "metallic",
+        "glass": "glass", "plastic": "plastic", "stone": "stone"
+    },
+}
+
+# Categories that describe an object rather than name one
+ATTRIBUTE_CATEGORIES = ("color", "size", "material")
+
+RULE_MATCHER = KeywordMatcher(RULE_VOCABULARY)
+
+# The OpenAI client is slow to import, so it is only imported when an API
+# key is configured
+HAS_OPENAI = importlib.util.find_spec("openai") is not None
+
+
+def _import_openai_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI
 
 
 class NLPProcessor:
@@ -24,8 +72,16 @@ class NLPProcessor:
     and structured commands for 3D generation.
     """
     
-    def __init__(self):
-        self.client: Optional[AsyncOpenAI] = None
+    def __init__(self, client: Optional["AsyncOpenAI"] = None):
+        # An OpenAI-compatible client; created from OPENAI_API_KEY if not given
+        self.client = client
+        self.model = "gpt-3.5-turbo"
+        # Cache of parsed LLM analyses and batcher of LLM calls, set up
+        # along with the LLM client
+        self.cache: Optional[LLMResponseCache] = None
+        self.batcher: Optional[LLMBatcher] = None
+        # Analyses in progress, by normalized command text
+        self._in_flight: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
         self.system_prompt = """You are Jarvis, an AI assistant specialized in understanding 
 3D scene creation commands. Your job is to analyze user requests and extract:
 1. Intent (create, modify, delete, query, etc.)
@@ -35,45 +91,89 @@ class NLPProcessor:
 5. Environmental settings (lighting, weather, time of day)
 
 Return your analysis in a structured JSON format."""
-        
+        self.user_prompt = "Analyze this command: {text}"
+        self.batch_prompt = """Analyze each of these numbered commands on its own:
+{commands}
+
+Return a JSON object {{"results": [...]}} with one analysis per command, in the
+same order, each with the "index" of its command."""
+        self.prompt_version = prompt_version(self.system_prompt, self.user_prompt)
+
     async def initialize(self):
         """Initialize the NLP models"""
-        api_key = os.getenv("OPENAI_API_KEY")
-        if api_key and HAS_OPENAI:
-            try:
-                self.client = AsyncOpenAI(api_key=api_key)
-                print("✓ OpenAI NLP processor initialized")
-            except Exception as e:
-                print(f"⚠️ Warning: Could not initialize OpenAI: {e}")
-                self.client = None
-        else:
-            if not HAS_OPENAI:
-                print("⚠️ Warning: OpenAI library not available, using rule-based NLP")
-            elif not api_key:
-                print("⚠️ Warning: OPENAI_API_KEY not set, using rule-based NLP")
+        if self.client is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if api_key and HAS_OPENAI:
+                try:
+                    AsyncOpenAI = await asyncio.to_thread(_import_openai_client)
+                    self.client = AsyncOpenAI(api_key=api_key)
+                    logger.info("✓ OpenAI NLP processor initialized")
+                except Exception as e:
+                    logger.warning("⚠️ Warning: Could not initialize OpenAI: %s", e)
+                    self.client = None
+            else:
+                if not HAS_OPENAI:
+                    logger.warning("⚠️ Warning: OpenAI library not available, using rule-based NLP")
+                elif not api_key:
+                    logger.warning("⚠️ Warning: OPENAI_API_KEY not set, using rule-based NLP")
+
+        if self.client is not None:
+            self.cache = await asyncio.to_thread(LLMResponseCache.from_env)
+            self.batcher = LLMBatcher.from_env(self._call_llm_batch)
+            if self.batcher is not None:
+                logger.info("✓ LLM micro-batching every %.0fms", self.batcher.window * 1000)
+                # Batched analyses come from a different prompt
+                self.prompt_version = prompt_version(
+                    self.system_prompt, self.user_prompt, self.batch_prompt
+                )
     
     async def process(self, text: str) -> Dict[str, Any]:
         """
         Process natural language input
 
+        Concurrent calls for the same normalized text share one analysis,
+        so a burst of identical commands costs a single LLM call.
+
         Args:
             text: User's natural language command
 
         Returns:
             Structured analysis of the input
         """
-        print(f"[NLP] Processing text: {text[:50]}...")
+        key = normalize_command(text)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._analyze(text))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            logger.debug("[NLP] Joining in-flight analysis")
+            COALESCED.inc()
+
+        # Shielded so a caller that goes away does not cancel the analysis
+        # for the others; each caller gets its own copy to modify
+        result = deepcopy(await asyncio.shield(task))
+        result["raw_text"] = text
+        return result
+
+    def _forget(self, key: str, task: "asyncio.Task[Dict[str, Any]]"):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    async def _analyze(self, text: str) -> Dict[str, Any]:
+        """Analyze a command with the LLM when available, otherwise with the rules"""
+        logger.debug("[NLP] Processing text: %s...", text[:50])
 
         if self.client:
             try:
-                print(f"[NLP] Using LLM processor")
+                logger.debug("[NLP] Using LLM processor")
                 return await self._process_with_llm(text)
             except Exception as e:
-                print(f"⚠️ [NLP] LLM processing failed: {e}, falling back to rules")
+                logger.warning("⚠️ [NLP] LLM processing failed: %s, falling back to rules", e)
                 try:
                     return await self._process_with_rules(text)
                 except Exception as rule_error:
-                    print(f"❌ [NLP] Rule-based processing also failed: {rule_error}")
+                    logger.error("❌ [NLP] Rule-based processing also failed: %s", rule_error)
                     # Return a safe default
                     return {
                         "intent": "create",
@@ -86,10 +186,10 @@ Return your analysis in a structured JSON format."""
                     }
         else:
             try:
-                print(f"[NLP] Using rule-based processor")
+                logger.debug("[NLP] Using rule-based processor")
                 return await self._process_with_rules(text)
             except Exception as e:
-                print(f"❌ [NLP] Rule-based processing failed: {e}")
+                logger.error("❌ [NLP] Rule-based processing failed: %s", e)
                 # Return a safe default
                 return {
                     "intent": "create",
@@ -101,42 +201,107 @@ Return your analysis in a structured JSON format."""
                     "error": str(e)
                 }
     
+    def close(self):
+        """Release the response cache and stop batching"""
+        if self.batcher is not None:
+            self.batcher.close()
+        if self.cache is not None:
+            self.cache.close()
+
     async def _process_with_llm(self, text: str) -> Dict[str, Any]:
-        """Process using OpenAI GPT"""
-        import traceback
+        """Process using OpenAI GPT, answering repeated commands from the cache"""
+        key = None
+        if self.cache is not None:
+            key = cache_key(text, self.model, self.prompt_version)
+            cached = await self.cache.get(key)
+            if cached is not None:
+                logger.debug("[NLP_LLM] Cache hit")
+                cached["raw_text"] = text
+                return cached
 
-        print(f"[NLP_LLM] Starting LLM processing")
+        result = await self._call_llm(text)
+        # Rule-based fallbacks are cheap and are not worth keeping
+        if key is not None and result.get("method") not in ("rule_based", "error_fallback"):
+            await self.cache.put(key, result)
+        return result
+
+    async def _call_llm(self, text: str) -> Dict[str, Any]:
+        """Ask the LLM to analyze a command, falling back to the rules on errors"""
+        logger.debug("[NLP_LLM] Starting LLM processing")
         try:
             if not self.client:
-                print(f"[NLP_LLM] Client is None, cannot process with LLM")
+                logger.debug("[NLP_LLM] Client is None, cannot process with LLM")
                 raise Exception("OpenAI client not initialized")
 
-            print(f"[NLP_LLM] Sending request to OpenAI")
-            response = await self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": f"Analyze this command: {text}"}
-                ],
-                temperature=0.3,
-                max_tokens=500
-            )
-
-            print(f"[NLP_LLM] Response received from OpenAI")
-            # Parse the response
-            content = response.choices[0].message.content
+            if self.batcher is not None:
+                content = await self.batcher.submit(text)
+                if content is None:
+                    raise Exception("No analysis for this command in the batch response")
+            else:
+                content = await self._complete(text)
 
             # Extract intent and entities
             result = self._parse_llm_response(content, text)
-            print(f"[NLP_LLM] LLM processing successful")
+            logger.debug("[NLP_LLM] LLM processing successful")
             return result
 
         except Exception as e:
-            print(f"❌ [NLP_LLM] LLM processing error: {type(e).__name__}: {e}")
-            traceback.print_exc()
-            print(f"[NLP_LLM] Falling back to rule-based processing")
+            logger.error("❌ [NLP_LLM] LLM processing error: %s: %s", type(e).__name__, e, exc_info=True)
+            logger.debug("[NLP_LLM] Falling back to rule-based processing")
             return await self._process_with_rules(text)
     
+    async def _complete(self, text: str) -> str:
+        """Send one command to the LLM and return the raw response text"""
+        logger.debug("[NLP_LLM] Sending request to OpenAI")
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": self.user_prompt.format(text=text)}
+            ],
+            temperature=0.3,
+            max_tokens=500
+        )
+        logger.debug("[NLP_LLM] Response received from OpenAI")
+        return response.choices[0].message.content
+
+    async def _call_llm_batch(self, texts: List[str]) -> List[Optional[str]]:
+        """
+        Analyze several commands with one LLM call
+
+        Returns each command's analysis as JSON text, or None for commands
+        the response left out. A batch of one uses the single-command prompt.
+        """
+        if len(texts) == 1:
+            return [await self._complete(texts[0])]
+
+        commands = "\n".join(f"{index}. {json.dumps(text)}" for index, text in enumerate(texts))
+        logger.debug("[NLP_LLM] Sending batch of %d commands to OpenAI", len(texts))
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": self.batch_prompt.format(commands=commands)}
+            ],
+            temperature=0.3,
+            max_tokens=min(500 * len(texts), 4000)
+        )
+        content = response.choices[0].message.content
+
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if not json_match:
+            raise ValueError("Batch response contains no JSON object")
+        analyses = json.loads(json_match.group()).get("results", [])
+
+        results: List[Optional[str]] = [None] * len(texts)
+        for position, analysis in enumerate(analyses):
+            if not isinstance(analysis, dict):
+                continue
+            index = analysis.pop("index", position)
+            if isinstance(index, int) and 0 <= index < len(texts):
+                results[index] = json.dumps(analysis)
+        return results
+
     def _parse_llm_response(self, response: str, original_text: str) -> Dict[str, Any]:
         """Parse LLM response into structured format"""
         # Default structure
@@ -150,7 +315,6 @@ Return your analysis in a structured JSON format."""
         }
         
         # Try to extract JSON from response
-        import json
         try:
             # Look for JSON in the response
             json_match = re.search(r'\{.*\}', response, re.DOTALL)
@@ -164,82 +328,50 @@ Return your analysis in a structured JSON format."""
     
     async def _process_with_rules(self, text: str) -> Dict[str, Any]:
         """Fallback rule-based processing"""
-        print(f"[NLP_RULES] Processing with rule-based NLP")
+        logger.debug("[NLP_RULES] Processing with rule-based NLP")
 
         try:
-            text_lower = text.lower()
+            # One pass over the text finds every vocabulary word
+            hits = RULE_MATCHER.find(text)
+            found = {category: [] for category in RULE_VOCABULARY}
+            for index, hit in enumerate(hits):
+                found[hit.category].append(index)
 
             # Detect intent
             intent = "create"
-            if any(word in text_lower for word in ["delete", "remove", "clear"]):
+            if found["delete"]:
                 intent = "delete"
-            elif any(word in text_lower for word in ["change", "modify", "update"]):
+            elif found["modify"]:
                 intent = "modify"
-            elif any(word in text_lower for word in ["what", "show", "how many", "?"]):
+            elif found["query"] or "?" in text:
                 intent = "query"
 
-            print(f"[NLP_RULES] Detected intent: {intent}")
+            logger.debug("[NLP_RULES] Detected intent: %s", intent)
 
-            # Extract entities
+            # Extract entities: shapes, then environments, then complex
+            # objects, each once in order of first mention
             entities = []
+            for category, entity_type in (("shape", "object"), ("environment", "environment"), ("object", "object")):
+                seen = set()
+                for index in found[category]:
+                    value = hits[index].value
+                    if value in seen:
+                        continue
+                    seen.add(value)
+                    entity = {"type": entity_type, "value": value}
+                    if entity_type == "object":
+                        entity["attributes"] = self._extract_attributes(text, hits, value)
+                    entities.append(entity)
 
-            # Primitive shapes
-            primitive_shapes = ["cube", "sphere", "cylinder", "cone", "plane"]
-
-            # Environments
-            environments = ["forest", "city", "interior", "desert", "ocean", "mountain", "river"]
-
-            # Complex objects
-            complex_objects = ["car", "tree", "house", "chair", "table", "building", "sky"]
-
-            # Check for primitive shapes
-            for shape in primitive_shapes:
-                if shape in text_lower:
-                    entities.append({
-                        "type": "object",
-                        "value": shape,
-                        "attributes": self._extract_attributes(text_lower, shape)
-                    })
-
-            # Check for environments
-            for env in environments:
-                if env in text_lower:
-                    entities.append({
-                        "type": "environment",
-                        "value": env
-                    })
-
-            # Check for complex objects
-            for obj in complex_objects:
-                if obj in text_lower:
-                    entities.append({
-                        "type": "object",
-                        "value": obj,
-                        "attributes": self._extract_attributes(text_lower, obj)
-                    })
-
-            print(f"[NLP_RULES] Found {len(entities)} entities")
-
-            # Extract colors
-            colors = ["red", "blue", "green", "yellow", "white", "black", "purple", "orange", "cyan", "magenta", "brown", "gray"]
-            attributes = {}
-            for color in colors:
-                if color in text_lower:
-                    attributes["color"] = color
+            logger.debug("[NLP_RULES] Found %s entities", len(entities))
 
-            # Extract sizes
-            sizes = ["small", "large", "big", "tiny", "huge", "medium"]
-            for size in sizes:
-                if size in text_lower:
-                    attributes["size"] = size
-
-            # Extract materials
-            materials = ["wood", "wooden", "metal", "metallic", "glass", "plastic", "stone"]
-            for material in materials:
-                if material in text_lower:
-                    attributes["material"] = material.replace("en", "")  # wooden -> wood
+            # Extract colors, sizes and materials; the last mention wins
+            attributes = {}
+            for hit in hits:
+                if hit.category in ATTRIBUTE_CATEGORIES:
+                    attributes[hit.category] = hit.value
 
-            print(f"[NLP_RULES] Extracted attributes: {attributes}")
+            logger.debug("[NLP_RULES] Extracted attributes: %s", attributes)
 
             result = {
                 "intent": intent,
@@ -249,13 +381,11 @@ Return your analysis in a structured JSON format."""
                 "raw_text": text,
                 "method": "rule_based"
             }
-            print(f"[NLP_RULES] Rule-based processing successful")
+            logger.debug("[NLP_RULES] Rule-based processing successful")
             return result
 
         except Exception as e:
-            print(f"❌ [NLP_RULES] Error in rule-based processing: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.error("❌ [NLP_RULES] Error in rule-based processing: %s", e, exc_info=True)
             # Return absolute minimal safe default
             return {
                 "intent": "create",
@@ -267,22 +397,22 @@ Return your analysis in a structured JSON format."""
                 "error": str(e)
             }
     
-    def _extract_attributes(self, text: str, object_name: str) -> Dict[str, Any]:
-        """Extract attributes for a specific object"""
+    def _extract_attributes(self, text: str, hits: List[KeywordHit], object_name: str) -> Dict[str, Any]:
+        """Extract attributes for a specific object from the words right next to it"""
         attributes = {}
-        
-        # Find words around the object name
-        pattern = r'(\w+)\s+' + object_name + r'|\b' + object_name + r'\s+(\w+)'
-        matches = re.finditer(pattern, text)
-        
-        for match in matches:
-            words = [w for w in match.groups() if w]
-            for word in words:
-                if word in ["red", "blue", "green", "yellow"]:
-                    attributes["color"] = word
-                elif word in ["small", "large", "big"]:
-                    attributes["size"] = word
-                elif word in ["wooden", "metal", "glass"]:
-                    attributes["material"] = word
-        
+
+        for index, hit in enumerate(hits):
+            if hit.value != object_name or hit.category not in ("shape", "object"):
+                continue
+            for neighbor in (index - 1, index + 1):
+                if not 0 <= neighbor < len(hits):
+                    continue
+                other = hits[neighbor]
+                if other.category not in ATTRIBUTE_CATEGORIES:
+                    continue
+                # Adjacent means separated by whitespace only
+                gap = text[other.end:hit.start] if neighbor < index else text[hit.end:other.start]
+                if gap and gap.isspace():
+                    attributes[other.category] = other.value
+
         return attributes
@@ -0,0 +1,394 @@
+"""
+Jarvis Shard Router - Context-Affinity Front Router
+
+Routes every request for a scene context to the worker process that owns
+it, using consistent hashing of the context id. Live simulator state then
+never has to move between processes.
+
+Run the router in front of already running workers:
+    JARVIS_SHARD_WORKERS=http://127.0.0.1:8001,http://127.0.0.1:8002 python shard_router.py
+
+Or let it spawn local workers itself:
+    python shard_router.py --workers 4 --base-port 8001
+
+All workers must share the same persistent context backend (for example
+the same SQLite file) so contexts can change owner when workers are added
+or removed. The router appends the client address to X-Forwarded-For;
+workers it did not spawn need the router's address in
+JARVIS_TRUSTED_PROXIES to apply per-client limits to the real clients.
+
+Adding and removing workers requires the JARVIS_ROUTER_ADMIN_TOKEN in an
+X-Jarvis-Admin-Token header; without a configured token only clients on
+the loopback interface may change the ring.
+"""
+from fastapi import FastAPI, Request, HTTPException, Depends, Header
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import itertools
+import logging
+import os
+import subprocess
+import sys
+import uuid
+
+import httpx
+
+from core.sharding import (
+    HashRing,
+    ASSIGNED_CONTEXT_HEADER,
+    context_id_from_body,
+    context_id_from_path
+)
+from core.logging_config import configure_logging
+from simulation.metrics import SimulationMetrics
+
+logger = logging.getLogger(__name__)
+
+
+# Hop-by-hop headers that must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host", "content-length"
+}
+
+# Endpoints that create a context when called without a context_id
+CONTEXT_CREATING_PATHS = {"/api/text", "/api/process", "/api/process/stream", "/api/batch"}
+
+ring = HashRing(
+    url.strip().rstrip("/")
+    for url in os.getenv("JARVIS_SHARD_WORKERS", "").split(",")
+    if url.strip()
+)
+ADMIN_TOKEN = os.getenv("JARVIS_ROUTER_ADMIN_TOKEN", "")
+rebalance_lock = asyncio.Lock()
+client: Optional[httpx.AsyncClient] = None
+_round_robin = itertools.count()
+
+
+class WorkerRequest(BaseModel):
+    """Request model for adding or removing a worker"""
+    url: str
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup and shutdown events"""
+    global client
+    configure_logging()
+    timeout = float(os.getenv("JARVIS_SHARD_TIMEOUT", "120"))
+    client = httpx.AsyncClient(timeout=timeout)
+    logger.info("🔀 Shard router ready with %s worker(s): %s", len(ring.workers), ring.workers)
+    yield
+    await client.aclose()
+
+
+app = FastAPI(
+    title="Jarvis Shard Router",
+    description="Routes scene requests to the worker that owns the scene",
+    version="0.1.0",
+    lifespan=lifespan
+)
+
+
+def _require_admin(
+    request: Request,
+    x_jarvis_admin_token: Optional[str] = Header(default=None)
+):
+    """Allow ring changes only with the admin token, or from loopback without one"""
+    if ADMIN_TOKEN:
+        if not x_jarvis_admin_token or not hmac.compare_digest(x_jarvis_admin_token, ADMIN_TOKEN):
+            raise HTTPException(status_code=401, detail="Invalid or missing admin token")
+        return
+    try:
+        loopback = request.client is not None and ipaddress.ip_address(request.client.host).is_loopback
+    except ValueError:
+        loopback = False
+    if not loopback:
+        raise HTTPException(status_code=403, detail="Worker changes are only allowed from localhost")
+
+
+def _worker_url(url: str) -> str:
+    """Validate a worker URL and return it as scheme://host[:port]"""
+    try:
+        parts = urlsplit(url.strip())
+        parts.port  # raises ValueError for an invalid port
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid worker URL")
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise HTTPException(status_code=400, detail="Worker URL must be http(s)://host[:port]")
+    if parts.username or parts.password or parts.path.strip("/") or parts.query or parts.fragment:
+        raise HTTPException(status_code=400, detail="Worker URL must not have credentials, a path or a query")
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _any_worker() -> str:
+    """Pick a worker for requests that do not address a context"""
+    if not ring.workers:
+        raise HTTPException(status_code=503, detail="No workers available")
+    return ring.workers[next(_round_robin) % len(ring.workers)]
+
+
+def _forward_headers(request: Request) -> Dict[str, str]:
+    # Context ids for new contexts are only ever assigned by the router
+    dropped = {"x-forwarded-for", ASSIGNED_CONTEXT_HEADER.lower()}
+    headers = {
+        key: value
+        for key, value in request.headers.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS and key.lower() not in dropped
+    }
+    # Workers see the router as the peer, so pass on who the client was
+    hops = [value for key, value in request.headers.items() if key.lower() == "x-forwarded-for"]
+    if request.client:
+        hops.append(request.client.host)
+    if hops:
+        headers["X-Forwarded-For"] = ", ".join(hops)
+    return headers
+
+
+async def _proxy(request: Request, worker: str, body: bytes, extra_headers: Dict[str, str]):
+    """Forward a request to a worker and stream its response back"""
+    headers = _forward_headers(request)
+    headers.update(extra_headers)
+    upstream_request = client.build_request(
+        request.method,
+        f"{worker}{request.url.path}",
+        params=request.query_params,
+        headers=headers,
+        content=body
+    )
+    try:
+        upstream = await client.send(upstream_request, stream=True)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Worker {worker} unavailable: {e}")
+
+    response_headers = {
+        key: value
+        for key, value in upstream.headers.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS
+    }
+    response_headers["X-Jarvis-Worker"] = worker
+
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        headers=response_headers,
+        background=BackgroundTask(upstream.aclose)
+    )
+
+
+async def _context_exists(context_id: str) -> bool:
+    """Ask the owner of a context whether it exists"""
+    worker = ring.owner(context_id)
+    try:
+        response = await client.head(f"{worker}/api/scene/{context_id}")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Worker {worker} unavailable: {e}")
+    return response.status_code == 200
+
+
+async def _list_worker_contexts(worker: str) -> List[str]:
+    response = await client.get(f"{worker}/api/scenes")
+    response.raise_for_status()
+    return [scene["context_id"] for scene in response.json().get("scenes", [])]
+
+
+async def _rebalance(new_ring: HashRing) -> Dict[str, Any]:
+    """
+    Switch to a new ring and hand off contexts that changed owner
+
+    Old owners release moved contexts (flush and drop them from memory);
+    new owners load them lazily from the shared backend on first access.
+    """
+    global ring
+    async with rebalance_lock:
+        old_ring = ring
+        context_ids: List[str] = []
+        for worker in old_ring.workers:
+            try:
+                context_ids.extend(await _list_worker_contexts(worker))
+            except Exception as e:
+                logger.warning("⚠️ [ROUTER] Could not list contexts on %s: %s", worker, e)
+
+        moves = old_ring.moved(context_ids, new_ring) if old_ring.workers and new_ring.workers else {}
+        ring = new_ring
+
+        released = 0
+        for context_id, move in moves.items():
+            try:
+                response = await client.post(f"{move['from']}/api/scene/{context_id}/release")
+                if response.status_code == 200:
+                    released += 1
+            except Exception as e:
+                logger.warning("⚠️ [ROUTER] Could not release %s on %s: %s", context_id, move['from'], e)
+
+        logger.info("[ROUTER] Rebalanced: %s context(s) moved, %s released", len(moves), released)
+        return {"workers": ring.workers, "moved": len(moves), "released": released, "moves": moves}
+
+
+@app.get("/router/workers")
+async def list_workers():
+    """List workers in the hash ring"""
+    return {"workers": ring.workers, "replicas": ring.replicas}
+
+
+@app.post("/router/workers", dependencies=[Depends(_require_admin)])
+async def add_worker(worker: WorkerRequest):
+    """Add a worker and move the contexts it now owns"""
+    new_ring = ring.copy()
+    new_ring.add_worker(_worker_url(worker.url))
+    return await _rebalance(new_ring)
+
+
+@app.delete("/router/workers", dependencies=[Depends(_require_admin)])
+async def remove_worker(url: str):
+    """Remove a worker and move its contexts to the remaining workers"""
+    new_ring = ring.copy()
+    new_ring.remove_worker(url.rstrip("/"))
+    if not new_ring.workers:
+        raise HTTPException(status_code=400, detail="Cannot remove the last worker")
+    return await _rebalance(new_ring)
+
+
+@app.get("/router/owner/{context_id}")
+async def get_owner(context_id: str):
+    """Show which worker owns a context"""
+    if not ring.workers:
+        raise HTTPException(status_code=503, detail="No workers available")
+    return {"context_id": context_id, "worker": ring.owner(context_id)}
+
+
+@app.get("/api/scenes")
+async def list_scenes():
+    """List scenes across all workers"""
+    scenes = []
+    for worker in ring.workers:
+        try:
+            response = await client.get(f"{worker}/api/scenes")
+            scenes.extend(response.json().get("scenes", []))
+        except Exception as e:
+            logger.warning("⚠️ [ROUTER] Could not list scenes on %s: %s", worker, e)
+    return {"scenes": scenes, "count": len(scenes)}
+
+
+@app.get("/api/simulation/metrics")
+async def simulation_metrics():
+    """Simulation tick metrics merged across all workers"""
+    if not ring.workers:
+        raise HTTPException(status_code=503, detail="No workers available")
+
+    async def fetch(worker: str) -> Dict[str, Any]:
+        response = await client.get(f"{worker}/api/simulation/metrics")
+        response.raise_for_status()
+        return response.json()
+
+    responses = await asyncio.gather(*(fetch(worker) for worker in ring.workers), return_exceptions=True)
+    reports, workers = [], {}
+    for worker, response in zip(ring.workers, responses):
+        if isinstance(response, Exception):
+            logger.warning("⚠️ [ROUTER] Could not get simulation metrics from %s: %s", worker, response)
+            workers[worker] = f"error: {response}"
+        else:
+            reports.append(response)
+            workers[worker] = "ok"
+    if not reports:
+        raise HTTPException(status_code=502, detail="No worker returned simulation metrics")
+
+    report = SimulationMetrics.merge_reports(reports)
+    report["workers"] = workers
+    return report
+
+
+@app.get("/router/health")
+async def router_health():
+    """Health of the router and every worker"""
+    workers = {}
+    for worker in ring.workers:
+        try:
+            response = await client.get(f"{worker}/health", timeout=5.0)
+            workers[worker] = response.json().get("status", "unknown")
+        except Exception as e:
+            workers[worker] = f"unreachable: {e}"
+    return {"status": "healthy" if ring.workers else "no_workers", "workers": workers}
+
+
+@app.api_route("/{path:path}", methods=["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
+async def route_request(path: str, request: Request):
+    """Forward a request to the worker that owns its context"""
+    body = await request.body()
+    extra_headers: Dict[str, str] = {}
+
+    context_id = context_id_from_path(request.url.path)
+    if context_id is None and request.method == "POST" and request.url.path in CONTEXT_CREATING_PATHS:
+        if not ring.workers:
+            raise HTTPException(status_code=503, detail="No workers available")
+        context_id = context_id_from_body(request.headers.get("content-type", ""), body)
+        if context_id is None or not await _context_exists(context_id):
+            # Assign ids to new contexts here so they are created on their
+            # owner; ids sent by clients are never used for new contexts
+            context_id = str(uuid.uuid4())
+            extra_headers[ASSIGNED_CONTEXT_HEADER] = context_id
+
+    if context_id is not None:
+        if not ring.workers:
+            raise HTTPException(status_code=503, detail="No workers available")
+        worker = ring.owner(context_id)
+    else:
+        worker = _any_worker()
+
+    return await _proxy(request, worker, body, extra_headers)
+
+
+def spawn_workers(count: int, base_port: int, host: str = "127.0.0.1") -> List[subprocess.Popen]:
+    """Start local uvicorn worker processes sharing one context backend"""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    # Each context has exactly one owner, so per-access revalidation is not needed
+    env.setdefault("JARVIS_SHARED_CONTEXTS", "false")
+    env.setdefault("JARVIS_CONTEXT_WRITE_MODE", "through")
+    # Requests arrive from the router, which forwards the client address
+    env.setdefault("JARVIS_TRUSTED_PROXIES", host)
+
+    processes = []
+    for i in range(count):
+        port = base_port + i
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", host, "--port", str(port)],
+            cwd=backend_dir,
+            env=env
+        ))
+        ring.add_worker(f"http://{host}:{port}")
+    return processes
+
+
+def main(argv: Optional[List[str]] = None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the Jarvis context-affinity shard router")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Spawn this many local worker processes")
+    parser.add_argument("--base-port", type=int, default=8001,
+                        help="Port of the first spawned worker")
+    args = parser.parse_args(argv)
+
+    processes = spawn_workers(args.workers, args.base_port) if args.workers else []
+    try:
+        uvicorn.run(app, host=args.host, port=args.port)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Simulation Metrics Module
+
+Tracks per-tick phase timings, entity counts and tick budget overruns
+so simulation hosts can be capacity-planned.
+"""
+from typing import Dict, Any, Iterable, Optional, Sequence
+from bisect import bisect_left
+
+
+# Default tick budget (60 FPS)
+DEFAULT_TICK_BUDGET = 1.0 / 60.0
+
+# Histogram bucket upper bounds in seconds
+TIMING_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, DEFAULT_TICK_BUDGET, 0.025, 0.05, 0.1, 0.25, 1.0
+)
+
+
+class TimingHistogram:
+    """Fixed-bucket histogram of durations in seconds"""
+
+    def __init__(self, buckets: Sequence[float] = TIMING_BUCKETS):
+        self.buckets = tuple(buckets)
+        # One extra slot for values above the last bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        """Record a single duration"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "TimingHistogram"):
+        """Fold another histogram with the same buckets into this one"""
+        if other.buckets != self.buckets:
+            raise ValueError("Cannot merge histograms with different buckets")
+        for i, bucket_count in enumerate(other.counts):
+            self.counts[i] += bucket_count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], buckets: Sequence[float] = TIMING_BUCKETS) -> "TimingHistogram":
+        """Rebuild a histogram from to_dict() output, e.g. from another process"""
+        histogram = cls(buckets)
+        counts = list(data.get("buckets", {}).values())
+        if len(counts) != len(histogram.counts):
+            raise ValueError("Cannot rebuild a histogram with different buckets")
+        histogram.counts = [int(count) for count in counts]
+        histogram.count = int(data.get("count", 0))
+        histogram.total = float(data.get("mean", 0.0)) * histogram.count
+        histogram.max = float(data.get("max", 0.0))
+        return histogram
+
+    def percentile(self, q: float) -> float:
+        """Estimate a percentile (0-1) as the upper bound of its bucket"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert histogram to JSON-serializable format"""
+        bucket_labels = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": dict(zip(bucket_labels, self.counts))
+        }
+
+
+class SimulationMetrics:
+    """
+    Per-simulator tick instrumentation
+
+    Records how long each phase of a tick takes, how many entities
+    were involved and how often a tick exceeded its time budget. Overruns
+    and mean and worst utilization are all measured against the budget
+    each tick was recorded with.
+    """
+
+    PHASES = ("physics", "behavior", "collisions")
+
+    def __init__(self, tick_budget: float = DEFAULT_TICK_BUDGET):
+        self.tick_budget = tick_budget
+        self.reset()
+
+    def reset(self):
+        """Forget every recorded tick"""
+        self.phase_timings: Dict[str, TimingHistogram] = {
+            phase: TimingHistogram() for phase in self.PHASES
+        }
+        self.tick_timings = TimingHistogram()
+        self.ticks = 0
+        self.overruns = 0
+        # Sum of per-tick utilization, for the mean
+        self.budget_utilization_total = 0.0
+        self.worst_budget_utilization = 0.0
+        self.last_counts = {"bodies": 0, "agents": 0, "contacts": 0}
+        self.max_counts = {"bodies": 0, "agents": 0, "contacts": 0}
+
+    def record_tick(
+        self,
+        phase_times: Dict[str, float],
+        total_time: float,
+        counts: Dict[str, int],
+        budget: Optional[float] = None
+    ):
+        """Record the timings and entity counts of one tick"""
+        if budget is None:
+            budget = self.tick_budget
+
+        for phase, duration in phase_times.items():
+            if phase in self.phase_timings:
+                self.phase_timings[phase].observe(duration)
+        self.tick_timings.observe(total_time)
+        self.ticks += 1
+
+        if total_time > budget:
+            self.overruns += 1
+        if budget > 0:
+            utilization = total_time / budget
+            self.budget_utilization_total += utilization
+            self.worst_budget_utilization = max(self.worst_budget_utilization, utilization)
+
+        for key, value in counts.items():
+            self.last_counts[key] = value
+            self.max_counts[key] = max(self.max_counts.get(key, 0), value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert metrics to JSON-serializable format"""
+        return {
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "overrun_ratio": self.overruns / self.ticks if self.ticks else 0.0,
+            "tick_budget": self.tick_budget,
+            "budget_utilization": {
+                "mean": self.budget_utilization_total / self.ticks if self.ticks else 0.0,
+                "worst": self.worst_budget_utilization
+            },
+            "tick": self.tick_timings.to_dict(),
+            "phases": {
+                phase: histogram.to_dict()
+                for phase, histogram in self.phase_timings.items()
+            },
+            "counts": {
+                "last": dict(self.last_counts),
+                "max": dict(self.max_counts)
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SimulationMetrics":
+        """Rebuild metrics from to_dict() output, e.g. from another process"""
+        metrics = cls(tick_budget=data.get("tick_budget", DEFAULT_TICK_BUDGET))
+        metrics.ticks = int(data.get("ticks", 0))
+        metrics.overruns = int(data.get("overruns", 0))
+        utilization = data.get("budget_utilization", {})
+        metrics.budget_utilization_total = float(utilization.get("mean", 0.0)) * metrics.ticks
+        metrics.worst_budget_utilization = float(utilization.get("worst", 0.0))
+        metrics.tick_timings = TimingHistogram.from_dict(data.get("tick", {}))
+        for phase, histogram in data.get("phases", {}).items():
+            if phase in metrics.phase_timings:
+                metrics.phase_timings[phase] = TimingHistogram.from_dict(histogram)
+        counts = data.get("counts", {})
+        metrics.last_counts.update(counts.get("last", {}))
+        metrics.max_counts.update(counts.get("max", {}))
+        return metrics
+
+    @classmethod
+    def merge_reports(cls, reports: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine aggregate() reports from several processes into one"""
+        reports = list(reports)
+        merged = cls.aggregate(cls.from_dict(report) for report in reports)
+        merged["simulators"] = sum(report.get("simulators", 0) for report in reports)
+        merged["running"] = sum(report.get("running", 0) for report in reports)
+        return merged
+
+    @classmethod
+    def aggregate(cls, metrics: Iterable["SimulationMetrics"]) -> Dict[str, Any]:
+        """Combine metrics from several simulators into one report"""
+        combined = cls()
+        simulators = 0
+        current_counts = {"bodies": 0, "agents": 0, "contacts": 0}
+
+        for item in metrics:
+            simulators += 1
+            combined.tick_timings.merge(item.tick_timings)
+            for phase, histogram in item.phase_timings.items():
+                combined.phase_timings[phase].merge(histogram)
+            combined.ticks += item.ticks
+            combined.overruns += item.overruns
+            combined.budget_utilization_total += item.budget_utilization_total
+            combined.worst_budget_utilization = max(
+                combined.worst_budget_utilization, item.worst_budget_utilization
+            )
+            for key, value in item.last_counts.items():
+                current_counts[key] = current_counts.get(key, 0) + value
+                combined.max_counts[key] = max(combined.max_counts.get(key, 0), item.max_counts.get(key, 0))
+
+        combined.last_counts = current_counts
+        report = combined.to_dict()
+        report["simulators"] = simulators
+        return report
@@ -4,8 +4,10 @@ Main Simulator Module
 Coordinates physics and behavioral simulations.
 """
 from typing import Dict, Any, Optional
+import time
 from .physics_engine import PhysicsEngine
 from .behavior_engine import BehaviorEngine
+from .metrics import SimulationMetrics
 
 
 class Simulator:
@@ -18,6 +20,7 @@ class Simulator:
         self.behavior_engine = BehaviorEngine()
         self.is_running = False
         self.simulation_time = 0.0
+        self.metrics = SimulationMetrics()
         
     def initialize(self, scene_data: Dict[str, Any]):
         """Initialize simulation from scene data"""
@@ -64,17 +67,38 @@ class Simulator:
         if dt is None:
             dt = 1.0 / 60.0
         
+        tick_start = time.perf_counter()
+        
         # Update physics
         physics_updates = self.physics_engine.step(dt)
+        physics_done = time.perf_counter()
         
         # Update behaviors
         behavior_updates = self.behavior_engine.step(dt)
+        behavior_done = time.perf_counter()
         
         # Detect collisions
         collisions = self.physics_engine.detect_collisions()
+        collisions_done = time.perf_counter()
         
         self.simulation_time += dt
         
+        # Record tick timings against the real-time budget of this step
+        self.metrics.record_tick(
+            {
+                "physics": physics_done - tick_start,
+                "behavior": behavior_done - physics_done,
+                "collisions": collisions_done - behavior_done
+            },
+            collisions_done - tick_start,
+            {
+                "bodies": len(self.physics_engine.bodies),
+                "agents": len(self.behavior_engine.agents),
+                "contacts": len(collisions)
+            },
+            budget=dt
+        )
+        
         return {
             "time": self.simulation_time,
             "physics_updates": physics_updates,
@@ -116,6 +140,10 @@ class Simulator:
         """Remove an agent from the simulation"""
         self.behavior_engine.remove_agent(agent_id)
     
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get tick timing and budget metrics"""
+        return self.metrics.to_dict()
+    
     def get_state(self) -> Dict[str, Any]:
         """Get current simulation state"""
         return {
@@ -131,4 +159,5 @@ class Simulator:
         self.behavior_engine.reset()
         self.simulation_time = 0.0
         self.is_running = False
+        self.metrics.reset()
 
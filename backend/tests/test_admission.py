@@ -0,0 +1,128 @@
+"""Tests for admission control and client identification"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from core.admission import (
+    AdmissionLimits,
+    AdmissionMiddleware,
+    AdmissionRejected,
+    EndpointLimiter,
+    client_key,
+    parse_networks
+)
+
+
+def scope(peer: str, forwarded_for: str = None) -> dict:
+    headers = [(b"x-forwarded-for", forwarded_for.encode("latin-1"))] if forwarded_for else []
+    return {"type": "http", "client": (peer, 1234), "headers": headers}
+
+
+def test_client_key_ignores_forwarded_for_from_untrusted_peers():
+    trusted = parse_networks("10.0.0.1")
+    assert client_key(scope("203.0.113.5", "198.51.100.1"), trusted) == "203.0.113.5"
+    assert client_key(scope("203.0.113.5", "198.51.100.1"), []) == "203.0.113.5"
+
+
+def test_client_key_uses_rightmost_untrusted_hop_behind_trusted_proxies():
+    trusted = parse_networks("10.0.0.0/8")
+    forwarded = "1.1.1.1, 198.51.100.7, 10.0.0.2"
+    assert client_key(scope("10.0.0.1", forwarded), trusted) == "198.51.100.7"
+
+
+def test_client_key_falls_back_to_peer_without_forwarded_for():
+    trusted = parse_networks("10.0.0.1")
+    assert client_key(scope("10.0.0.1"), trusted) == "10.0.0.1"
+
+
+def test_limiter_queues_in_arrival_order_and_rejects_when_full():
+    limiter = EndpointLimiter("/api/process", AdmissionLimits(max_concurrent=1, max_queue=2, max_per_client=0))
+    admitted = []
+
+    async def request(name: str):
+        await limiter.acquire(name)
+        admitted.append(name)
+
+    async def scenario():
+        await limiter.acquire("first")
+        queued = [asyncio.create_task(request(name)) for name in ("second", "third")]
+        await asyncio.sleep(0)
+        assert limiter.queue_depth == 2
+
+        with pytest.raises(AdmissionRejected) as rejection:
+            await limiter.acquire("fourth")
+        assert rejection.value.status_code == 503
+
+        limiter.release("first", 0.1)
+        await asyncio.sleep(0)
+        limiter.release("second", 0.1)
+        await asyncio.gather(*queued)
+
+    asyncio.run(scenario())
+    assert admitted == ["second", "third"]
+    assert limiter.in_flight == 1
+    assert limiter.rejected == {"queue_full": 1}
+
+
+def test_limiter_enforces_per_client_limit():
+    limiter = EndpointLimiter("/api/process", AdmissionLimits(max_concurrent=4, max_per_client=1))
+
+    async def scenario():
+        await limiter.acquire("client")
+        with pytest.raises(AdmissionRejected) as rejection:
+            await limiter.acquire("client")
+        assert rejection.value.status_code == 429
+        await limiter.acquire("other")
+
+    asyncio.run(scenario())
+
+
+def test_limiter_times_out_queued_requests():
+    limiter = EndpointLimiter(
+        "/api/process", AdmissionLimits(max_concurrent=1, queue_timeout=0.01, max_per_client=0)
+    )
+
+    async def scenario():
+        await limiter.acquire("first")
+        with pytest.raises(AdmissionRejected):
+            await limiter.acquire("second")
+
+    asyncio.run(scenario())
+    assert limiter.queue_depth == 0
+    assert limiter.rejected == {"queue_timeout": 1}
+
+
+def test_middleware_rejects_with_retry_after():
+    app = FastAPI()
+    release = asyncio.Event()
+
+    @app.post("/api/process")
+    async def process():
+        await release.wait()
+        return {"status": "ok"}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    limits = AdmissionLimits(max_concurrent=1, max_queue=0, max_per_client=0)
+    guarded = AdmissionMiddleware(app, endpoints=("/api/process",), limits=limits, trusted_proxies=[])
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=guarded, client=("203.0.113.5", 1234))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            running = asyncio.create_task(client.post("/api/process"))
+            await asyncio.sleep(0.01)
+
+            rejected = await client.post("/api/process")
+            assert rejected.status_code == 503
+            assert int(rejected.headers["retry-after"]) >= 1
+            assert (await client.get("/health")).status_code == 200
+
+            release.set()
+            assert (await running).status_code == 200
+
+    asyncio.run(scenario())
+    assert guarded.stats()["/api/process"]["in_flight"] == 0
@@ -0,0 +1,163 @@
+"""Tests for the bounded, persistent scene context store"""
+import asyncio
+
+import pytest
+
+from core.context_store import ContextStore
+from core.persistence import SQLiteContextBackend, ContextVersionConflict
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_store(**kwargs) -> ContextStore:
+    kwargs.setdefault("size_estimator", lambda context: 1)
+    return ContextStore(**kwargs)
+
+
+def persistent_store(tmp_path, **kwargs) -> ContextStore:
+    return make_store(
+        backend=SQLiteContextBackend(str(tmp_path / "contexts.db")),
+        serializer=dict,
+        deserializer=dict,
+        **kwargs
+    )
+
+
+def test_evicts_least_recently_used():
+    store = make_store(max_contexts=2)
+    store["a"] = {}
+    store["b"] = {}
+    store["a"]
+    store["c"] = {}
+
+    assert list(store) == ["a", "c"]
+    assert store.evictions["lru"] == 1
+
+
+def test_evicts_idle_contexts_after_ttl():
+    clock = FakeClock()
+    store = make_store(idle_ttl=10, clock=clock)
+    store["a"] = {}
+    clock.now = 11
+
+    assert "a" not in store
+    assert store.evictions["ttl"] == 1
+
+
+def test_evicts_by_memory_limit():
+    store = make_store(max_memory_bytes=25, size_estimator=lambda context: context["size"])
+    store["a"] = {"size": 10}
+    store["b"] = {"size": 10}
+    store["c"] = {"size": 10}
+
+    assert list(store) == ["b", "c"]
+    assert store.memory_bytes == 20
+    assert store.evictions["memory"] == 1
+
+
+def test_busy_contexts_are_not_evicted():
+    busy = {"a"}
+    clock = FakeClock()
+    store = make_store(max_contexts=2, idle_ttl=10, clock=clock, is_busy=lambda context_id: context_id in busy)
+    store["a"] = {}
+    store["b"] = {}
+    store["c"] = {}
+
+    assert list(store) == ["a", "c"]
+
+    clock.now = 11
+    assert store.sweep() == 1
+    assert list(store) == ["a"]
+
+    busy.clear()
+    assert store.sweep() == 1
+    assert len(store) == 0
+
+
+def test_commit_of_missing_context_raises():
+    store = make_store()
+    with pytest.raises(KeyError):
+        store.commit("missing")
+    with pytest.raises(KeyError):
+        asyncio.run(store.commit_async("missing"))
+
+
+def test_locked_context_survives_eviction_pressure_until_commit(tmp_path):
+    from core.concurrency import ContextLockManager
+
+    locks = ContextLockManager()
+    store = persistent_store(tmp_path, max_contexts=1, is_busy=locks.is_busy)
+
+    async def scenario():
+        store["a"] = {"objects": []}
+        async with locks.acquire("a"):
+            context = await store.get_async("a")
+            context["objects"].append("cube")
+            # Another request creates a context while "a" is being edited
+            store["b"] = {}
+            await store.commit_async("a")
+
+    asyncio.run(scenario())
+    store.clear()
+    assert store["a"] == {"objects": ["cube"]}
+
+
+def test_dirty_contexts_are_flushed_before_eviction(tmp_path):
+    store = persistent_store(tmp_path, max_contexts=1, write_behind=True)
+
+    async def scenario():
+        store["a"] = {"value": 1}
+        await store.commit_async("a")
+        store["b"] = {}
+        # "a" has unsaved changes, so it stays until the background flush wrote it
+        assert "a" in list(store)
+        await store._flush_task
+
+    asyncio.run(scenario())
+    assert list(store) == ["b"]
+    assert store.backend.load("a") == ({"value": 1}, 1)
+
+
+def test_loads_persisted_contexts_lazily(tmp_path):
+    store = persistent_store(tmp_path)
+    store["a"] = {"value": 1}
+    store.commit("a")
+    store.clear()
+
+    assert len(store) == 0
+    assert store["a"] == {"value": 1}
+    assert store.loads == 1
+
+
+def test_shared_store_drops_contexts_changed_elsewhere(tmp_path):
+    path = str(tmp_path / "contexts.db")
+    first = make_store(backend=SQLiteContextBackend(path), serializer=dict, deserializer=dict, shared=True)
+    second = make_store(backend=SQLiteContextBackend(path), serializer=dict, deserializer=dict, shared=True)
+    first["a"] = {"value": 1}
+    first.commit("a")
+
+    second["a"]["value"] = 2
+    second.commit("a")
+
+    assert first["a"] == {"value": 2}
+
+
+def test_stale_commit_raises_conflict(tmp_path):
+    path = str(tmp_path / "contexts.db")
+    first = make_store(backend=SQLiteContextBackend(path), serializer=dict, deserializer=dict)
+    second = make_store(backend=SQLiteContextBackend(path), serializer=dict, deserializer=dict)
+    first["a"] = {"value": 1}
+    first.commit("a")
+    second["a"]["value"] = 2
+    second.commit("a")
+
+    first["a"]["value"] = 3
+    with pytest.raises(ContextVersionConflict):
+        first.commit("a")
+    assert first.reload("a") == {"value": 2}
@@ -0,0 +1,111 @@
+"""Tests for the SQLite and file context backends"""
+import os
+
+import pytest
+
+from core.persistence import (
+    SQLiteContextBackend,
+    FileContextBackend,
+    ContextVersionConflict,
+    create_context_backend
+)
+
+
+@pytest.fixture(params=["sqlite", "file"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        backend = SQLiteContextBackend(str(tmp_path / "contexts.db"))
+    else:
+        backend = FileContextBackend(str(tmp_path / "contexts"))
+    yield backend
+    backend.close()
+
+
+def test_save_and_load_round_trip(backend):
+    assert backend.load("a") is None
+    assert backend.save("a", {"objects": [{"id": "1"}]}) == 1
+
+    assert backend.load("a") == ({"objects": [{"id": "1"}]}, 1)
+    assert backend.get_version("a") == 1
+    assert backend.count() == 1
+
+
+def test_unversioned_saves_bump_the_version(backend):
+    backend.save("a", {"value": 1})
+    assert backend.save("a", {"value": 2}) == 2
+    assert backend.load("a") == ({"value": 2}, 2)
+
+
+def test_versioned_save_succeeds_on_expected_version(backend):
+    assert backend.save("a", {"value": 1}, expected_version=0) == 1
+    assert backend.save("a", {"value": 2}, expected_version=1) == 2
+
+
+def test_versioned_save_conflicts_on_stale_version(backend):
+    backend.save("a", {"value": 1}, expected_version=0)
+    backend.save("a", {"value": 2}, expected_version=1)
+
+    with pytest.raises(ContextVersionConflict) as conflict:
+        backend.save("a", {"value": 3}, expected_version=1)
+    assert conflict.value.actual_version == 2
+    assert backend.load("a") == ({"value": 2}, 2)
+
+
+def test_creating_an_existing_context_conflicts(backend):
+    backend.save("a", {"value": 1})
+    with pytest.raises(ContextVersionConflict):
+        backend.save("a", {"value": 2}, expected_version=0)
+
+
+def test_history_is_stored_only_with_successful_saves(backend):
+    backend.save("a", {}, expected_version=0, history=[{"action": "first"}])
+    with pytest.raises(ContextVersionConflict):
+        backend.save("a", {}, expected_version=0, history=[{"action": "lost"}])
+    backend.save("a", {}, expected_version=1, history=[{"action": "second"}, {"action": "third"}])
+
+    assert [entry["action"] for entry in backend.load_history("a")] == ["first", "second", "third"]
+    assert [entry["action"] for entry in backend.load_history("a", limit=2)] == ["second", "third"]
+
+
+def test_delete_removes_context_and_history(backend):
+    backend.save("a", {}, history=[{"action": "first"}])
+    backend.delete("a")
+
+    assert backend.load("a") is None
+    assert backend.get_version("a") is None
+    assert backend.load_history("a") == []
+    assert backend.count() == 0
+
+
+def test_file_backend_keeps_ids_inside_its_directory(tmp_path):
+    backend = FileContextBackend(str(tmp_path / "contexts"))
+    backend.save("../escape", {"value": 1})
+
+    assert os.listdir(tmp_path) == ["contexts"]
+    assert backend.load("../escape") == ({"value": 1}, 1)
+
+
+def test_file_backend_times_out_on_a_held_lock(tmp_path):
+    backend = FileContextBackend(str(tmp_path / "contexts"), lock_timeout=0.05)
+    open(backend._path("a") + ".lock", "w").close()
+
+    with pytest.raises(TimeoutError):
+        backend.save("a", {"value": 1})
+
+
+def test_file_backend_breaks_stale_locks(tmp_path):
+    backend = FileContextBackend(str(tmp_path / "contexts"), stale_lock_age=0)
+    lock_path = backend._path("a") + ".lock"
+    open(lock_path, "w").close()
+    os.utime(lock_path, (0, 0))
+
+    assert backend.save("a", {"value": 1}) == 1
+
+
+def test_create_context_backend_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("JARVIS_CONTEXT_BACKEND", "memory")
+    assert create_context_backend() is None
+
+    monkeypatch.setenv("JARVIS_CONTEXT_BACKEND", "file")
+    monkeypatch.setenv("JARVIS_CONTEXT_PATH", str(tmp_path / "contexts"))
+    assert isinstance(create_context_backend(), FileContextBackend)